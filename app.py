@@ -4,11 +4,17 @@ Simple Flask app for health checks and running the bot
 """
 
 import os
-from flask import Flask, jsonify
+import sqlite3
+from datetime import datetime
+from dotenv import load_dotenv
+from flask import Flask, jsonify, Response, request
 import threading
+import multiprocessing
 import time
 import logging
-from sniperbot import OLXSniperBot
+from metrics import metrics
+from supervisor import Supervisor
+from history import HistoryReader
 
 # Setup logging
 logging.basicConfig(
@@ -20,36 +26,105 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
-# Global bot instance
-bot = None
-bot_thread = None
+# Same settings file as the bot process
+load_dotenv('ini.env')
+
+# The bot runs in a supervised child process, restarted when it dies or its poll loop stalls
+CYCLE_SLO_SECONDS = float(os.getenv('CYCLE_SLO_SECONDS', '30'))  # A poll's fetch and parse slower than this misses the SLO
+SLOW_CYCLES = int(os.getenv('SLOW_CYCLES', '3'))  # Consecutive SLO misses of one search that trigger a restart
+STALL_SECONDS = float(os.getenv('STALL_SECONDS', '120'))  # A hung cycle or silent event loop this long triggers a restart
+supervisor = Supervisor(slo=CYCLE_SLO_SECONDS, stall_after=STALL_SECONDS, slow_cycles=SLOW_CYCLES)
+supervisor_thread = None
+# Read-only view of the bot's listing history
+history = HistoryReader(os.getenv('HISTORY_DB', './history.db'))
 
 def run_bot():
-    """Run the bot in a separate thread"""
-    global bot
+    """Supervise the bot process from a separate thread"""
     try:
-        logger.info("Starting OLX Sniper Bot thread...")
-        bot = OLXSniperBot()
-        bot.run()
+        logger.info("Starting OLX Sniper Bot process...")
+        supervisor.run()
     except Exception as e:
-        logger.error(f"Error in bot thread: {e}")
+        logger.error(f"Error in bot supervisor: {e}")
 
-# Start bot in background thread when module is imported
-if not bot_thread:
-    logger.info("Starting bot thread...")
-    bot_thread = threading.Thread(target=run_bot, daemon=True)
-    bot_thread.start()
+# Start the supervisor when module is imported (not again in the spawned bot process, which imports it too)
+if not supervisor_thread and multiprocessing.parent_process() is None:
+    logger.info("Starting bot supervisor thread...")
+    supervisor_thread = threading.Thread(target=run_bot, daemon=True)
+    supervisor_thread.start()
 
 @app.route('/')
 @app.route('/health')
 def health_check():
     """Health check endpoint for Railway"""
+    status = supervisor.status()
+    bot = supervisor.health()
+    olx = status.get('olx') or {}
+    stalled = bool(bot['stalled']) or not bot['running']
+    if stalled:
+        health = "stalled"
+    elif any(host['circuit'] != 'closed' for host in olx.values()):
+        # Still HTTP 200: a paused bot is waiting out an OLX block, restarting it would not help
+        health = "degraded"
+    else:
+        health = "healthy"
     return jsonify({
-        "status": "healthy",
+        "status": health,
         "service": "OLX Sniper Bot (Python)",
         "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S+00:00'),
-        "bot_running": bot_thread.is_alive() if bot_thread else False
-    })
+        "bot_running": bot['running'],
+        "bot": bot,
+        "worker_id": status.get('worker_id'),
+        "leased_searches": status.get('leased_searches'),
+        "olx": olx,
+        "notify_queues": status.get('notify_queues') or {}
+    }), 503 if stalled else 200
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics: per-stage timings and extraction/webhook counters"""
+    # The bot process publishes its metrics every few seconds; restarts are counted here
+    return Response(metrics.render() + (supervisor.status().get('metrics') or ''), mimetype='text/plain; version=0.0.4')
+
+@app.route('/selectors')
+def selectors_endpoint():
+    """Winning selector and hit rates per extraction field, to spot OLX layout changes"""
+    return jsonify(supervisor.status().get('selectors') or {})
+
+def arg(name, kind=str):
+    """Query string argument converted with kind, or None"""
+    value = request.args.get(name)
+    return kind(value) if value not in (None, '') else None
+
+def timestamp(value):
+    """Unix timestamp from a number or an ISO date/time"""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+@app.route('/listings')
+def listings_endpoint():
+    """Listing history, newest first: ?query=&model=&min_price=&max_price=&since=&limit=, then ?cursor=<next>"""
+    try:
+        page = history.listings(query=arg('query'), model=arg('model'), min_price=arg('min_price', float),
+                                max_price=arg('max_price', float), since=arg('since', timestamp),
+                                cursor=arg('cursor'), limit=arg('limit', int) or 50)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
+    except sqlite3.Error as e:
+        return jsonify({"error": f"Listing history unavailable: {e}"}), 503
+    return jsonify(page)
+
+@app.route('/stats')
+def stats_endpoint():
+    """Listing counts, price ranges per model and price drops: ?query=&since="""
+    try:
+        stats = history.stats(query=arg('query'), since=arg('since', timestamp), limit=arg('limit', int) or 50)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
+    except sqlite3.Error as e:
+        return jsonify({"error": f"Listing history unavailable: {e}"}), 503
+    return jsonify(stats)
 
 if __name__ == "__main__":
     # Start Flask app
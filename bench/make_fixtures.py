@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Generate the benchmark fixture corpus: OLX-shaped search result pages
+Each sequence is a series of pages where every page adds NEW_PER_PAGE listings on top,
+like consecutive polls of a search ordered by created_at:desc.
+
+Publish times are placeholders (__TIME_n__ / __ISO_n__) that the OLX stub and the runners
+fill in, so the pages always look fresh to is_today_offer.
+"""
+
+import os
+import json
+import random
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+CARDS_PER_PAGE = 40
+NEW_PER_PAGE = 2
+PAGES = 3
+
+MODELS = ['iphone-13-pro-128gb', 'iphone-11-64gb', 'iphone-14-pro-max-256-gb', 'iphone-12-mini',
+          'iphone-x-64gb-stan-idealny', 'iphone-15-pro-256gb-tytan', 'iphone-se-2020-etui',
+          'iphone-13-128gb-uszkodzony', 'iphone-14-128-gb-gwarancja', 'iphone-xr-64gb']
+CITIES = [('Warszawa', 'Mokotów'), ('Kraków', None), ('Murowana Goślina', None), ('Bielsko-Biała', None),
+          ('Gdańsk', 'Wrzeszcz'), ('Łódź', 'Bałuty'), ('Poznań', None), ('Wrocław', 'Krzyki')]
+
+def make_ads(count, rng):
+    """Newest first; ad n is published n * 3 minutes before the page is served"""
+    ads = []
+    for n in range(count):
+        model = rng.choice(MODELS)
+        city, district = rng.choice(CITIES)
+        price = rng.randrange(300, 7000, 50)
+        ads.append({
+            'n': n,
+            'code': f"{rng.getrandbits(32):08x}",
+            'ad_id': 850000000 + rng.randrange(10 ** 6),
+            'model': model,
+            'city': city,
+            'district': district,
+            'price': price,
+            'promoted': rng.random() < 0.08,
+            'photo': f"{rng.getrandbits(48):012x}",
+        })
+    return ads
+
+def format_price(value):
+    return f"{value:,}".replace(',', ' ') + ' zł'
+
+def card_html(ad, slot):
+    url = f"/d/oferta/{ad['model']}-CID99-ID{ad['code']}.html"
+    location = f"{ad['city']}, {ad['district']}" if ad['district'] else ad['city']
+    promoted = '<div data-testid="adCard-featured" class="css-1jh69qu">Wyróżnione</div>' if ad['promoted'] else ''
+    return f'''<div data-cy="l-card" data-testid="l-card" id="{ad['ad_id']}" class="css-1sw7q4x"><div type="list" class="css-1apmciz">
+<a class="css-rc5s2u" href="{url}"><div class="css-1venxj6"><div type="list" class="css-13wiuob"><img src="https://ireland.apollo.olxcdn.com:443/v1/files/{ad['photo']}-PL/image;s=200x0;q=50" alt="{ad['model']}" class="css-8wsg1m"></div></div></a>
+<div class="css-u2ayx9">{promoted}<a class="css-rc5s2u" href="{url}"><h6 class="css-16v5mdi er34gjf0">{ad['model'].replace('-', ' ')}</h6></a><p data-testid="ad-price" class="css-10b0gli er34gjf0">{format_price(ad['price'])}<span class="css-1c0ed4l">do negocjacji</span></p></div>
+<div class="css-odp1qd"><p data-testid="location-date" class="css-1a4brun er34gjf0">{location} - Dzisiaj o __TIME_{slot}__</p><span class="css-1cd0guq"><span class="css-3lkihg">Używane</span></span></div></div></div>'''
+
+def state_ad(ad, slot):
+    return {
+        'id': ad['ad_id'],
+        'title': ad['model'].replace('-', ' ').title(),
+        'url': f"https://www.olx.pl/d/oferta/{ad['model']}-CID99-ID{ad['code']}.html",
+        'createdTime': f"__ISO_{slot}__",
+        'isPromoted': ad['promoted'],
+        'location': {'cityName': ad['city'], 'districtName': ad['district'], 'regionName': 'Polska'},
+        'price': {'displayValue': format_price(ad['price']),
+                  'regularPrice': {'value': ad['price'], 'currencyCode': 'PLN', 'negotiable': True}},
+        'photos': [f"https://ireland.apollo.olxcdn.com:443/v1/files/{ad['photo']}-PL/image;s={{width}}x{{height}}"],
+        'params': [],
+    }
+
+def page_html(ads, with_state, rng):
+    cards = '\n'.join(card_html(ad, slot) for slot, ad in enumerate(ads))
+    state = json.dumps({'listing': {'listing': {'ads': [state_ad(ad, slot) for slot, ad in enumerate(ads)]}}}) if with_state else '{}'
+    # Analytics and bundle blobs make up most of a real page
+    filler = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz0123456789') for _ in range(60000))
+    return f'''<!DOCTYPE html><html lang="pl"><head><meta charset="utf-8"><title>Iphone - Telefony - OLX.pl</title>
+<style>.css-1sw7q4x{{display:flex}}.css-10b0gli{{font-weight:700}}</style>
+<script id="olx-init-config">window.__PRERENDERED_STATE__= {json.dumps(state)};</script></head>
+<body><header class="css-header"><a href="/">OLX</a><nav><a href="/mojolx/">Twoje konto</a><a href="/d/nowe-ogloszenie/">Dodaj ogłoszenie</a></nav></header>
+<main><div data-testid="listing-grid" class="css-oukcj3">
+{cards}
+</div></main>
+<footer class="css-footer"><a href="/pomoc/">Pomoc</a> © OLX <!-- footer --></footer>
+<script>window.__bundle="{filler}";</script></body></html>'''
+
+def main():
+    rng = random.Random(75)
+    total = CARDS_PER_PAGE + NEW_PER_PAGE * (PAGES - 1)
+    ads = make_ads(total, rng)
+    for with_state, kind in ((False, 'dom'), (True, 'state')):
+        for page in range(PAGES):
+            # Page p shows the newest ads as of poll p
+            start = NEW_PER_PAGE * (PAGES - 1 - page)
+            html = page_html(ads[start:start + CARDS_PER_PAGE], with_state, random.Random(page))
+            path = os.path.join(FIXTURES_DIR, f'search_{kind}_{page + 1}.html')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(html)
+            print(f"Wrote {path} ({len(html) // 1024} KB)")
+
+if __name__ == "__main__":
+    main()
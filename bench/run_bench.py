@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark and regression runner for the OLX Sniper Bot
+Usage: python -m bench.run_bench [--repeat 20] [--cycles 10] [--compare bench/results/<commit>.json] [--update-expected]
+
+Measures listings parsed per second per parser path, poll cycle and notification latency
+percentiles against the local stubs, and peak memory per parse. Extracted listings are checked
+against bench/fixtures/expected so a faster parser cannot silently change what it extracts.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+EXPECTED_DIR = os.path.join(BENCH_DIR, 'fixtures', 'expected')
+
+# Keep the bot away from real state and real endpoints
+_tmp = tempfile.mkdtemp(prefix='olx-bench-')
+os.environ['SEEN_DB'] = os.path.join(_tmp, 'seen.db')
+os.environ['SEEN_FILE'] = os.path.join(_tmp, 'seen.json')
+os.environ['PRICE_SNAPSHOT'] = os.path.join(_tmp, 'prices.json')
+os.environ['STATE_SNAPSHOT'] = os.path.join(_tmp, 'state.json')
+os.environ['HISTORY_DB'] = os.path.join(_tmp, 'history.db')
+os.environ['DISCORD_WEBHOOK_URL'] = 'http://127.0.0.1:9/unused'
+os.environ['OLX_SEARCH_URLS'] = ''
+sys.path.insert(0, ROOT_DIR)
+
+from bench.stubs import OLXStub, FakeDiscord, load_fixture, render_fixture, sequence  # noqa: E402
+import sniperbot  # noqa: E402
+from notifier import DiscordDispatcher  # noqa: E402
+from parsers import get_backend, available_backends  # noqa: E402
+
+# Listing fields that depend on when the page was rendered
+VOLATILE_FIELDS = ('publish_date', 'published_at')
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def git_commit():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, text=True).strip()
+        dirty = subprocess.call(['git', 'diff', '--quiet', 'HEAD', '--', '*.py'], cwd=ROOT_DIR) != 0
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def stable(listings):
+    return [{key: value for key, value in listing.items() if key not in VOLATILE_FIELDS} for listing in listings]
+
+def parser_paths():
+    """(name, fixture kind, parse_listings kwargs) for every parser path"""
+    paths = [('state', 'state', {'use_state': True})]
+    for backend in available_backends():
+        paths.append((f'dom-{backend}', 'dom', {'use_state': False, 'parser': get_backend(backend)}))
+    if 'lxml' in available_backends():
+        # Card by card over 64 KB chunks, with the container selector learned by the dom-lxml run
+        paths.append(('dom-stream', 'dom', {'use_state': False, 'stream': True}))
+    return paths
+
+def bench_parsing(bot, repeat, update_expected):
+    """Listings per second, peak memory and regression check for every parser path"""
+    results = {}
+    mismatches = []
+    for name, kind, kwargs in parser_paths():
+        fixture = sequence(kind)[-1]
+        page = render_fixture(load_fixture(fixture)).encode('utf-8')
+
+        listings = bot.parse_listings(page, today_only=False, **kwargs)
+        tracemalloc.start()
+        bot.parse_listings(page, today_only=False, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            bot.parse_listings(page, today_only=False, **kwargs)
+            timings.append(time.perf_counter() - started)
+
+        # Both DOM backends must agree with the same expected file
+        expected_path = os.path.join(EXPECTED_DIR, f'{kind}.json')
+        if update_expected and (kind == 'state' or name == 'dom-lxml'):
+            with open(expected_path, 'w', encoding='utf-8') as f:
+                json.dump(stable(listings), f, ensure_ascii=False, indent=2)
+        elif os.path.exists(expected_path):
+            with open(expected_path, 'r', encoding='utf-8') as f:
+                if json.load(f) != stable(listings):
+                    mismatches.append(name)
+
+        results[name] = {
+            'listings': len(listings),
+            'parse_ms_p50': percentile(timings, 50) * 1000,
+            'listings_per_sec': len(listings) / percentile(timings, 50),
+            'peak_memory_kb': peak / 1024,
+        }
+    return results, mismatches
+
+def bench_cycles(bot, cycles, latency):
+    """Full fetch -> parse -> seen check -> notify cycles against the local OLX and Discord stubs"""
+    results = {}
+    for kind in ('state', 'dom'):
+        olx = OLXStub(kind, latency=latency).start()
+        discord = FakeDiscord().start()
+        query = sniperbot.SearchQuery(olx.url)
+        bot.seen = sniperbot.SeenStore(os.path.join(_tmp, f'cycle-{kind}.db'), legacy_file=None)
+        bot.notifier = DiscordDispatcher(discord.url)
+        bot.pending_notifications = set()
+        queued_at = {}
+        delivered = []
+
+        def is_known(listing_id):
+            return (query.url, listing_id) in bot.pending_notifications or bot.seen.contains(query.url, listing_id)
+
+        cycle_times = []
+        for cycle in range(cycles):
+            started = time.perf_counter()
+            listings = bot.fetch_listings(query.url, is_known)
+            if cycle == 0:
+                bot.seen.add_many(query.url, [listing['id'] for listing in listings])
+            else:
+                for listing in listings:
+                    if not bot.seen.contains(query.url, listing['id']):
+                        queued_at[listing['id']] = time.perf_counter()
+                        bot.notifier.submit(listing, lambda ok, listing_id=listing['id']: delivered.append(
+                            (listing_id, ok, time.perf_counter())))
+                        bot.seen.add(query.url, listing['id'])
+            bot.seen.flush()
+            cycle_times.append(time.perf_counter() - started)
+
+        bot.notifier.close()
+        notify_latency = [at - queued_at[listing_id] for listing_id, ok, at in delivered if ok]
+        results[kind] = {
+            'cycles': cycles,
+            'cycle_ms_p50': percentile(cycle_times, 50) * 1000,
+            'cycle_ms_p90': percentile(cycle_times, 90) * 1000,
+            'cycle_ms_p99': percentile(cycle_times, 99) * 1000,
+            'notified': len(notify_latency),
+            'webhook_calls': len(discord.messages),
+            'webhook_rejected': discord.rejected,
+            'notify_ms_p50': percentile(notify_latency, 50) * 1000 if notify_latency else None,
+            'notify_ms_p99': percentile(notify_latency, 99) * 1000 if notify_latency else None,
+        }
+        olx.stop()
+        discord.stop()
+    return results
+
+def compare(current, previous_path):
+    """Print metric deltas against an earlier results file"""
+    with open(previous_path, 'r', encoding='utf-8') as f:
+        previous = json.load(f)
+    print(f"\nComparison with {previous.get('commit')} ({previous_path}):")
+    for section in ('parsing', 'cycles'):
+        for name, values in current[section].items():
+            before = previous.get(section, {}).get(name, {})
+            for metric, value in values.items():
+                old = before.get(metric)
+                if isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+                    print(f"  {section}/{name}/{metric}: {old:.2f} -> {value:.2f} ({(value - old) / old * 100:+.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20, help='parses per parser path')
+    parser.add_argument('--cycles', type=int, default=10, help='poll cycles per stub run')
+    parser.add_argument('--latency', type=float, default=0.05, help='OLX stub response latency in seconds')
+    parser.add_argument('--compare', help='earlier results JSON to compare against')
+    parser.add_argument('--update-expected', action='store_true', help='rewrite the expected listings')
+    parser.add_argument('--verbose', action='store_true', help='keep the bot INFO logs')
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.INFO)
+
+    bot = sniperbot.OLXSniperBot(queries=[sniperbot.SearchQuery('http://127.0.0.1/')])
+    parsing, mismatches = bench_parsing(bot, args.repeat, args.update_expected)
+    cycles = bench_cycles(bot, args.cycles, args.latency)
+
+    results = {
+        'commit': git_commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'parsing': parsing,
+        'cycles': cycles,
+        'regressions': mismatches,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{results['commit']}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+
+    print(json.dumps(results, indent=2))
+    print(f"\nSaved results to {path}")
+    if args.compare:
+        compare(results, args.compare)
+    if mismatches:
+        print(f"\nREGRESSION: extracted listings changed for {', '.join(mismatches)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
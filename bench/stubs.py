@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for olx.pl and a Discord webhook, used by the benchmark runners
+Usage: python -m bench.stubs [--latency 0.05] [--throttle-rate 0.1] [--block-rate 0.0]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+_PLACEHOLDER_RE = re.compile(r'__(TIME|ISO)_(\d+)__')
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+def render_fixture(template, now=None, minutes_per_slot=1):
+    """Fill in publish times: card n was published n minutes before now
+
+    DOM cards show the UTC clock time (as olx.pl renders it), the page state carries ISO timestamps.
+    """
+    now = now or datetime.now(timezone.utc)
+
+    def replace(match):
+        published = now - timedelta(minutes=int(match.group(2)) * minutes_per_slot)
+        if match.group(1) == 'TIME':
+            return f"{published:%H:%M}"
+        return published.astimezone(timezone(timedelta(hours=2))).isoformat(timespec='seconds')
+    return _PLACEHOLDER_RE.sub(replace, template)
+
+def sequence(kind):
+    """Fixture names of a poll sequence, oldest page first"""
+    names = sorted(name for name in os.listdir(FIXTURES_DIR) if name.startswith(f'search_{kind}_'))
+    return names
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class OLXStub:
+    """Serves fixture pages in sequence, with configurable latency and 429/403/captcha behaviour"""
+
+    def __init__(self, kind='state', latency=0.0, throttle_rate=0.0, block_rate=0.0, captcha_rate=0.0, seed=0):
+        self.pages = [load_fixture(name) for name in sequence(kind)]
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.block_rate = block_rate
+        self.captcha_rate = captcha_rate
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+
+    def _handler(self):
+        stub = self
+
+        class Handler(_QuietHandler):
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                    count = stub.requests
+                    roll = stub._rng.random()
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if roll < stub.block_rate:
+                    return self._send(403, b'Forbidden', {'Content-Type': 'text/html'})
+                roll -= stub.block_rate
+                if roll < stub.throttle_rate:
+                    return self._send(429, b'Too Many Requests', {'Content-Type': 'text/html', 'Retry-After': '5'})
+                roll -= stub.throttle_rate
+                if roll < stub.captcha_rate:
+                    body = b'<html><body><div id="captcha-container">Potwierdz, ze jestes czlowiekiem</div></body></html>'
+                    return self._send(200, body, {'Content-Type': 'text/html; charset=utf-8'})
+                # Each poll shows the next page of the sequence, then the newest one stays up
+                page = stub.pages[min(count, len(stub.pages)) - 1]
+                body = render_fixture(page).encode('utf-8')
+                self._send(200, body, {'Content-Type': 'text/html; charset=utf-8'})
+        return Handler
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_port}/oferty/q-iphone/?search%5Border%5D=created_at:desc'
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+class FakeDiscord:
+    """Webhook endpoint enforcing a per-window request limit with Discord's rate limit headers"""
+
+    def __init__(self, limit=5, window=2.0, latency=0.0):
+        self.limit = limit
+        self.window = window
+        self.latency = latency
+        self.messages = []
+        self.rejected = 0
+        self._calls = []
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+
+    def _handler(self):
+        fake = self
+
+        class Handler(_QuietHandler):
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if fake.latency:
+                    time.sleep(fake.latency)
+                now = time.monotonic()
+                with fake._lock:
+                    fake._calls = [call for call in fake._calls if now - call < fake.window]
+                    if len(fake._calls) >= fake.limit:
+                        fake.rejected += 1
+                        retry_after = fake.window - (now - fake._calls[0])
+                        body = json.dumps({'message': 'You are being rate limited.', 'retry_after': retry_after}).encode()
+                        return self._send(429, body, {'Content-Type': 'application/json', 'Retry-After': f'{retry_after:.3f}'})
+                    fake._calls.append(now)
+                    remaining = fake.limit - len(fake._calls)
+                    reset_after = fake.window - (now - fake._calls[0])
+                    fake.messages.append((time.time(), payload))
+                self._send(204, headers={
+                    'X-RateLimit-Limit': str(fake.limit),
+                    'X-RateLimit-Remaining': str(remaining),
+                    'X-RateLimit-Reset-After': f'{reset_after:.3f}',
+                })
+        return Handler
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_port}/api/webhooks/1/token'
+
+    def embeds(self):
+        return [embed for _, payload in self.messages for embed in payload.get('embeds', [])]
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--kind', default='state', choices=['state', 'dom'])
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--block-rate', type=float, default=0.0)
+    parser.add_argument('--captcha-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    olx = OLXStub(args.kind, args.latency, args.throttle_rate, args.block_rate, args.captcha_rate).start()
+    discord = FakeDiscord().start()
+    print(f"OLX_SEARCH_URL={olx.url}")
+    print(f"DISCORD_WEBHOOK_URL={discord.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        sys.exit(0)
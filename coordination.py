@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Work sharing between several bot processes
+Search queries are leased to live workers through a SQLite database on a disk they share, and every
+announcement is claimed there first so a listing is only sent once, even while a lease changes hands.
+SQLite locking only works between processes of one host, so the workers must run on the same machine.
+"""
+
+import os
+import math
+import time
+import socket
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class Coordinator:
+    """Query leases, worker heartbeats and announcement claims in a shared SQLite database"""
+
+    def __init__(self, path, worker_id=None, lease_ttl=60, claim_ttl=7 * 24 * 3600, pending_ttl=600):
+        self.path = path
+        # Per process: gunicorn workers started with one WORKER_ID must not share leases and claims
+        self.worker_id = f"{worker_id or socket.gethostname()}-{os.getpid()}"
+        self.lease_ttl = lease_ttl
+        self.claim_ttl = claim_ttl
+        # A claim not confirmed as delivered within this long was orphaned by a killed worker
+        self.pending_ttl = pending_ttl
+        self.owned = set()
+        self._lock = threading.Lock()
+
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS workers (worker_id TEXT PRIMARY KEY, heartbeat_at REAL NOT NULL)')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS leases ('
+            ' query TEXT PRIMARY KEY, worker_id TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS claims ('
+            ' query TEXT NOT NULL, listing_id TEXT NOT NULL, worker_id TEXT NOT NULL, claimed_at REAL NOT NULL,'
+            ' delivered INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (query, listing_id)) WITHOUT ROWID'
+        )
+        if 'delivered' not in [row[1] for row in self._db.execute('PRAGMA table_info(claims)')]:
+            # Claims made before delivery was tracked were announced, or long expired
+            self._db.execute('ALTER TABLE claims ADD COLUMN delivered INTEGER NOT NULL DEFAULT 1')
+        self._db.execute('CREATE INDEX IF NOT EXISTS claims_by_time ON claims (claimed_at)')
+        # Claims left unfinished by workers that stopped, e.g. our previous run, can be announced again;
+        # live workers keep theirs
+        released = self._db.execute(
+            'DELETE FROM claims WHERE delivered = 0 AND worker_id NOT IN'
+            ' (SELECT worker_id FROM workers WHERE heartbeat_at >= ?)', (time.time() - self.lease_ttl,)
+        ).rowcount
+        if released:
+            logger.info(f"Released {released} unfinished announcement claims of stopped workers")
+
+    def rebalance(self, queries):
+        """Heartbeat, renew our leases and take or give up queries to reach a fair share
+
+        Returns (gained, lost) sets of query URLs.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                self._db.execute('INSERT OR REPLACE INTO workers VALUES (?, ?)', (self.worker_id, now))
+                self._db.execute('DELETE FROM workers WHERE heartbeat_at < ?', (now - self.lease_ttl,))
+                live = self._db.execute('SELECT COUNT(*) FROM workers').fetchone()[0]
+                fair_share = math.ceil(len(queries) / max(live, 1))
+
+                leases = dict(self._db.execute(
+                    'SELECT query, worker_id FROM leases WHERE expires_at >= ?', (now,)
+                ).fetchall())
+                mine = [query for query in queries if leases.get(query) == self.worker_id]
+                # Give the surplus back so workers that just joined can pick it up
+                released = mine[fair_share:]
+                mine = mine[:fair_share]
+                free = [query for query in queries if query not in leases]
+                taken = free[:max(fair_share - len(mine), 0)]
+
+                self._db.executemany('DELETE FROM leases WHERE query = ? AND worker_id = ?',
+                                     [(query, self.worker_id) for query in released])
+                self._db.executemany('INSERT OR REPLACE INTO leases VALUES (?, ?, ?)',
+                                     [(query, self.worker_id, now + self.lease_ttl) for query in mine + taken])
+                self._db.execute('COMMIT')
+            except Exception:
+                self._db.execute('ROLLBACK')
+                raise
+
+            owned = set(mine + taken)
+            gained, lost = owned - self.owned, self.owned - owned
+            self.owned = owned
+        if gained or lost:
+            logger.info(f"Worker {self.worker_id} now polls {len(owned)}/{len(queries)} searches "
+                        f"(+{len(gained)} -{len(lost)}, {live} live workers)")
+        return gained, lost
+
+    def owns(self, query):
+        """Whether this worker currently holds the lease for a query"""
+        return query in self.owned
+
+    def claim(self, query, listing_id):
+        """Reserve a listing for announcement; False if another worker already did
+
+        An undelivered claim older than pending_ttl is taken over.
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                'INSERT INTO claims (query, listing_id, worker_id, claimed_at, delivered) VALUES (?, ?, ?, ?, 0) '
+                'ON CONFLICT (query, listing_id) DO UPDATE SET worker_id = excluded.worker_id,'
+                ' claimed_at = excluded.claimed_at WHERE delivered = 0 AND claimed_at < ?',
+                (query, listing_id, self.worker_id, now, now - self.pending_ttl)
+            )
+        return cursor.rowcount == 1
+
+    def confirm(self, query, listing_id):
+        """Mark our claim as delivered, so it is kept until claim_ttl"""
+        with self._lock:
+            self._db.execute('UPDATE claims SET delivered = 1 WHERE query = ? AND listing_id = ? AND worker_id = ?',
+                             (query, listing_id, self.worker_id))
+
+    def unclaim(self, query, listing_id):
+        """Drop our claim after a failed delivery so the listing can be announced again"""
+        with self._lock:
+            self._db.execute('DELETE FROM claims WHERE query = ? AND listing_id = ? AND worker_id = ?',
+                             (query, listing_id, self.worker_id))
+
+    def expire_claims(self):
+        """Forget claims older than claim_ttl"""
+        with self._lock:
+            self._db.execute('DELETE FROM claims WHERE claimed_at < ?', (time.time() - self.claim_ttl,))
+
+    def close(self):
+        """Release our leases and leave the worker list"""
+        with self._lock:
+            self._db.execute('DELETE FROM leases WHERE worker_id = ?', (self.worker_id,))
+            self._db.execute('DELETE FROM workers WHERE worker_id = ?', (self.worker_id,))
+            self._db.close()
+        self.owned = set()
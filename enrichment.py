@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Detail-page enrichment for new OLX listings
+Offer pages are fetched in the background under a concurrency limit, and the parsed
+details are kept in a size- and TTL-bounded cache keyed by listing ID
+"""
+
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from page_state import find_state
+from parsers import get_backend
+from metrics import metrics
+from transport import get as http_get
+from governor import GONE_STATUSES
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_IMAGE_PREFIX = 'https://via.placeholder.com/'
+
+# OLX parameter labels and keys that map to our detail fields
+PARAM_FIELDS = {
+    'model': ('phonemodel', 'model telefonu', 'model'),
+    'storage': ('builtinmemory_phones', 'builtinmemory', 'wbudowana pamięć', 'pamięć wbudowana'),
+    'condition': ('state', 'stan'),
+}
+PARAM_LOOKUP = {alias: field for field, aliases in PARAM_FIELDS.items() for alias in aliases}
+
+DETAIL_PARAM_SELECTORS = [
+    '[data-testid="ad-parameters-container"] p',
+    '[data-testid="ad-parameters"] li',
+]
+DETAIL_PHOTO_SELECTORS = [
+    '[data-testid="ad-photo"] img',
+    '[data-testid="swiper-image"]',
+    '[data-cy="adPhotos-swiperSlide"] img',
+]
+DETAIL_PRICE_SELECTOR = '[data-testid="ad-price-container"] h3'
+PARAM_RE = re.compile(r'^\s*([^:]+):\s*(.+?)\s*$')
+SELLER_TYPES = {'prywatne': 'Prywatne', 'firmowe': 'Firmowe'}
+
+class TTLCache:
+    """LRU cache whose entries also expire after ttl seconds"""
+
+    def __init__(self, maxsize=2000, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+def details_from_state(state):
+    """Detail fields from an offer page's embedded state"""
+    ad = (state.get('ad') or {}).get('ad')
+    if not isinstance(ad, dict):
+        return None
+    details = {'photos': [], 'params': {}}
+    for param in ad.get('params') or []:
+        key = (param.get('key') or '').lower()
+        name = param.get('name') or key
+        value = param.get('value')
+        if isinstance(value, dict):
+            value = value.get('label') or value.get('key')
+        value = value or param.get('normalizedValue')
+        if value is None:
+            continue
+        details['params'][name] = str(value)
+        field = PARAM_LOOKUP.get(key) or PARAM_LOOKUP.get(name.lower())
+        if field:
+            details[field] = str(value)
+    details['photos'] = [
+        photo.replace('{width}x{height}', '1000x750') if isinstance(photo, str) else photo.get('url')
+        for photo in ad.get('photos') or []
+    ]
+    if 'isBusiness' in ad:
+        details['seller_type'] = 'Firmowe' if ad['isBusiness'] else 'Prywatne'
+    price = ad.get('price') or {}
+    if price.get('displayValue'):
+        details['price'] = price['displayValue']
+    location = ad.get('location') or {}
+    if location.get('cityName'):
+        details['location'] = location['cityName']
+    return details
+
+def details_from_dom(root):
+    """Detail fields from an offer page's markup"""
+    details = {'photos': [], 'params': {}}
+    for selector in DETAIL_PARAM_SELECTORS:
+        for node in root.select(selector):
+            text = node.get_text().strip()
+            match = PARAM_RE.match(text)
+            if match:
+                name, value = match.groups()
+                details['params'][name] = value
+                field = PARAM_LOOKUP.get(name.lower())
+                if field:
+                    details[field] = value
+            elif text.lower() in SELLER_TYPES:
+                details['seller_type'] = SELLER_TYPES[text.lower()]
+        if details['params']:
+            break
+    for selector in DETAIL_PHOTO_SELECTORS:
+        for img in root.select(selector):
+            src = img.get('src') or img.get('data-src')
+            if src and src.startswith('http') and src not in details['photos']:
+                details['photos'].append(src)
+        if details['photos']:
+            break
+    price = root.select_one(DETAIL_PRICE_SELECTOR)
+    if price:
+        details['price'] = price.get_text().strip()
+    return details
+
+def parse_detail_page(content, parser=None):
+    """Parse an /oferta/ page into a details dict"""
+    state = find_state(content)
+    details = details_from_state(state) if state else None
+    if details is None:
+        details = details_from_dom((parser or get_backend()).parse(content))
+    return details
+
+def merge_details(listing, details):
+    """Listing copy with detail fields filled in where the search card had placeholders"""
+    enriched = dict(listing)
+    enriched['details'] = {key: details[key] for key in ('model', 'storage', 'condition', 'seller_type') if details.get(key)}
+    enriched['photos'] = details.get('photos') or listing.get('photos') or []
+    if details.get('price') and listing.get('price') in (None, 'Cena do uzgodnienia'):
+        enriched['price'] = details['price']
+    if details.get('location') and listing.get('location') in (None, 'Brak'):
+        enriched['location'] = details['location']
+    if enriched['photos'] and (not listing.get('image') or listing['image'].startswith(PLACEHOLDER_IMAGE_PREFIX)):
+        enriched['image'] = enriched['photos'][0]
+    return enriched
+
+class DetailEnricher:
+    """Fetches offer pages for new listings in the background"""
+
+    def __init__(self, session, max_concurrent=4, cache=None, timeout=10, parser=None, governor=None):
+        self.session = session
+        self.governor = governor
+        self.timeout = timeout
+        self.parser = parser
+        self.cache = cache if cache is not None else TTLCache()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix='detail-enricher')
+
+    def fetch_details(self, listing):
+        """Details for a listing, from the cache or its offer page"""
+        details = self.cache.get(listing['id'])
+        if details is not None:
+            metrics.inc('enrichment_cache', result='hit')
+            return details
+        metrics.inc('enrichment_cache', result='miss')
+        with metrics.timer('stage_seconds', stage='enrich'):
+            if self.governor:
+                # Offer pages count against the same OLX rate limit and circuit as searches
+                # A deleted offer's 404/410 is not a sign of trouble with OLX
+                response, content, outcome = self.governor.get(self.session, listing['url'], timeout=self.timeout, markers=None,
+                                                               gone_statuses=GONE_STATUSES)
+                if outcome != 'ok':
+                    raise RuntimeError(f"offer page answered HTTP {response.status_code} ({outcome})")
+            else:
+                _, content = http_get(self.session, listing['url'], timeout=self.timeout)
+            details = parse_detail_page(content, self.parser)
+        self.cache.put(listing['id'], details)
+        return details
+
+    def enrich(self, listing):
+        """Enriched listing, or the original one if the offer page can't be read"""
+        try:
+            return merge_details(listing, self.fetch_details(listing))
+        except Exception as e:
+            logger.warning(f"Could not enrich {listing['id']} from {listing['url']}: {e}")
+            return listing
+
+    def submit(self, listing, callback):
+        """Enrich in the background and pass the result to callback(listing)"""
+        future = self._executor.submit(self.enrich, listing)
+        future.add_done_callback(lambda done: callback(done.result()))
+        return future
+
+    def close(self):
+        self._executor.shutdown(wait=True)
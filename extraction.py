@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Single-pass field extraction for OLX listing cards
+The card text is read once and scanned once by a module-level compiled matcher for price, location and date
+"""
+
+import re
+import logging
+from metrics import metrics
+from selector_cache import get_strategy
+
+logger = logging.getLogger(__name__)
+
+CONTAINER_SELECTORS = [
+    '[data-testid="listing"]',
+    '[data-testid="ad-card"]',
+    '.css-1sw7q4x',  # Common OLX listing class
+    '.css-1ap3yc9',  # Another common OLX class
+    '[class*="css-"][class*="listing"]',
+    '[class*="css-"][class*="card"]',
+    '[class*="css-"][class*="offer"]'
+]
+
+IMAGE_SELECTORS = [
+    'img[data-src]',
+    'img[data-lazy-src]',
+    'img[data-original]',
+    'img[src]',
+    '.css-1bmvjcs img',
+    '[class*="image"] img',
+    '[class*="photo"] img',
+    '[class*="thumbnail"] img',
+    'img'
+]
+
+PRICE_SELECTORS = [
+    'span[data-testid="ad-price"]',
+    'p[data-testid="ad-price"]',
+    '.css-1bafgv4',
+    '.css-1u2vqda',
+    '.price',
+    '.offer-price',
+    '[class*="price"]',
+    '[class*="cost"]'
+]
+
+LOCATION_SELECTORS = [
+    'p[data-testid="location-date"]',
+    'span[data-testid="location-date"]',
+    'p[data-testid="location"]',
+    'span[data-testid="location"]',
+    '.css-veheph',
+    '.css-17o22yg',
+    '.css-1a4brun',
+    '[class*="location"]',
+    '[class*="city"]',
+    'small',
+    'span[class*="css-"]',
+    'p[class*="css-"]',
+    '[class*="css-"][class*="location"]',
+    '[class*="css-"][class*="city"]'
+]
+
+CITIES = ['Warszawa', 'Kraków', 'Gdańsk', 'Wrocław', 'Poznań', 'Łódź', 'Szczecin',
+          'Bydgoszcz', 'Lublin', 'Katowice', 'Białystok', 'Gdynia', 'Częstochowa',
+          'Radom', 'Sosnowiec', 'Toruń', 'Kielce', 'Gliwice', 'Zabrze', 'Bytom',
+          'Olsztyn', 'Bielsko-Biała', 'Rzeszów', 'Ruda Śląska', 'Rybnik', 'Tychy',
+          'Dąbrowa Górnicza', 'Płock', 'Elbląg', 'Opole', 'Gorzów Wielkopolski',
+          'Włocławek', 'Zielona Góra', 'Tarnów', 'Chorzów', 'Kalisz', 'Koszalin',
+          'Legnica', 'Grudziądz', 'Słupsk', 'Jaworzno', 'Jastrzębie-Zdrój',
+          'Jelenia Góra', 'Nowy Sącz', 'Konin', 'Piotrków Trybunalski', 'Lubin',
+          'Inowrocław', 'Ostrów Wielkopolski', 'Stargard', 'Mysłowice', 'Piła',
+          'Ostrowiec Świętokrzyski', 'Siedlce', 'Mielec', 'Oława', 'Gniezno',
+          'Głogów', 'Swarzędz', 'Tarnobrzeg', 'Żory', 'Pruszków', 'Racibórz',
+          'Świętochłowice', 'Zawiercie', 'Starachowice', 'Skierniewice', 'Kutno',
+          'Otwock', 'Żywiec', 'Wejherowo', 'Zgierz', 'Będzin', 'Pabianice',
+          'Rumia', 'Świdnica', 'Żyrardów', 'Kraśnik', 'Mikołów', 'Łomża',
+          'Żagań', 'Świnoujście', 'Kołobrzeg', 'Ostrołęka', 'Stalowa Wola',
+          'Myszków', 'Łuków', 'Grodzisk Mazowiecki', 'Skarżysko-Kamienna',
+          'Jarocin', 'Krotoszyn', 'Zduńska Wola', 'Śrem', 'Kłodzko', 'Nowa Sól',
+          'Środa Wielkopolska', 'Gostyń', 'Rawicz', 'Kępno', 'Ostrzeszów', 'Brzesko',
+          'Murowana Goślina', 'Olszowice']
+
+# Promoted ("Wyróżnione") cards are pinned above the newest listings
+PROMOTED_SELECTORS = [
+    '[data-testid="adCard-featured"]',
+    '[class*="featured"]'
+]
+
+PRICE_PATTERN = r'\d+(?:\s*\d+)*(?:,\d+)?\s*(?:zł|PLN|€|\$)'
+
+# Date forms in priority order; only the first five may follow a "Location - " prefix
+DATE_KINDS = ('today_time', 'yesterday_time', 'today', 'yesterday', 'numeric', 'named')
+LOCATION_DATE_KINDS = DATE_KINDS[:5]
+
+CARD_MATCHER = re.compile(
+    r'(?P<today_time>Dzisiaj o \d{1,2}:\d{2})'
+    r'|(?P<yesterday_time>Wczoraj o \d{1,2}:\d{2})'
+    r'|(?P<today>Dzisiaj)'
+    r'|(?P<yesterday>Wczoraj)'
+    r'|(?P<numeric>\d{1,2}\.\d{1,2}\.\d{4})'
+    r'|(?P<named>\d{1,2} \w+ \d{4})'
+    r'|(?P<price>' + PRICE_PATTERN + r')'
+)
+PRICE_RE = re.compile(PRICE_PATTERN)
+# Text right before a date: "Murowana Goślina - "
+LOCATION_PREFIX_RE = re.compile(r'([A-Za-ząćęłńóśźżĄĆĘŁŃÓŚŹŻ\s\-]+)\s*-\s*$')
+LOCATION_PREFIX_WINDOW = 120
+CITY_RE = re.compile('|'.join(re.escape(city.lower()) for city in CITIES))
+CITY_RANK = {city.lower(): (rank, city) for rank, city in enumerate(CITIES)}
+
+CONTAINER_STRATEGY = get_strategy('container', CONTAINER_SELECTORS)
+IMAGE_STRATEGY = get_strategy('image', IMAGE_SELECTORS)
+PRICE_STRATEGY = get_strategy('price', PRICE_SELECTORS)
+LOCATION_STRATEGY = get_strategy('location', LOCATION_SELECTORS)
+
+def scan_text(text):
+    """Run the card matcher once over text and return (price, location, date)"""
+    first_price = None
+    dates = {}
+    for match in CARD_MATCHER.finditer(text):
+        kind = match.lastgroup
+        if kind == 'price':
+            if first_price is None:
+                first_price = match.group()
+        else:
+            dates.setdefault(kind, []).append(match)
+
+    publish_date = None
+    for kind in DATE_KINDS:
+        if kind in dates:
+            # As shown on the card; timeparse turns it into Polish time
+            publish_date = dates[kind][0].group()
+            break
+
+    location = None
+    for kind in LOCATION_DATE_KINDS:
+        for match in dates.get(kind, ()):
+            prefix = LOCATION_PREFIX_RE.search(text, max(0, match.start() - LOCATION_PREFIX_WINDOW), match.start())
+            if prefix and prefix.group(1).strip():
+                location = prefix.group(1).strip()
+                break
+        if location:
+            break
+
+    return first_price, location, publish_date
+
+def find_city(text):
+    """Return the first known city (in CITIES order) mentioned in text"""
+    found = [CITY_RANK[name] for name in CITY_RE.findall(text.lower())]
+    return min(found)[1] if found else None
+
+def is_promoted(card):
+    """Check whether a listing card is a promoted ad"""
+    return any(card.select_one(selector) is not None for selector in PROMOTED_SELECTORS)
+
+def extract_card_fields(card):
+    """Extract price, location and publish date from a listing card in one pass
+
+    Returns a dict with 'price', 'location' and 'publish_date' (each may be None).
+    """
+    text = card.get_text()
+    text_price, location, publish_date = scan_text(text)
+
+    # Dedicated price nodes win over free text
+    def price_probe(selector):
+        node = card.select_one(selector)
+        if node:
+            price_match = PRICE_RE.search(node.get_text())
+            if price_match:
+                return price_match.group()
+        return None
+    price = PRICE_STRATEGY.find(price_probe)
+    if price is None and text_price is not None:
+        price = text_price
+        metrics.inc('selector_hits', field='price', selector='card text')
+    if price is None and card.parent:
+        price_match = PRICE_RE.search(card.parent.get_text())
+        if price_match:
+            price = price_match.group()
+            metrics.inc('selector_hits', field='price', selector='parent text')
+
+    if location is not None:
+        metrics.inc('selector_hits', field='location', selector='card text')
+
+    # Node text is a substring of the card text, so only the "looks like a city" check can still succeed
+    if location is None:
+        def location_probe(selector):
+            node = card.select_one(selector)
+            if node:
+                location_text = node.get_text().strip()
+                if 3 < len(location_text) < 50 and not any(char.isdigit() for char in location_text):
+                    return location_text
+            return None
+        location = LOCATION_STRATEGY.find(location_probe)
+    if location is None:
+        location = find_city(text)
+        if location is not None:
+            metrics.inc('selector_hits', field='location', selector='city list')
+
+    if publish_date:
+        metrics.inc('selector_hits', field='date', selector='card text')
+    else:
+        logger.debug("No date found - will exclude this offer")
+
+    return {'price': price, 'location': location, 'publish_date': publish_date}
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Approximate coordinates of Polish cities, for location radius filters
+Covers the cities the extractor recognises; listings from the page state carry their own map point
+"""
+
+import math
+
+EARTH_RADIUS_KM = 6371.0
+
+# (latitude, longitude) of the city centre
+CITY_COORDS = {
+    'Warszawa': (52.2297, 21.0122), 'Kraków': (50.0647, 19.9450), 'Gdańsk': (54.3520, 18.6466),
+    'Wrocław': (51.1079, 17.0385), 'Poznań': (52.4064, 16.9252), 'Łódź': (51.7592, 19.4560),
+    'Szczecin': (53.4285, 14.5528), 'Bydgoszcz': (53.1235, 18.0084), 'Lublin': (51.2465, 22.5684),
+    'Katowice': (50.2649, 19.0238), 'Białystok': (53.1325, 23.1688), 'Gdynia': (54.5189, 18.5305),
+    'Częstochowa': (50.8118, 19.1203), 'Radom': (51.4027, 21.1471), 'Sosnowiec': (50.2863, 19.1041),
+    'Toruń': (53.0138, 18.5984), 'Kielce': (50.8661, 20.6286), 'Gliwice': (50.2945, 18.6714),
+    'Zabrze': (50.3249, 18.7857), 'Bytom': (50.3484, 18.9157), 'Olsztyn': (53.7784, 20.4801),
+    'Bielsko-Biała': (49.8224, 19.0584), 'Rzeszów': (50.0412, 21.9991), 'Ruda Śląska': (50.2558, 18.8556),
+    'Rybnik': (50.1022, 18.5463), 'Tychy': (50.1218, 18.9877), 'Dąbrowa Górnicza': (50.3217, 19.1949),
+    'Płock': (52.5463, 19.7065), 'Elbląg': (54.1561, 19.4045), 'Opole': (50.6751, 17.9213),
+    'Gorzów Wielkopolski': (52.7368, 15.2288), 'Włocławek': (52.6483, 19.0677), 'Zielona Góra': (51.9356, 15.5062),
+    'Tarnów': (50.0121, 20.9858), 'Chorzów': (50.2975, 18.9546), 'Kalisz': (51.7611, 18.0910),
+    'Koszalin': (54.1944, 16.1722), 'Legnica': (51.2070, 16.1553), 'Grudziądz': (53.4837, 18.7536),
+    'Słupsk': (54.4641, 17.0285), 'Jaworzno': (50.2053, 19.2750), 'Jastrzębie-Zdrój': (49.9570, 18.5736),
+    'Jelenia Góra': (50.9044, 15.7197), 'Nowy Sącz': (49.6175, 20.7153), 'Konin': (52.2230, 18.2511),
+    'Piotrków Trybunalski': (51.4053, 19.7030), 'Lubin': (51.4010, 16.2015), 'Inowrocław': (52.7932, 18.2610),
+    'Ostrów Wielkopolski': (51.6552, 17.8069), 'Stargard': (53.3365, 15.0499), 'Mysłowice': (50.2082, 19.1664),
+    'Piła': (53.1514, 16.7378), 'Ostrowiec Świętokrzyski': (50.9294, 21.3853), 'Siedlce': (52.1677, 22.2901),
+    'Mielec': (50.2872, 21.4239), 'Oława': (50.9460, 17.2926), 'Gniezno': (52.5348, 17.5826),
+    'Głogów': (51.6634, 16.0845), 'Swarzędz': (52.4125, 17.0781), 'Tarnobrzeg': (50.5733, 21.6791),
+    'Żory': (50.0449, 18.7003), 'Pruszków': (52.1706, 20.8120), 'Racibórz': (50.0919, 18.2194),
+    'Świętochłowice': (50.2963, 18.9177), 'Zawiercie': (50.4877, 19.4169), 'Starachowice': (51.0374, 21.0712),
+    'Skierniewice': (51.9549, 20.1583), 'Kutno': (52.2306, 19.3641), 'Otwock': (52.1052, 21.2612),
+    'Żywiec': (49.6856, 19.1925), 'Wejherowo': (54.6057, 18.2356), 'Zgierz': (51.8550, 19.4061),
+    'Będzin': (50.3266, 19.1297), 'Pabianice': (51.6645, 19.3547), 'Rumia': (54.5709, 18.3880),
+    'Świdnica': (50.8446, 16.4886), 'Żyrardów': (52.0488, 20.4453), 'Kraśnik': (50.9243, 22.2197),
+    'Mikołów': (50.1706, 18.9042), 'Łomża': (53.1781, 22.0593), 'Żagań': (51.6178, 15.3152),
+    'Świnoujście': (53.9100, 14.2475), 'Kołobrzeg': (54.1757, 15.5834), 'Ostrołęka': (53.0862, 21.5753),
+    'Stalowa Wola': (50.5826, 22.0534), 'Myszków': (50.5757, 19.3240), 'Łuków': (51.9297, 22.3815),
+    'Grodzisk Mazowiecki': (52.1092, 20.6256), 'Skarżysko-Kamienna': (51.1131, 20.8600), 'Jarocin': (51.9727, 17.5022),
+    'Krotoszyn': (51.6973, 17.4372), 'Zduńska Wola': (51.5990, 18.9394), 'Śrem': (52.0886, 17.0148),
+    'Kłodzko': (50.4346, 16.6612), 'Nowa Sól': (51.8038, 15.7139), 'Środa Wielkopolska': (52.2284, 17.2769),
+    'Gostyń': (51.8796, 17.0127), 'Rawicz': (51.6094, 16.8580), 'Kępno': (51.2781, 17.9894),
+    'Ostrzeszów': (51.4255, 17.9329), 'Brzesko': (49.9690, 20.6076), 'Murowana Goślina': (52.5747, 17.0116),
+    'Olszowice': (50.1014, 20.0856),
+}
+CITY_LOOKUP = {city.lower(): coords for city, coords in CITY_COORDS.items()}
+
+def distance_km(a, b):
+    """Great-circle distance between two (lat, lon) points"""
+    lat1, lon1 = map(math.radians, a)
+    lat2, lon2 = map(math.radians, b)
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Outbound request governor for OLX
+Every OLX request passes a per-host token bucket and a circuit breaker. Responses are classified
+(ok / throttled / blocked / captcha / layout_changed / gone / error); throttling, a block or a captcha opens
+the host's circuit for an exponentially growing cool-down, so a ban is waited out instead of
+extended. After the cool-down a single probe request decides whether the circuit closes again.
+"""
+
+import re
+import time
+import logging
+import threading
+from urllib.parse import urlparse
+from metrics import metrics
+from transport import open_stream, iter_body
+
+logger = logging.getLogger(__name__)
+
+# Markers of bot-check pages served instead of results
+CAPTCHA_RE = re.compile(rb'captcha|challenge-platform|cf-chl-|px-block|Access Denied|Pardon Our Interruption', re.I)
+# A search page has offer links or the embedded state; anything else means the layout changed
+SEARCH_PAGE_MARKERS = (b'/oferta/', b'__PRERENDERED_STATE__')
+# Bot checks are small pages; a full results page that merely mentions "captcha" in a script is not one
+CAPTCHA_MAX_BYTES = 64 * 1024
+TRIPPING_OUTCOMES = ('throttled', 'blocked', 'captcha')
+# Deleted offers answer these; the host is fine, so they must not count towards tripping the circuit
+GONE_STATUSES = (404, 410)
+
+class CircuitOpen(Exception):
+    """Raised instead of sending a request to a host whose circuit is open"""
+
+    def __init__(self, host, retry_in, reason):
+        super().__init__(f"{host} circuit open after {reason}, retry in {retry_in:.0f}s")
+        self.host = host
+        self.retry_in = retry_in
+        self.reason = reason
+
+def classify(response, body, markers=SEARCH_PAGE_MARKERS, complete=True, gone_statuses=()):
+    """Outcome of an OLX response: ok, throttled, blocked, captcha, layout_changed, gone or error
+
+    A body that was not read to the end (the parser stopped early) is never taken for a captcha page.
+    Statuses in gone_statuses (a deleted offer page) give 'gone' instead of 'error'.
+    """
+    status = response.status_code
+    if status == 429 or status == 503:
+        return 'throttled'
+    small = complete and len(body) <= CAPTCHA_MAX_BYTES
+    if status in (401, 403):
+        return 'captcha' if small and CAPTCHA_RE.search(body) else 'blocked'
+    if status in gone_statuses:
+        return 'gone'
+    if status >= 400:
+        return 'error'
+    if small and CAPTCHA_RE.search(body):
+        return 'captcha'
+    if markers and not any(marker in body for marker in markers):
+        return 'layout_changed'
+    return 'ok'
+
+def retry_after(response):
+    """Seconds from a Retry-After header, or None"""
+    value = response.headers.get('Retry-After') if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+class HostState:
+    """Token bucket and circuit breaker of one host"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        # closed -> open (after a block) -> half_open (probing) -> closed or open again
+        self.circuit = 'closed'
+        self.probing = False
+        self.open_until = 0.0
+        self.trips = 0
+        self.closed_at = time.monotonic()
+        self.errors = 0
+        self.reason = None
+        self.last_outcome = None
+        self.last_change = time.time()
+
+class Governor:
+    """Per-host rate limiting and block detection for OLX requests"""
+
+    def __init__(self, per_minute=60, burst=None, base_cooldown=60, max_cooldown=3600, error_threshold=5):
+        self.rate = per_minute / 60
+        self.capacity = burst or max(1.0, per_minute / 6)
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.error_threshold = error_threshold
+        self.hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, host):
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = HostState(self.rate, self.capacity)
+        return state
+
+    def blocked_for(self, url):
+        """Seconds until requests to url's host may be sent again (0 when the circuit is not open)"""
+        host = urlparse(url).hostname
+        with self._lock:
+            state = self.hosts.get(host)
+            if state is None or state.circuit != 'open':
+                return 0.0
+            return max(0.0, state.open_until - time.monotonic())
+
+    def admit(self, url):
+        """Wait for a token for url's host; raises CircuitOpen while the host is cooling down"""
+        host = urlparse(url).hostname
+        while True:
+            with self._lock:
+                state = self._host(host)
+                now = time.monotonic()
+                if state.circuit == 'open':
+                    if now < state.open_until:
+                        raise CircuitOpen(host, state.open_until - now, state.reason)
+                    state.circuit = 'half_open'
+                    state.last_change = time.time()
+                    logger.info(f"Cool-down for {host} over, sending a probe request")
+                elif state.circuit == 'half_open' and state.probing:
+                    # One probe at a time; everyone else waits for its verdict
+                    raise CircuitOpen(host, 1.0, state.reason)
+                state.tokens = min(state.capacity, state.tokens + (now - state.updated) * state.rate)
+                state.updated = now
+                if state.tokens >= 1:
+                    state.tokens -= 1
+                    state.probing = state.circuit == 'half_open'
+                    return
+                wait = (1 - state.tokens) / state.rate
+            metrics.inc('governor_waits', host=host)
+            time.sleep(wait)
+
+    def record(self, url, outcome, response=None):
+        """Feed a request outcome into the host's circuit"""
+        host = urlparse(url).hostname
+        metrics.inc('olx_responses', host=host, outcome=outcome)
+        with self._lock:
+            state = self._host(host)
+            state.last_outcome = outcome
+            state.probing = False
+            if outcome in TRIPPING_OUTCOMES or (outcome == 'error' and state.errors + 1 >= self.error_threshold):
+                self._trip(host, state, outcome, retry_after(response))
+            elif outcome == 'error':
+                state.errors += 1
+                if state.circuit == 'half_open':
+                    self._trip(host, state, outcome, None)
+            else:
+                # layout_changed is a parsing problem and gone a deleted page, not a block, so they close the circuit too
+                if state.circuit != 'closed':
+                    logger.info(f"✅ {host} answers normally again, closing its circuit")
+                    state.last_change = time.time()
+                    state.closed_at = time.monotonic()
+                state.circuit = 'closed'
+                state.errors = 0
+                state.reason = None
+            metrics.set('circuit_open', int(state.circuit == 'open'), host=host)
+        if outcome == 'layout_changed':
+            logger.warning(f"{url} returned a page without listings or page state; the OLX layout may have changed")
+
+    def _trip(self, host, state, reason, retry_after_seconds):
+        if state.circuit == 'closed' and time.monotonic() - state.closed_at > self.max_cooldown:
+            # Long enough without trouble to start the cool-down over from the base
+            state.trips = 0
+        state.trips += 1
+        state.errors = 0
+        cooldown = min(self.max_cooldown, self.base_cooldown * 2 ** (state.trips - 1))
+        if retry_after_seconds:
+            cooldown = max(cooldown, min(retry_after_seconds, self.max_cooldown))
+        state.circuit = 'open'
+        state.open_until = time.monotonic() + cooldown
+        state.reason = reason
+        state.last_change = time.time()
+        metrics.inc('circuit_trips', host=host, reason=reason)
+        logger.error(f"🚫 {host} answered {reason}, pausing requests to it for {cooldown:.0f}s (trip {state.trips})")
+
+    def open(self, session, url, timeout=30, stats=None):
+        """Admit and send a GET; returns the response with its body unread (see finish)
+
+        stats, if given, gets 'admitted_at': the monotonic time the request got its token.
+        """
+        self.admit(url)
+        if stats is not None:
+            stats['admitted_at'] = time.monotonic()
+        try:
+            return open_stream(session, url, timeout=timeout)
+        except Exception:
+            self.record(url, 'error')
+            raise
+
+    def finish(self, url, response, body, markers=SEARCH_PAGE_MARKERS, complete=True, gone_statuses=()):
+        """Classify and record a response opened with open(); returns the outcome"""
+        outcome = classify(response, body, markers, complete, gone_statuses)
+        self.record(url, outcome, response)
+        return outcome
+
+    def get(self, session, url, timeout=30, markers=SEARCH_PAGE_MARKERS, gone_statuses=(), stats=None):
+        """Governed GET; returns (response, body, outcome) and raises CircuitOpen while cooling down"""
+        response = self.open(session, url, timeout=timeout, stats=stats)
+        try:
+            body = b''.join(iter_body(session, response, url))
+        except Exception:
+            self.record(url, 'error')
+            raise
+        finally:
+            response.close()
+        return response, body, self.finish(url, response, body, markers, gone_statuses=gone_statuses)
+
+    def state(self):
+        """Circuit state per host, for /health"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                host: {
+                    'circuit': state.circuit,
+                    'reason': state.reason,
+                    'last_outcome': state.last_outcome,
+                    'trips': state.trips,
+                    'retry_in': round(max(0.0, state.open_until - now), 1) if state.circuit == 'open' else 0,
+                    'since': time.strftime('%Y-%m-%dT%H:%M:%S+00:00', time.gmtime(state.last_change)),
+                }
+                for host, state in self.hosts.items()
+            }
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Listing history for the OLX Sniper Bot
+Every extracted listing is kept in SQLite (WAL mode) with its price changes over time. The poll loop
+only buffers listings; they are written in one transaction per poll cycle, and price changes are logged
+by a trigger. Readers (the /listings and /stats endpoints) use their own read-only connections, so
+they never wait on or block the writer.
+"""
+
+import time
+import sqlite3
+import logging
+import threading
+from pricing import parse_price, group_key
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS listings ('
+    ' query TEXT NOT NULL, listing_id TEXT NOT NULL, title TEXT, url TEXT, price REAL, price_text TEXT,'
+    ' location TEXT, image TEXT, model TEXT, published_at TEXT,'
+    ' first_seen REAL NOT NULL, last_seen REAL NOT NULL, sightings INTEGER NOT NULL DEFAULT 1,'
+    ' UNIQUE (query, listing_id))',
+    'CREATE TABLE IF NOT EXISTS price_changes ('
+    ' query TEXT NOT NULL, listing_id TEXT NOT NULL, changed_at REAL NOT NULL, price REAL, price_text TEXT)',
+    'CREATE INDEX IF NOT EXISTS listings_by_query ON listings (query, first_seen)',
+    'CREATE INDEX IF NOT EXISTS listings_by_time ON listings (first_seen)',
+    'CREATE INDEX IF NOT EXISTS listings_by_model ON listings (model, price)',
+    'CREATE INDEX IF NOT EXISTS listings_by_price ON listings (price)',
+    'CREATE INDEX IF NOT EXISTS price_changes_by_listing ON price_changes (query, listing_id, changed_at)',
+    'CREATE INDEX IF NOT EXISTS price_changes_by_time ON price_changes (changed_at)',
+    # The first price and every later change, written by SQLite itself during the batch upsert
+    'CREATE TRIGGER IF NOT EXISTS listing_priced AFTER INSERT ON listings BEGIN'
+    ' INSERT INTO price_changes VALUES (new.query, new.listing_id, new.first_seen, new.price, new.price_text); END',
+    'CREATE TRIGGER IF NOT EXISTS listing_repriced AFTER UPDATE OF price_text ON listings'
+    ' WHEN old.price_text IS NOT new.price_text BEGIN'
+    ' INSERT INTO price_changes VALUES (new.query, new.listing_id, new.last_seen, new.price, new.price_text); END',
+)
+
+UPSERT = (
+    'INSERT INTO listings (query, listing_id, title, url, price, price_text, location, image, model, published_at,'
+    ' first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+    'ON CONFLICT (query, listing_id) DO UPDATE SET title = excluded.title, url = excluded.url,'
+    ' price = excluded.price, price_text = excluded.price_text, location = excluded.location,'
+    ' image = coalesce(excluded.image, image), model = coalesce(excluded.model, model),'
+    ' published_at = coalesce(excluded.published_at, published_at),'
+    ' last_seen = excluded.last_seen, sightings = sightings + 1'
+)
+
+def iso(timestamp):
+    return time.strftime('%Y-%m-%dT%H:%M:%S+00:00', time.gmtime(timestamp)) if timestamp else None
+
+class ListingHistory:
+    """Writer side: buffers listings during a poll cycle and writes them in one transaction"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        # Poll cycles of different searches may flush at the same time
+        self._write_lock = threading.Lock()
+        self._pending = {}
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        with self._db:
+            for statement in SCHEMA:
+                self._db.execute(statement)
+
+    def record(self, query, listings, now=None):
+        """Buffer listings seen by a poll of query; rows are built and written by the next flush"""
+        now = now or time.time()
+        with self._lock:
+            for listing in listings:
+                self._pending[(query, listing['id'])] = (listing, now)
+
+    def flush(self):
+        """Write the buffered listings in one transaction"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        rows = [
+            (query, listing_id, listing.get('title'), listing.get('url'), parse_price(listing), listing.get('price'),
+             listing.get('location'), listing.get('image'), group_key(listing), listing.get('published_at'), now, now)
+            for (query, listing_id), (listing, now) in pending.items()
+        ]
+        with self._write_lock:
+            try:
+                with metrics.timer('stage_seconds', stage='history_write'), self._db:
+                    self._db.executemany(UPSERT, rows)
+            except Exception as e:
+                logger.error(f"Error saving listing history: {e}")
+                with self._lock:
+                    for key, item in pending.items():
+                        self._pending.setdefault(key, item)
+
+    def close(self):
+        """Flush buffered listings and close the database"""
+        self.flush()
+        self._db.close()
+
+class HistoryReader:
+    """Read-only, paginated queries over the listing history, one connection per thread"""
+
+    def __init__(self, path, max_limit=200):
+        self.path = path
+        self.max_limit = max_limit
+        self._local = threading.local()
+
+    def _connection(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            # mode=ro: never takes the write lock; WAL lets it read while the bot writes
+            db = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True)
+            db.row_factory = sqlite3.Row
+            self._local.db = db
+        return db
+
+    def listings(self, query=None, model=None, min_price=None, max_price=None, since=None, cursor=None, limit=50):
+        """A page of listings, newest first; pass the returned 'next' back as cursor for the following page"""
+        limit = max(1, min(int(limit), self.max_limit))
+        where, params = [], []
+        for clause, value in (('query = ?', query), ('model = ?', model), ('price >= ?', min_price),
+                              ('price <= ?', max_price), ('first_seen >= ?', since)):
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+        if cursor:
+            first_seen, rowid = cursor.split(':')
+            where.append('(first_seen, rowid) < (?, ?)')
+            params += [float(first_seen), int(rowid)]
+        db = self._connection()
+        rows = db.execute(
+            f"SELECT rowid, * FROM listings {'WHERE ' + ' AND '.join(where) if where else ''} "
+            'ORDER BY first_seen DESC, rowid DESC LIMIT ?', params + [limit + 1]
+        ).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        history = {}
+        if rows:
+            keys = [(row['query'], row['listing_id']) for row in rows]
+            changes = db.execute(
+                'SELECT query, listing_id, changed_at, price, price_text FROM price_changes '
+                f"WHERE (query, listing_id) IN (VALUES {', '.join('(?, ?)' for _ in keys)}) ORDER BY changed_at",
+                [value for key in keys for value in key]
+            )
+            for change in changes:
+                history.setdefault((change['query'], change['listing_id']), []).append(
+                    {'at': iso(change['changed_at']), 'price': change['price'], 'price_text': change['price_text']}
+                )
+        return {
+            'listings': [
+                {
+                    'id': row['listing_id'], 'query': row['query'], 'title': row['title'], 'url': row['url'],
+                    'price': row['price'], 'price_text': row['price_text'], 'location': row['location'],
+                    'image': row['image'], 'model': row['model'], 'published_at': row['published_at'],
+                    'first_seen': iso(row['first_seen']), 'last_seen': iso(row['last_seen']), 'sightings': row['sightings'],
+                    'price_history': history.get((row['query'], row['listing_id']), []),
+                }
+                for row in rows
+            ],
+            'next': f"{rows[-1]['first_seen']!r}:{rows[-1]['rowid']}" if more else None,
+        }
+
+    def stats(self, query=None, since=None, limit=50):
+        """Listing counts and price ranges per model, and price drops, optionally for one search or period"""
+        where, params = [], []
+        if query is not None:
+            where.append('query = ?')
+            params.append(query)
+        if since is not None:
+            where.append('first_seen >= ?')
+            params.append(since)
+        condition = f"WHERE {' AND '.join(where)}" if where else ''
+        db = self._connection()
+        total, priced, first, last = db.execute(
+            f'SELECT COUNT(*), COUNT(price), MIN(first_seen), MAX(last_seen) FROM listings {condition}', params
+        ).fetchone()
+        models = db.execute(
+            f"SELECT model, COUNT(*) AS listings, MIN(price) AS min_price, AVG(price) AS avg_price, MAX(price) AS max_price "
+            f"FROM listings {condition} {'AND' if where else 'WHERE'} model IS NOT NULL "
+            'GROUP BY model ORDER BY listings DESC LIMIT ?', params + [max(1, min(int(limit), self.max_limit))]
+        ).fetchall()
+        # Each change is compared with the one before it, even if that one is older than since
+        drops = db.execute(
+            'SELECT COUNT(*) FROM (SELECT changed_at, price,'
+            ' LAG(price) OVER (PARTITION BY query, listing_id ORDER BY changed_at) AS previous FROM price_changes'
+            f"{' WHERE query = ?' if query is not None else ''}) WHERE price < previous AND changed_at >= ?",
+            ([query] if query is not None else []) + [since or 0]
+        ).fetchone()[0]
+        return {
+            'listings': total,
+            'priced': priced,
+            'price_drops': drops,
+            'first_seen': iso(first),
+            'last_seen': iso(last),
+            'models': [
+                {'model': row['model'], 'listings': row['listings'], 'min_price': row['min_price'],
+                 'avg_price': round(row['avg_price'], 2) if row['avg_price'] is not None else None,
+                 'max_price': row['max_price']}
+                for row in models
+            ],
+        }
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Lightweight metrics for the OLX Sniper Bot
+Each thread records into its own shard without locking; shards are only summed when /metrics is scraped
+"""
+
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())) if labels else ())
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+class _Shard:
+    __slots__ = ('histograms', 'counters', 'gauges')
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+
+class MetricsRegistry:
+    """Histograms, counters and gauges aggregated per thread"""
+
+    def __init__(self, prefix='olx_sniper', buckets=DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self.metric_buckets = {}
+        self.help = {}
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def describe(self, name, text):
+        """Set the HELP text of a metric"""
+        self.help[name] = text
+
+    def set_buckets(self, name, buckets):
+        """Use different histogram bucket bounds for one metric (before it is first observed)"""
+        self.metric_buckets[name] = tuple(buckets)
+
+    def observe(self, name, value, **labels):
+        """Record a value (usually seconds) in a histogram"""
+        histograms = self._shard().histograms
+        key = _key(name, labels)
+        buckets = self.metric_buckets.get(name, self.buckets)
+        entry = histograms.get(key)
+        if entry is None:
+            entry = histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def inc(self, name, amount=1, **labels):
+        """Increase a counter"""
+        counters = self._shard().counters
+        key = _key(name, labels)
+        counters[key] = counters.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        """Set a gauge"""
+        self._shard().gauges[_key(name, labels)] = (time.monotonic(), value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Time a block into a histogram"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def collect(self):
+        """Merge every thread's shard into (histograms, counters, gauges)"""
+        with self._lock:
+            shards = list(self._shards)
+        histograms, counters, gauges = {}, {}, {}
+        for shard in shards:
+            for key, (counts, total, count) in list(shard.histograms.items()):
+                merged = histograms.setdefault(key, [[0] * len(counts), 0.0, 0])
+                for i, value in enumerate(counts):
+                    merged[0][i] += value
+                merged[1] += total
+                merged[2] += count
+            for key, value in list(shard.counters.items()):
+                counters[key] = counters.get(key, 0) + value
+            for key, (stamp, value) in list(shard.gauges.items()):
+                # Latest write wins when several threads set the same gauge
+                if key not in gauges or gauges[key][0] < stamp:
+                    gauges[key] = (stamp, value)
+        return histograms, counters, {key: value for key, (_, value) in gauges.items()}
+
+    def render(self):
+        """Prometheus text exposition format"""
+        histograms, counters, gauges = self.collect()
+        lines = []
+
+        def header(name, kind):
+            full = f'{self.prefix}_{name}'
+            if name in self.help:
+                lines.append(f'# HELP {full} {self.help[name]}')
+            lines.append(f'# TYPE {full} {kind}')
+            return full
+
+        for name in sorted({name for name, _ in histograms}):
+            full = header(name, 'histogram')
+            for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(self.metric_buckets.get(name, self.buckets), counts):
+                    cumulative += bucket_count
+                    lines.append(f'{full}_bucket{_format_labels(labels, ("le", bound))} {cumulative}')
+                lines.append(f'{full}_bucket{_format_labels(labels, ("le", "+Inf"))} {count}')
+                lines.append(f'{full}_sum{_format_labels(labels)} {total}')
+                lines.append(f'{full}_count{_format_labels(labels)} {count}')
+
+        for name in sorted({name for name, _ in counters}):
+            full = header(name, 'counter')
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{full}_total{_format_labels(labels)} {value}')
+
+        for name in sorted({name for name, _ in gauges}):
+            full = header(name, 'gauge')
+            for (metric, labels), value in sorted(gauges.items()):
+                if metric == name:
+                    lines.append(f'{full}{_format_labels(labels)} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+metrics.describe('stage_seconds', 'Time spent in each poll cycle stage')
+metrics.describe('selector_hits', 'Extraction selectors that produced a value')
+metrics.describe('selector_relearns', 'Times a field dropped its winning selector after repeated misses')
+metrics.describe('deals_flagged', 'New listings priced below the deal percentile of their model')
+metrics.describe('alert_latency_seconds', 'Seconds from OLX publish time to detection (stage=detect) and to Discord delivery (stage=notify)')
+metrics.set_buckets('alert_latency_seconds', (15, 30, 45, 60, 90, 120, 180, 300, 600, 1800, 3600, 4 * 3600))
+metrics.describe('olx_responses', 'OLX responses by outcome: ok, throttled, blocked, captcha, layout_changed or error')
+metrics.describe('circuit_open', '1 while requests to a host are paused after a block')
+metrics.describe('reposts', 'New listings that look like a repost of a recent one')
+metrics.describe('catchup_pages', 'Result pages read by catch-up scans after an outage')
+metrics.describe('http_phase_seconds', 'HTTP connect, time-to-first-byte, download and warm-up times per host')
+metrics.describe('http_connections', 'New TCP/TLS connections opened per host')
+metrics.describe('dns_cache', 'DNS lookups answered from the cache or the resolver')
+metrics.describe('parse_failures', 'Polls whose page could not be fetched or parsed')
+metrics.describe('webhook_retries', 'Discord webhook calls that had to be retried')
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Discord notification sink for the OLX Sniper Bot
+Listings are queued and sent by background workers, up to 10 embeds per webhook call,
+paced by Discord's rate limit headers instead of fixed sleeps
+"""
+
+import time
+import logging
+import threading
+from metrics import metrics
+from transport import create_session, touch
+from sinks import Sink, RetryableError, CompiledTemplate, rendered
+
+logger = logging.getLogger(__name__)
+
+DISCORD_MAX_EMBEDS = 10
+DISCORD_MAX_BUTTONS_PER_ROW = 5
+
+DISCORD_DESCRIPTION = CompiledTemplate(
+    "📌 {title}\n💰 Cena: {price}\n📍 Lokalizacja: {location}\n📅 Data: {publish_date}{deal_line}{repost_line}"
+)
+
+def build_embed(listing, timestamp=None):
+    """Discord embed for a single listing (a dict or a RenderedListing)"""
+    item = rendered(listing)
+    listing = item.listing
+    embed_data = {
+        "title": f"{item.values['deal_mark']}{listing['title']}",
+        "url": listing['url'],
+        "color": 3066993,  # Green color
+        "timestamp": timestamp or item.rendered_at,
+        "description": item.text(DISCORD_DESCRIPTION)
+    }
+
+    # Priced below the usual range for its model
+    if listing.get('deal'):
+        embed_data["color"] = 15105570  # Orange color
+
+    # Detail-page fields, when the listing was enriched
+    details = listing.get('details') or {}
+    fields = [
+        {"name": name, "value": details[key], "inline": True}
+        for key, name in (('model', '📱 Model'), ('storage', '💾 Pamięć'), ('condition', '✨ Stan'), ('seller_type', '👤 Sprzedawca'))
+        if details.get(key)
+    ]
+    if fields:
+        embed_data["fields"] = fields
+
+    # Watch rules that routed the listing here
+    if listing.get('rules'):
+        embed_data["footer"] = {"text": f"🎯 {', '.join(listing['rules'])}"}
+
+    # Add thumbnail if image available
+    if listing['image']:
+        embed_data["thumbnail"] = {"url": listing['image']}
+    else:
+        embed_data["thumbnail"] = {"url": "https://www.olx.pl/favicon.ico"}
+    return embed_data
+
+def build_payload(listings):
+    """Webhook payload with one embed and one "KUP TERAZ" button per listing
+
+    Embeds are rendered once per listing and reused by every webhook the listing goes to.
+    """
+    items = [rendered(listing) for listing in listings]
+    buttons = [{
+        "type": 2,
+        "style": 5,
+        "label": "KUP TERAZ" if len(items) == 1 else f"KUP TERAZ #{index}",
+        "url": item.listing['url'],
+        "emoji": {"name": "🔗"}
+    } for index, item in enumerate(items, 1)]
+    return {
+        "content": "",
+        "username": "OLX Sniper Bot",
+        "embeds": [item.get('discord', build_embed) for item in items],
+        "components": [
+            {"type": 1, "components": buttons[i:i + DISCORD_MAX_BUTTONS_PER_ROW]}
+            for i in range(0, len(buttons), DISCORD_MAX_BUTTONS_PER_ROW)
+        ]
+    }
+
+class DiscordDispatcher(Sink):
+    """Discord webhook sink: up to 10 embeds per call, paced by Discord's rate limit headers"""
+
+    name = 'discord'
+
+    def __init__(self, webhook_url, workers=1, batch_size=DISCORD_MAX_EMBEDS, linger=0.5, max_retries=3, timeout=10, session=None):
+        self.webhook_url = webhook_url
+        self.timeout = timeout
+        # Kept-alive pool, possibly shared with other dispatchers
+        self.session = session or create_session(pool_maxsize=max(workers, 4))
+        self._rate_lock = threading.Lock()
+        self._blocked_until = 0.0
+        super().__init__(workers=workers, batch_size=min(batch_size, DISCORD_MAX_EMBEDS), linger=linger,
+                         max_retries=max_retries, backoff=2.0)
+
+    def before_attempt(self):
+        with self._rate_lock:
+            delay = self._blocked_until - time.monotonic()
+        if delay > 0:
+            logger.info(f"Discord rate limit reached, waiting {delay:.2f}s")
+            time.sleep(delay)
+
+    def _update_rate_limit(self, response):
+        """Track the bucket state from X-RateLimit-* and Retry-After headers"""
+        headers = response.headers
+        delay = 0.0
+        if response.status_code == 429:
+            retry_after = headers.get('Retry-After')
+            if retry_after is None:
+                try:
+                    retry_after = response.json().get('retry_after')
+                except ValueError:
+                    retry_after = None
+            delay = float(retry_after or 1)
+        elif headers.get('X-RateLimit-Remaining') == '0':
+            delay = float(headers.get('X-RateLimit-Reset-After', 1))
+        if delay > 0:
+            with self._rate_lock:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+        return delay
+
+    def deliver(self, items):
+        """Send listings in one webhook call"""
+        payload = build_payload(items)
+        started = time.perf_counter()
+        response = self.session.post(self.webhook_url, json=payload, timeout=self.timeout)
+        metrics.observe('http_phase_seconds', time.perf_counter() - started, phase='request', host='discord')
+        touch(self.session, self.webhook_url)
+        self._update_rate_limit(response)
+        if response.status_code == 429:
+            # The wait happens in before_attempt, from the headers recorded above
+            raise RetryableError("rate limited by Discord", delay=0, reason='rate_limited')
+        if response.status_code >= 500:
+            raise RetryableError(f"Discord server error {response.status_code}", reason='server_error')
+        response.raise_for_status()
+        logger.info(f"✅ Sent notification for: {', '.join(item.listing['title'] for item in items)}")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Structured listing data from the state blob OLX embeds in its search pages
+(window.__PRERENDERED_STATE__), used before falling back to DOM heuristics
+"""
+
+import re
+import json
+import logging
+from metrics import metrics
+from timeparse import parse_timestamp, format_publish_date
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+# The state is a JSON document serialized a second time as a JS string literal
+STATE_RE = re.compile(rb'window\.__PRERENDERED_STATE__\s*=\s*("[^"\\]*(?:\\.[^"\\]*)*")', re.S)
+PHOTO_SIZE = '400x300'
+
+def find_state(content):
+    """Decode the embedded page state, or None if the page has none"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    match = STATE_RE.search(content)
+    if not match:
+        return None
+    try:
+        state = _loads(_loads(match.group(1)))
+    except ValueError as e:
+        metrics.inc('parse_failures', reason='state_decode')
+        logger.warning(f"Could not decode embedded page state: {e}")
+        return None
+    return state if isinstance(state, dict) else None
+
+def find_ads(content):
+    """Raw ad objects from the page state in page order, or None if unavailable"""
+    state = find_state(content)
+    if state is None:
+        return None
+    ads = (state.get('listing') or {}).get('listing', {}).get('ads')
+    if not isinstance(ads, list):
+        return None
+    return ads
+
+def is_promoted_ad(ad):
+    """Check whether an ad is a promoted (pinned) one"""
+    promotion = ad.get('promotion') or {}
+    return bool(ad.get('isPromoted') or promotion.get('top_ad'))
+
+def ad_to_listing(ad, listing_id):
+    """Map a state ad to the bot's listing dict"""
+    price = ad.get('price') or {}
+    regular_price = price.get('regularPrice') or {}
+    location = ad.get('location') or {}
+    photos = [photo.replace('{width}x{height}', PHOTO_SIZE) for photo in ad.get('photos') or [] if isinstance(photo, str)]
+    published = parse_timestamp(ad.get('createdTime'))
+
+    point = ad.get('map') or {}
+    coordinates = (point['lat'], point['lon']) if point.get('lat') is not None and point.get('lon') is not None else None
+
+    city = location.get('cityName')
+    if city and location.get('districtName'):
+        city = f"{city}, {location['districtName']}"
+
+    return {
+        'id': listing_id,
+        'title': ad.get('title') or "iPhone na OLX",
+        'url': ad['url'],
+        'price': price.get('displayValue') or 'Cena do uzgodnienia',
+        'location': city or 'Brak',
+        'image': photos[0] if photos else 'https://via.placeholder.com/300x200/007AFF/FFFFFF?text=iPhone',
+        'publish_date': format_publish_date(published) if published else None,
+        'price_value': regular_price.get('value'),
+        'currency': regular_price.get('currencyCode'),
+        'published_at': published.isoformat() if published else None,
+        'photos': photos,
+        'ad_id': ad.get('id'),
+        'coordinates': coordinates,
+    }
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+HTML parser backends for the OLX Sniper Bot
+Every backend exposes the same small node API so listing extraction runs unchanged on top of it
+"""
+
+import re
+import sys
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tags whose text BeautifulSoup leaves out of get_text()
+NON_TEXT_TAGS = ('script', 'style', 'template')
+
+_CSS_TOKEN_RE = re.compile(
+    r'(?P<tag>^[a-zA-Z][\w-]*|\*)'
+    r'|\.(?P<cls>[\w-]+)'
+    r'|\[(?P<attr>[\w-]+)(?:(?P<op>\*?=)"(?P<value>[^"]*)")?\]'
+)
+
+def css_to_xpath(selector):
+    """Translate the simple CSS selectors used by the bot into an XPath expression
+
+    Supports tag names, .class, [attr], [attr="value"], [attr*="value"] and the descendant combinator.
+    """
+    steps = []
+    for compound in selector.split():
+        tag = '*'
+        conditions = []
+        pos = 0
+        while pos < len(compound):
+            match = _CSS_TOKEN_RE.match(compound, pos)
+            if not match or match.end() == pos:
+                raise ValueError(f"Unsupported CSS selector: {selector}")
+            if match.group('tag'):
+                tag = match.group('tag').lower()
+            elif match.group('cls'):
+                conditions.append(f"contains(concat(' ', normalize-space(@class), ' '), ' {match.group('cls')} ')")
+            elif match.group('op') == '=':
+                conditions.append(f"@{match.group('attr')}=\"{match.group('value')}\"")
+            elif match.group('op') == '*=':
+                conditions.append(f"contains(@{match.group('attr')}, \"{match.group('value')}\")")
+            else:
+                conditions.append(f"@{match.group('attr')}")
+            pos = match.end()
+        steps.append('descendant::' + tag + ''.join(f'[{condition}]' for condition in conditions))
+    return '/'.join(steps)
+
+def css_matcher(selector):
+    """Predicate (tag, attrib) -> bool for a single compound CSS selector, or None if it has combinators
+
+    Supports the same tokens as css_to_xpath, for matching elements as a streaming parser opens them.
+    """
+    if len(selector.split()) != 1:
+        return None
+    tag = None
+    tests = []
+    pos = 0
+    while pos < len(selector):
+        match = _CSS_TOKEN_RE.match(selector, pos)
+        if not match or match.end() == pos:
+            raise ValueError(f"Unsupported CSS selector: {selector}")
+        if match.group('tag'):
+            tag = None if match.group('tag') == '*' else match.group('tag').lower()
+        elif match.group('cls'):
+            tests.append(lambda attrib, cls=match.group('cls'): cls in (attrib.get('class') or '').split())
+        elif match.group('op') == '=':
+            tests.append(lambda attrib, name=match.group('attr'), value=match.group('value'): attrib.get(name) == value)
+        elif match.group('op') == '*=':
+            tests.append(lambda attrib, name=match.group('attr'), value=match.group('value'): value in (attrib.get(name) or ''))
+        else:
+            tests.append(lambda attrib, name=match.group('attr'): name in attrib)
+        pos = match.end()
+    return lambda element_tag, attrib: (tag is None or element_tag == tag) and all(test(attrib) for test in tests)
+
+class SoupNode:
+    """Node adapter over a BeautifulSoup tag"""
+    __slots__ = ('_el',)
+
+    _compiled = {}
+
+    def __init__(self, el):
+        self._el = el
+
+    def __eq__(self, other):
+        return isinstance(other, SoupNode) and self._el is other._el
+
+    def __hash__(self):
+        return id(self._el)
+
+    @classmethod
+    def _compile(cls, selector):
+        compiled = cls._compiled.get(selector)
+        if compiled is None:
+            import soupsieve
+            compiled = cls._compiled[selector] = soupsieve.compile(selector)
+        return compiled
+
+    @property
+    def name(self):
+        return self._el.name
+
+    @property
+    def parent(self):
+        parent = self._el.parent
+        # The BeautifulSoup document object is not an element
+        if parent is None or parent.parent is None:
+            return None
+        return SoupNode(parent)
+
+    def get(self, attr, default=None):
+        value = self._el.get(attr)
+        if value is None:
+            return default
+        return value
+
+    def get_classes(self):
+        classes = self._el.get('class', [])
+        return classes.split() if isinstance(classes, str) else list(classes)
+
+    def get_text(self):
+        return self._el.get_text()
+
+    def select(self, selector):
+        return [SoupNode(el) for el in self._compile(selector).select(self._el)]
+
+    def select_one(self, selector):
+        el = self._compile(selector).select_one(self._el)
+        return SoupNode(el) if el is not None else None
+
+    def find(self, tag, href=False):
+        el = self._el.find(tag, href=True) if href else self._el.find(tag)
+        return SoupNode(el) if el is not None else None
+
+    def find_all(self, tag, href=False):
+        els = self._el.find_all(tag, href=True) if href else self._el.find_all(tag)
+        return [SoupNode(el) for el in els]
+
+    def html(self):
+        return str(self._el)
+
+class LxmlNode:
+    """Node adapter over an lxml element, with selectors compiled to XPath"""
+    __slots__ = ('_el',)
+
+    _compiled = {}
+
+    def __init__(self, el):
+        self._el = el
+
+    def __eq__(self, other):
+        return isinstance(other, LxmlNode) and self._el is other._el
+
+    def __hash__(self):
+        return id(self._el)
+
+    @classmethod
+    def _compile(cls, expression):
+        compiled = cls._compiled.get(expression)
+        if compiled is None:
+            from lxml import etree
+            compiled = cls._compiled[expression] = etree.XPath(expression)
+        return compiled
+
+    @property
+    def name(self):
+        return self._el.tag
+
+    @property
+    def parent(self):
+        parent = self._el.getparent()
+        return LxmlNode(parent) if parent is not None else None
+
+    def get(self, attr, default=None):
+        if attr == 'class':
+            return self.get_classes() if self._el.get('class') is not None else default
+        return self._el.get(attr, default)
+
+    def get_classes(self):
+        return (self._el.get('class') or '').split()
+
+    def get_text(self):
+        return ''.join(self._el.itertext())
+
+    def select(self, selector):
+        return [LxmlNode(el) for el in self._compile(css_to_xpath(selector))(self._el)]
+
+    def select_one(self, selector):
+        found = self._compile(f'({css_to_xpath(selector)})[1]')(self._el)
+        return LxmlNode(found[0]) if found else None
+
+    def find(self, tag, href=False):
+        found = self._compile(f"descendant::{tag}{'[@href]' if href else ''}[1]")(self._el)
+        return LxmlNode(found[0]) if found else None
+
+    def find_all(self, tag, href=False):
+        return [LxmlNode(el) for el in self._compile(f"descendant::{tag}{'[@href]' if href else ''}")(self._el)]
+
+    def html(self):
+        from lxml import etree
+        return etree.tostring(self._el, encoding='unicode', with_tail=False)
+
+class ParserBackend:
+    """Turns a response body into a root node"""
+    name = None
+
+    def parse(self, content, encoding=None):
+        raise NotImplementedError
+
+class LxmlBackend(ParserBackend):
+    """libxml2 parser with XPath (C) selector evaluation"""
+    name = 'lxml'
+
+    def __init__(self):
+        from lxml import etree
+        self._etree = etree
+
+    def parse(self, content, encoding=None):
+        etree = self._etree
+        parser = etree.HTMLParser(encoding=encoding or 'utf-8', remove_comments=True)
+        if isinstance(content, str):
+            content = content.encode(encoding or 'utf-8')
+        root = etree.fromstring(content, parser)
+        if root is None:
+            raise ValueError("Empty document")
+        # Match BeautifulSoup's get_text(), which skips script/style/template strings
+        etree.strip_elements(root, *NON_TEXT_TAGS, with_tail=False)
+        return LxmlNode(root)
+
+class BeautifulSoupBackend(ParserBackend):
+    """Pure-Python html.parser tree with soupsieve selectors"""
+    name = 'bs4'
+
+    def __init__(self):
+        from bs4 import BeautifulSoup
+        self._soup = BeautifulSoup
+
+    def parse(self, content, encoding=None):
+        if isinstance(content, str):
+            return SoupNode(self._soup(content, 'html.parser'))
+        return SoupNode(self._soup(content, 'html.parser', from_encoding=encoding or 'utf-8'))
+
+BACKENDS = {
+    LxmlBackend.name: LxmlBackend,
+    BeautifulSoupBackend.name: BeautifulSoupBackend,
+}
+
+def available_backends():
+    """Names of the backends whose libraries are installed"""
+    names = []
+    for name, backend_class in BACKENDS.items():
+        try:
+            backend_class()
+            names.append(name)
+        except ImportError:
+            pass
+    return names
+
+def get_backend(name='lxml'):
+    """Create the requested backend, falling back to BeautifulSoup if it is unavailable"""
+    backend_class = BACKENDS.get(name)
+    if backend_class is None:
+        logger.error(f"Unknown parser backend '{name}', using bs4")
+        backend_class = BeautifulSoupBackend
+    try:
+        return backend_class()
+    except ImportError as e:
+        logger.warning(f"Parser backend '{name}' unavailable ({e}), using bs4")
+        return BeautifulSoupBackend()
+
+if __name__ == "__main__":
+    # Usage: python parsers.py saved_search_page.html
+    from sniperbot import OLXSniperBot
+
+    with open(sys.argv[1], 'rb') as f:
+        page = f.read()
+    results = OLXSniperBot().compare_parser_backends(page)
+    reference_name, reference = next(iter(results.items()))
+    ok = True
+    for name, listings in results.items():
+        if listings != reference:
+            ok = False
+            print(f"MISMATCH: {name} differs from {reference_name}")
+        print(f"{name}: {len(listings)} listings")
+    sys.exit(0 if ok else 1)
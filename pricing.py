@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Streaming price statistics for deal detection
+Prices are grouped by normalized model and storage, and each group keeps a small log-bucketed
+quantile sketch whose weights decay over time; a listing is a deal when it is priced below the
+group's DEAL_PERCENTILE. Flagging reads a cached threshold, and the sketches are saved as a compact
+JSON snapshot so they survive restarts
+"""
+
+import os
+import re
+import json
+import math
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+PRICE_DIGITS_RE = re.compile(r'\d+(?:[  ]\d{3})*(?:,\d+)?')
+MODEL_RE = re.compile(r'iphone\s*(\d{1,2}(?!\d)|(?:xs|xr|x|se)\b)(?:\s*(pro\s*max|pro|max|plus|mini))?(?:\s*(20\d\d))?', re.I)
+STORAGE_RE = re.compile(r'(?<!\d)(16|32|64|128|256|512|1)\s*(gb|tb)\b', re.I)
+
+def parse_price(listing):
+    """Numeric price of a listing (or a price string like "2 499 zł"), or None"""
+    if isinstance(listing, dict):
+        if listing.get('price_value') is not None:
+            return float(listing['price_value'])
+        listing = listing.get('price') or ''
+    match = PRICE_DIGITS_RE.search(listing)
+    if not match:
+        return None
+    return float(match.group().replace(' ', '').replace(' ', '').replace(',', '.'))
+
+def group_key(listing):
+    """Normalized "iphone 13 pro 128gb" key of a listing, or None when the model is unclear"""
+    details = listing.get('details') or {}
+    text = ' '.join(filter(None, (details.get('model'), details.get('storage'), listing.get('title'))))
+    model = MODEL_RE.search(text)
+    if not model:
+        return None
+    number, variant, year = model.groups()
+    parts = ['iphone', number.lower()]
+    if variant:
+        parts.append(re.sub(r'\s+', ' ', variant.lower()))
+    if year and number.lower() == 'se':
+        parts.append(year)
+    storage = STORAGE_RE.search(text)
+    if storage:
+        parts.append(f"{storage.group(1)}{storage.group(2).lower()}")
+    return ' '.join(parts)
+
+class DecayingSketch:
+    """Log-bucketed quantile sketch with exponentially decaying weights
+
+    Bucket i holds prices in [gamma^i, gamma^(i+1)); weights are stored scaled by 2^((t - ref) / half_life)
+    so old observations fade without touching every bucket on each insert.
+    """
+
+    def __init__(self, gamma=1.03, half_life=14 * 24 * 3600, max_buckets=200, ref=None):
+        self.gamma = gamma
+        self.log_gamma = math.log(gamma)
+        self.half_life = half_life
+        self.max_buckets = max_buckets
+        self.ref = ref if ref is not None else time.time()
+        self.buckets = {}
+        self.total = 0.0
+
+    def _scale(self, now):
+        return 2.0 ** ((now - self.ref) / self.half_life)
+
+    def add(self, price, now=None):
+        if price <= 0:
+            return
+        now = now or time.time()
+        scale = self._scale(now)
+        if scale > 2 ** 40:
+            # Re-base before the scaled weights overflow
+            for index in self.buckets:
+                self.buckets[index] /= scale
+            self.total /= scale
+            self.ref = now
+            scale = 1.0
+        index = math.floor(math.log(price) / self.log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0.0) + scale
+        self.total += scale
+        if len(self.buckets) > self.max_buckets:
+            # Deals sit in the low tail, so the top buckets are the ones merged
+            ordered = sorted(self.buckets)
+            top = self.buckets.pop(ordered[-1])
+            self.buckets[ordered[-2]] += top
+
+    def weight(self, now=None):
+        """Decayed number of observations"""
+        return self.total / self._scale(now or time.time())
+
+    def quantile(self, q):
+        """Approximate price at quantile q (0..1)"""
+        if not self.buckets:
+            return None
+        target = q * self.total
+        cumulative = 0.0
+        for index in sorted(self.buckets):
+            cumulative += self.buckets[index]
+            if cumulative >= target:
+                return self.gamma ** (index + 0.5)
+        return self.gamma ** (max(self.buckets) + 0.5)
+
+    def to_dict(self):
+        return {'ref': self.ref, 'total': self.total, 'buckets': {str(index): round(weight, 6) for index, weight in self.buckets.items()}}
+
+    @classmethod
+    def from_dict(cls, data, **kwargs):
+        sketch = cls(ref=data['ref'], **kwargs)
+        sketch.total = data['total']
+        sketch.buckets = {int(index): weight for index, weight in data['buckets'].items()}
+        return sketch
+
+class PriceIndex:
+    """Per-group price sketches with cached deal thresholds"""
+
+    def __init__(self, path=None, percentile=20, min_samples=15, half_life_days=14, refresh_every=8, load_from=None):
+        self.path = path
+        self.quantile = percentile / 100
+        self.min_samples = min_samples
+        self.half_life = half_life_days * 24 * 3600
+        self.refresh_every = refresh_every
+        self.sketches = {}
+        # group -> [deal threshold, median, inserts since computed]
+        self._thresholds = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        if path:
+            # Workers with their own snapshot file start from whichever one was written last
+            self.load(load_from or path)
+
+    def observe(self, listing):
+        """Add a listing's price to its group"""
+        price = parse_price(listing)
+        key = group_key(listing)
+        if price is None or key is None:
+            return
+        with self._lock:
+            sketch = self.sketches.get(key)
+            if sketch is None:
+                sketch = self.sketches[key] = DecayingSketch(half_life=self.half_life)
+            sketch.add(price)
+            cached = self._thresholds.get(key)
+            if cached:
+                cached[2] += 1
+            self._dirty = True
+
+    def _threshold(self, key):
+        cached = self._thresholds.get(key)
+        if cached is None or cached[2] >= self.refresh_every:
+            sketch = self.sketches[key]
+            cached = self._thresholds[key] = [sketch.quantile(self.quantile), sketch.quantile(0.5), 0]
+        return cached
+
+    def assess(self, listing):
+        """Deal info for a listing priced below its group's percentile, else None"""
+        price = parse_price(listing)
+        key = group_key(listing)
+        if price is None or key is None or price <= 0:
+            return None
+        with self._lock:
+            sketch = self.sketches.get(key)
+            if sketch is None or sketch.weight() < self.min_samples:
+                return None
+            threshold, median, _ = self._threshold(key)
+        if price >= threshold:
+            return None
+        return {'group': key, 'price': price, 'threshold': round(threshold), 'median': round(median),
+                'discount': round(1 - price / median, 3)}
+
+    def snapshot(self):
+        with self._lock:
+            return {key: sketch.to_dict() for key, sketch in self.sketches.items()}
+
+    def save(self):
+        """Write the sketches to the snapshot file if anything changed"""
+        if not self.path or not self._dirty:
+            return
+        self._dirty = False
+        try:
+            # Per process, so workers saving at the same moment never write into one temp file
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            self._dirty = True
+            logger.error(f"Error saving price snapshot: {e}")
+
+    def load(self, path=None):
+        path = path or self.path
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.sketches = {key: DecayingSketch.from_dict(value, half_life=self.half_life) for key, value in data.items()}
+            logger.info(f"Loaded price statistics for {len(self.sketches)} model groups")
+        except Exception as e:
+            logger.error(f"Error loading price snapshot from {path}: {e}")
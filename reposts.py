@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Repost detection for the OLX Sniper Bot
+Each listing is reduced to a weighted set of features (title words, price bucket, city, photo)
+and a 64-value MinHash signature. Signatures are indexed in 16 bands of 4 values, so earlier
+listings with a similar feature set are found through a few dict lookups instead of a scan
+of the whole window.
+"""
+
+import re
+import math
+import time
+import random
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pricing import parse_price
+
+logger = logging.getLogger(__name__)
+
+NUM_HASHES = 64
+BAND_ROWS = 4
+MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(0x01A5)
+HASH_PARAMS = [(_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(MERSENNE_PRIME)) for _ in range(NUM_HASHES)]
+
+WORD_RE = re.compile(r'[0-9a-ząćęłńóśźż]+')
+PRICE_BUCKET_RATIO = math.log(1.1)
+PLACEHOLDER_IMAGE_PREFIX = 'https://via.placeholder.com/'
+
+# Title words alone rarely identify a phone, the seller's price, city and photo do
+FEATURE_WEIGHTS = {'word': 1, 'bigram': 1, 'price': 2, 'location': 3, 'image': 4}
+# Without the same photo, similar titles in one city and price range are often different sellers' phones
+NO_PHOTO_THRESHOLD = 0.9
+
+@lru_cache(maxsize=65536)
+def feature_hash(feature):
+    """Stable 64-bit hash of a feature string (the builtin hash() differs per process)"""
+    return int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+
+def photo_key(listing):
+    """Identity of a listing's real photo, or None for a missing or placeholder image"""
+    image = listing.get('image') or ''
+    if not image or image.startswith(PLACEHOLDER_IMAGE_PREFIX):
+        return None
+    # The apollo file path identifies the photo, the ;s=WxH suffix is only the rendition
+    return image.split(';')[0].split('?')[0]
+
+def features(listing):
+    """(feature, weight) pairs describing a listing"""
+    words = WORD_RE.findall((listing.get('title') or '').lower())
+    result = [(f"w:{word}", FEATURE_WEIGHTS['word']) for word in words]
+    result += [(f"b:{a} {b}", FEATURE_WEIGHTS['bigram']) for a, b in zip(words, words[1:])]
+    price = parse_price(listing)
+    if price:
+        # Two half-overlapping buckets, so a small price cut keeps at least one of them
+        position = math.log(price) / PRICE_BUCKET_RATIO
+        result.append((f"p:{math.floor(position)}", FEATURE_WEIGHTS['price']))
+        result.append((f"q:{math.floor(position + 0.5)}", FEATURE_WEIGHTS['price']))
+    location = (listing.get('location') or '').split(',')[0].strip().lower()
+    if location and location != 'brak':
+        result.append((f"l:{location}", FEATURE_WEIGHTS['location']))
+    photo = photo_key(listing)
+    if photo:
+        result.append((f"i:{photo}", FEATURE_WEIGHTS['image']))
+    return result
+
+def signature(listing):
+    """MinHash signature of a listing's weighted feature set"""
+    tokens = {feature_hash(f"{feature}#{copy}") for feature, weight in features(listing) for copy in range(weight)}
+    if not tokens:
+        return None
+    return tuple(min((a * token + b) % MERSENNE_PRIME for token in tokens) for a, b in HASH_PARAMS)
+
+def bands(sig):
+    return [(start, sig[start:start + BAND_ROWS]) for start in range(0, NUM_HASHES, BAND_ROWS)]
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(x == y for x, y in zip(a, b)) / NUM_HASHES
+
+class RepostIndex:
+    """Signatures of recent listings, expired by age and capped in size"""
+
+    def __init__(self, window=72 * 3600, max_entries=50000, threshold=0.6, no_photo_threshold=NO_PHOTO_THRESHOLD):
+        self.window = window
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.no_photo_threshold = max(threshold, no_photo_threshold)
+        # listing ID -> (signature, added_at, title, url, photo), oldest first
+        self._entries = OrderedDict()
+        self._bands = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, listing_id):
+        sig = self._entries.pop(listing_id)[0]
+        for key in bands(sig):
+            bucket = self._bands.get(key)
+            if bucket is not None:
+                bucket.discard(listing_id)
+                if not bucket:
+                    del self._bands[key]
+
+    def _expire(self, now):
+        cutoff = now - self.window
+        while self._entries:
+            listing_id, entry = next(iter(self._entries.items()))
+            if entry[1] >= cutoff and len(self._entries) <= self.max_entries:
+                break
+            self._remove(listing_id)
+
+    def find(self, listing, sig=None):
+        """Most similar earlier listing with a different ID above the threshold, as a dict, or None
+
+        Pairs without the same real photo need no_photo_threshold; same_photo in the result tells them apart.
+        """
+        sig = signature(listing) if sig is None else sig
+        if sig is None:
+            return None
+        photo = photo_key(listing)
+        best = None
+        with self._lock:
+            self._expire(time.time())
+            candidates = set()
+            for key in bands(sig):
+                candidates.update(self._bands.get(key, ()))
+            candidates.discard(listing['id'])
+            for candidate in candidates:
+                other, added_at, title, url, other_photo = self._entries[candidate]
+                score = similarity(sig, other)
+                same_photo = photo is not None and photo == other_photo
+                threshold = self.threshold if same_photo else self.no_photo_threshold
+                if score >= threshold and (best is None or score > best['similarity']):
+                    best = {'id': candidate, 'similarity': score, 'title': title, 'url': url, 'added_at': added_at,
+                            'same_photo': same_photo}
+        return best
+
+    def add(self, listing, sig=None):
+        """Index a listing; a listing already in the index is moved to the newest end"""
+        sig = signature(listing) if sig is None else sig
+        if sig is None:
+            return
+        with self._lock:
+            if listing['id'] in self._entries:
+                self._remove(listing['id'])
+            self._entries[listing['id']] = (sig, time.time(), listing.get('title'), listing.get('url'), photo_key(listing))
+            for key in bands(sig):
+                self._bands.setdefault(key, set()).add(listing['id'])
+            self._expire(time.time())
+
+    def check(self, listing):
+        """Earlier listing this one likely reposts (or None), indexing it either way"""
+        sig = signature(listing)
+        match = self.find(listing, sig)
+        self.add(listing, sig)
+        return match
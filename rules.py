@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Compiled watch rules for the OLX Sniper Bot
+All rule terms go into one Aho-Corasick automaton and price bounds into an elementary interval
+index, so matching a listing scans its text once and combines per-rule bitmasks instead of
+looping over the rules.
+
+Rules file (RULES_FILE), a JSON list of rules:
+    {"name": "13 Pro 128GB", "webhook": "https://discord.com/api/webhooks/...",
+     "models": ["iphone 13 pro"], "storage": ["128gb", "128 gb"], "keywords": [],
+     "exclude": ["etui", "uszkodz*", "icloud"], "min_price": 1500, "max_price": 2500,
+     "city": "Warszawa", "radius_km": 50}
+models, storage and keywords each need one of their terms in the title; terms match whole words,
+a trailing * matches any word starting with the term. lat/lon can replace city, and
+"deals_only": true limits a rule to listings flagged as underpriced.
+"""
+
+import re
+import json
+import bisect
+import logging
+from collections import deque, Counter
+from functools import lru_cache
+from geo import CITY_LOOKUP, distance_km
+from pricing import parse_price
+
+logger = logging.getLogger(__name__)
+
+TERM_GROUPS = ('models', 'storage', 'keywords')
+_SEPARATORS_RE = re.compile(r'[^0-9a-ząćęłńóśźż]+')
+
+def normalize(text):
+    """Lowercase words separated by single spaces, padded so terms can match on word boundaries"""
+    return ' ' + _SEPARATORS_RE.sub(' ', text.lower()).strip() + ' '
+
+def compile_term(term):
+    """Automaton pattern for a rule term: whole words, or a word prefix with a trailing *"""
+    prefix = term.endswith('*')
+    words = normalize(term.rstrip('*')).strip()
+    if not words:
+        raise ValueError(f"Empty rule term: {term!r}")
+    return ' ' + words if prefix else ' ' + words + ' '
+
+class Automaton:
+    """Aho-Corasick automaton reporting the IDs of every pattern found in a text"""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [()]
+        for pattern_id, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                state = next_state
+            self.output[state] += (pattern_id,)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] += self.output[self.fail[next_state]]
+
+    def find(self, text):
+        """Set of pattern IDs occurring in text"""
+        goto, fail, output = self.goto, self.fail, self.output
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+class WatchRule:
+    """A single user filter and the webhook its matches go to"""
+
+    def __init__(self, name, webhook=None, models=(), storage=(), keywords=(), exclude=(),
+                 min_price=None, max_price=None, city=None, lat=None, lon=None, radius_km=None, deals_only=False):
+        self.name = name
+        self.deals_only = deals_only
+        self.webhook = webhook
+        self.groups = [list(terms) for terms in (models, storage, keywords) if terms]
+        self.exclude = list(exclude)
+        self.min_price = float(min_price) if min_price is not None else float('-inf')
+        self.max_price = float(max_price) if max_price is not None else float('inf')
+        self.center = None
+        self.radius_km = radius_km
+        if radius_km is not None:
+            if city is not None:
+                self.center = CITY_LOOKUP.get(city.lower())
+                if self.center is None:
+                    raise ValueError(f"Rule {name!r}: unknown city {city!r}")
+            elif lat is not None and lon is not None:
+                self.center = (float(lat), float(lon))
+            else:
+                raise ValueError(f"Rule {name!r}: radius_km needs a city or lat/lon")
+
+    @classmethod
+    def from_dict(cls, data):
+        unknown = set(data) - {'name', 'webhook', 'exclude', 'min_price', 'max_price', 'city', 'lat', 'lon', 'radius_km', 'deals_only', *TERM_GROUPS}
+        if unknown:
+            raise ValueError(f"Rule {data.get('name')!r}: unknown keys {sorted(unknown)}")
+        if not data.get('name'):
+            raise ValueError(f"Rule without a name: {data}")
+        return cls(**data)
+
+    def has_price_bounds(self):
+        return self.min_price != float('-inf') or self.max_price != float('inf')
+
+    def __repr__(self):
+        return f"WatchRule({self.name!r})"
+
+class RuleSet:
+    """Watch rules compiled into one automaton and a few bitmask indexes"""
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        patterns = {}
+        # Per pattern: the rule term groups it satisfies and a mask of the rules it excludes
+        pattern_groups = []
+        pattern_excludes = []
+
+        def pattern_id(term):
+            pattern = compile_term(term)
+            if pattern not in patterns:
+                patterns[pattern] = len(patterns)
+                pattern_groups.append([])
+                pattern_excludes.append(0)
+            return patterns[pattern]
+
+        self.group_rule = []
+        self.group_counts = []
+        self.no_terms_mask = 0
+        self.deals_only_mask = 0
+        for index, rule in enumerate(self.rules):
+            self.group_counts.append(len(rule.groups))
+            if not rule.groups:
+                self.no_terms_mask |= 1 << index
+            if rule.deals_only:
+                self.deals_only_mask |= 1 << index
+            for terms in rule.groups:
+                group = len(self.group_rule)
+                self.group_rule.append(index)
+                for term in terms:
+                    pattern_groups[pattern_id(term)].append(group)
+            for term in rule.exclude:
+                pattern_excludes[pattern_id(term)] |= 1 << index
+
+        self.automaton = Automaton(list(patterns))
+        self.pattern_groups = pattern_groups
+        self.pattern_excludes = pattern_excludes
+        self._build_price_index()
+        self._build_location_index()
+        logger.info(f"Compiled {len(self.rules)} watch rules ({len(patterns)} terms, {len(self.price_points)} price bounds)")
+
+    def _mask(self, predicate):
+        mask = 0
+        for index, rule in enumerate(self.rules):
+            if predicate(rule):
+                mask |= 1 << index
+        return mask
+
+    def _build_price_index(self):
+        """Masks for each elementary interval between the rules' price bounds"""
+        bounds = set()
+        for rule in self.rules:
+            bounds.update(bound for bound in (rule.min_price, rule.max_price) if abs(bound) != float('inf'))
+        self.price_points = sorted(bounds)
+        # Slot 2i is the open interval below point i, slot 2i + 1 the point itself
+        samples = []
+        for i, point in enumerate(self.price_points):
+            below = self.price_points[i - 1] if i else point - 1
+            samples += [(below + point) / 2, point]
+        samples.append(self.price_points[-1] + 1 if self.price_points else 0)
+        self.price_masks = [self._mask(lambda rule, value=value: rule.min_price <= value <= rule.max_price) for value in samples]
+        self.no_price_mask = self._mask(lambda rule: not rule.has_price_bounds())
+
+    def _build_location_index(self):
+        """Masks per known city; rules without a radius match anywhere"""
+        self.location_rules = [(index, rule) for index, rule in enumerate(self.rules) if rule.center is not None]
+        self.anywhere_mask = self._mask(lambda rule: rule.center is None)
+        self.city_masks = {city: self._point_mask(coords) for city, coords in CITY_LOOKUP.items()}
+        self._coords_mask = lru_cache(maxsize=4096)(self._point_mask)
+
+    def _point_mask(self, coords):
+        mask = self.anywhere_mask
+        for index, rule in self.location_rules:
+            if distance_km(rule.center, coords) <= rule.radius_km:
+                mask |= 1 << index
+        return mask
+
+    def price_mask(self, price):
+        if price is None:
+            return self.no_price_mask
+        i = bisect.bisect_left(self.price_points, price)
+        if i < len(self.price_points) and self.price_points[i] == price:
+            return self.price_masks[2 * i + 1]
+        return self.price_masks[2 * i]
+
+    def location_mask(self, listing):
+        if not self.location_rules:
+            return self.anywhere_mask
+        coords = listing.get('coordinates')
+        if coords:
+            return self._coords_mask((round(coords[0], 2), round(coords[1], 2)))
+        city = (listing.get('location') or '').split(',')[0].strip().lower()
+        return self.city_masks.get(city, self.anywhere_mask)
+
+    def match(self, listing):
+        """Rules a listing satisfies, in file order"""
+        details = listing.get('details') or {}
+        text = normalize(' '.join(filter(None, (listing.get('title'), details.get('model'), details.get('storage')))))
+        found = self.automaton.find(text)
+
+        groups = set()
+        excluded = 0
+        for pattern in found:
+            groups.update(self.pattern_groups[pattern])
+            excluded |= self.pattern_excludes[pattern]
+        mask = self.no_terms_mask
+        for index, hits in Counter(self.group_rule[group] for group in groups).items():
+            if hits == self.group_counts[index]:
+                mask |= 1 << index
+
+        mask &= ~excluded
+        if not listing.get('deal'):
+            mask &= ~self.deals_only_mask
+        if mask:
+            mask &= self.price_mask(parse_price(listing))
+        if mask:
+            mask &= self.location_mask(listing)
+
+        matched = []
+        while mask:
+            low = mask & -mask
+            matched.append(self.rules[low.bit_length() - 1])
+            mask ^= low
+        return matched
+
+def load_rules(path):
+    """Compile the watch rules in a JSON file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('rules', [])
+    return RuleSet(WatchRule.from_dict(rule) for rule in data)
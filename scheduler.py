@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Adaptive poll scheduling for the OLX Sniper Bot
+Each query's interval follows its observed listing arrival rate, and all queries share one
+requests-per-minute budget that serves the most promising query first
+"""
+
+import math
+import time
+import heapq
+import random
+import asyncio
+import itertools
+
+class QuerySchedule:
+    """Arrival-rate estimate and next poll interval for one search query"""
+
+    def __init__(self, base_interval, min_interval, max_interval, target_new_per_poll=1.0,
+                 half_life=900, burst_duration=300):
+        self.min_interval = min(min_interval, base_interval)
+        self.max_interval = max(max_interval, base_interval)
+        self.target_new_per_poll = target_new_per_poll
+        self.half_life = half_life
+        self.burst_duration = burst_duration
+        # Start from the configured interval: as if one listing arrived per target window
+        self.rate = target_new_per_poll / base_interval
+        self.last_poll = None
+        self.burst_until = 0.0
+
+    def record(self, new_count, now=None):
+        """Update the arrival rate (new listings per second) after a poll"""
+        now = now or time.monotonic()
+        if self.last_poll is not None:
+            elapsed = max(1e-3, now - self.last_poll)
+            # Time-weighted EWMA so long gaps count more than short ones
+            alpha = 1 - math.exp(-elapsed * math.log(2) / self.half_life)
+            self.rate += alpha * (new_count / elapsed - self.rate)
+        self.last_poll = now
+        if new_count:
+            self.burst_until = now + self.burst_duration
+
+    def in_burst(self, now=None):
+        """Whether new listings appeared recently"""
+        return (now or time.monotonic()) < self.burst_until
+
+    def next_interval(self, now=None):
+        """Seconds until the next poll, within the configured bounds"""
+        if self.in_burst(now):
+            interval = self.min_interval
+        elif self.rate <= 0:
+            interval = self.max_interval
+        else:
+            interval = self.target_new_per_poll / self.rate
+        interval = min(self.max_interval, max(self.min_interval, interval))
+        # Jitter to avoid perfect periodicity
+        return interval * random.uniform(0.9, 1.1)
+
+    def priority(self, now=None):
+        """Expected number of new listings waiting, boosted in burst mode"""
+        now = now or time.monotonic()
+        waited = now - self.last_poll if self.last_poll is not None else self.max_interval
+        expected = self.rate * waited
+        return expected + 1 if self.in_burst(now) else expected
+
+    def snapshot(self):
+        """Serializable scheduler state"""
+        return {'rate': self.rate, 'burst_remaining': max(0.0, self.burst_until - time.monotonic())}
+
+    def restore(self, state, elapsed=0.0):
+        """Continue from a snapshot taken elapsed seconds ago"""
+        if state.get('rate', 0) > 0:
+            self.rate = state['rate']
+        remaining = state.get('burst_remaining', 0) - elapsed
+        if remaining > 0:
+            self.burst_until = time.monotonic() + remaining
+
+class RequestBudget:
+    """Global token bucket of requests per minute; waiting queries are served by priority"""
+
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60
+        self.capacity = burst or max(1.0, per_minute / 6)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._waiters = []
+        self._counter = itertools.count()
+        self._dispatcher = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, priority=0.0):
+        """Wait for a request slot; higher priority waiters go first"""
+        self._refill()
+        if not self._waiters and self.tokens >= 1:
+            self.tokens -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (-priority, next(self._counter), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+        await future
+
+    async def _dispatch(self):
+        while self._waiters:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.tokens -= 1
+                future.set_result(None)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Seen listing store for the OLX Sniper Bot
+In-memory, insertion-ordered IDs per search with time-based expiry, persisted to SQLite in WAL mode
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class SeenStore:
+    """Remembers which listing IDs were already handled for each search query"""
+
+    def __init__(self, path, ttl=7 * 24 * 3600, legacy_file=None, expire_every=600):
+        self.path = path
+        self.ttl = ttl
+        self.expire_every = expire_every
+        # Only rewrite a refreshed ID's timestamp once it is this old
+        self.refresh_after = ttl / 10
+        self._lock = threading.Lock()
+        self._queries = {}
+        self._pending = {}
+        # Search URL -> time of its last successful poll
+        self._cursors = {}
+        self._pending_cursors = {}
+        self._last_expire = time.time()
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS seen ('
+            ' query TEXT NOT NULL, listing_id TEXT NOT NULL, seen_at REAL NOT NULL,'
+            ' PRIMARY KEY (query, listing_id)) WITHOUT ROWID'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS seen_by_time ON seen (seen_at)')
+        self._db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+
+        if legacy_file:
+            self._import_legacy(legacy_file)
+        self._load()
+
+    def _import_legacy(self, legacy_file):
+        """One-time import of the old seen.json file"""
+        if self._db.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+            return
+        try:
+            if os.path.exists(legacy_file):
+                with open(legacy_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                # Single-search format is a plain list, later versions map search URL -> IDs
+                if isinstance(data, list):
+                    data = {'*': data}
+                now = time.time()
+                rows = [(query, str(listing_id), now) for query, ids in data.items() for listing_id in ids]
+                self._db.executemany('INSERT OR IGNORE INTO seen VALUES (?, ?, ?)', rows)
+                logger.info(f"Imported {len(rows)} seen listings from {legacy_file}")
+        except Exception as e:
+            logger.error(f"Error importing seen listings from {legacy_file}: {e}")
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES ('legacy_imported', '1')")
+        self._db.commit()
+
+    def _load(self):
+        cutoff = time.time() - self.ttl
+        rows = self._db.execute(
+            'SELECT query, listing_id, seen_at FROM seen WHERE seen_at >= ? ORDER BY seen_at', (cutoff,)
+        )
+        count = 0
+        for query, listing_id, seen_at in rows:
+            self._queries.setdefault(query, OrderedDict())[listing_id] = seen_at
+            count += 1
+        logger.info(f"Loaded {count} seen listings across {len(self._queries)} searches")
+        for key, value in self._db.execute("SELECT key, value FROM meta WHERE key LIKE 'cursor:%'"):
+            self._cursors[key[len('cursor:'):]] = float(value)
+
+    def reload(self, query):
+        """Pick up IDs other processes saved for a query since we loaded it"""
+        cutoff = time.time() - self.ttl
+        rows = self._db.execute(
+            'SELECT listing_id, seen_at FROM seen WHERE query = ? AND seen_at >= ? ORDER BY seen_at', (query, cutoff)
+        ).fetchall()
+        with self._lock:
+            ids = self._ids(query)
+            merged = dict(rows)
+            for listing_id, seen_at in ids.items():
+                merged[listing_id] = max(seen_at, merged.get(listing_id, seen_at))
+            # Keep refresh order so expiry can still stop at the first fresh ID
+            self._queries[query] = OrderedDict(sorted(merged.items(), key=lambda item: item[1]))
+        return len(rows)
+
+    def _ids(self, query):
+        # Callers hold self._lock: sink workers add IDs while the poll loop and parsers read them
+        ids = self._queries.get(query)
+        if ids is None:
+            ids = self._queries[query] = OrderedDict()
+            # IDs imported from the single-search seen.json apply to every query
+            legacy = self._queries.get('*')
+            if legacy:
+                ids.update(legacy)
+        return ids
+
+    def contains(self, query, listing_id):
+        """Check whether a listing was already seen for this query"""
+        with self._lock:
+            return listing_id in self._ids(query)
+
+    def add(self, query, listing_id):
+        """Mark a listing as seen, or refresh it so it does not expire while still listed"""
+        now = time.time()
+        with self._lock:
+            ids = self._ids(query)
+            previous = ids.get(listing_id)
+            if previous is not None and now - previous < self.refresh_after:
+                return
+            ids[listing_id] = now
+            ids.move_to_end(listing_id)
+            self._pending[(query, listing_id)] = now
+
+    def add_many(self, query, listing_ids):
+        """Mark several listings as seen"""
+        for listing_id in listing_ids:
+            self.add(query, listing_id)
+
+    def cursor(self, query):
+        """Time of the last successful poll of a query, across restarts, or None"""
+        return self._cursors.get(query)
+
+    def set_cursor(self, query, polled_at):
+        """Record a successful poll; saved with the next flush"""
+        with self._lock:
+            self._cursors[query] = polled_at
+            self._pending_cursors[query] = polled_at
+
+    def count(self, query=None):
+        """Number of seen IDs, for one query or all of them"""
+        with self._lock:
+            if query is not None:
+                return len(self._queries.get(query, ()))
+            return sum(len(ids) for ids in self._queries.values())
+
+    def flush(self):
+        """Write pending IDs in one transaction and expire old ones when due"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            cursors, self._pending_cursors = self._pending_cursors, {}
+        if cursors:
+            try:
+                with self._db:
+                    self._db.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                                         [(f'cursor:{query}', str(polled_at)) for query, polled_at in cursors.items()])
+            except Exception as e:
+                logger.error(f"Error saving poll cursors: {e}")
+        if pending:
+            try:
+                with self._db:
+                    self._db.executemany(
+                        'INSERT INTO seen VALUES (?, ?, ?) '
+                        'ON CONFLICT (query, listing_id) DO UPDATE SET seen_at = excluded.seen_at',
+                        [(query, listing_id, seen_at) for (query, listing_id), seen_at in pending.items()]
+                    )
+            except Exception as e:
+                logger.error(f"Error saving seen listings: {e}")
+                with self._lock:
+                    for key, seen_at in pending.items():
+                        self._pending.setdefault(key, seen_at)
+        if time.time() - self._last_expire >= self.expire_every:
+            self.expire()
+
+    def expire(self, now=None):
+        """Forget IDs not seen within the TTL"""
+        now = now or time.time()
+        cutoff = now - self.ttl
+        removed = 0
+        with self._lock:
+            self._last_expire = now
+            for ids in self._queries.values():
+                # Insertion order is refresh order, so expired IDs sit at the front
+                while ids:
+                    listing_id, seen_at = next(iter(ids.items()))
+                    if seen_at >= cutoff:
+                        break
+                    ids.popitem(last=False)
+                    removed += 1
+        try:
+            with self._db:
+                self._db.execute('DELETE FROM seen WHERE seen_at < ?', (cutoff,))
+        except Exception as e:
+            logger.error(f"Error expiring seen listings: {e}")
+        if removed:
+            logger.info(f"Expired {removed} seen listings older than {self.ttl / 3600:.0f}h")
+        return removed
+
+    def close(self):
+        """Flush pending writes and close the database"""
+        self.flush()
+        self._db.close()
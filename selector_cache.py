@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Self-learning selector order for OLX extraction
+Each field remembers which selector last worked and tries it first; the full list is only
+walked in its original order when the winner misses, and a winner that keeps missing is dropped
+so the next working selector takes over (usually an OLX layout change)
+"""
+
+import logging
+import threading
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Consecutive misses after which a winning selector is dropped and the list re-learned
+DEMOTE_AFTER = 5
+
+class SelectorStrategy:
+    """Ordered selectors for one field, with per-selector hit statistics"""
+
+    def __init__(self, field, selectors, demote_after=DEMOTE_AFTER):
+        self.field = field
+        self.selectors = list(selectors)
+        self.demote_after = demote_after
+        self.winner = None
+        self.winner_misses = 0
+        self.relearns = 0
+        self.attempts = dict.fromkeys(self.selectors, 0)
+        self.hits = dict.fromkeys(self.selectors, 0)
+        self._lock = threading.Lock()
+
+    def _record(self, selector, hit):
+        with self._lock:
+            self.attempts[selector] += 1
+            if hit:
+                self.hits[selector] += 1
+        if hit:
+            metrics.inc('selector_hits', field=self.field, selector=selector)
+
+    def find(self, probe):
+        """Value of the first selector for which probe(selector) is not None, winner first"""
+        winner = self.winner
+        if winner is not None:
+            value = probe(winner)
+            self._record(winner, value is not None)
+            if value is not None:
+                self.winner_misses = 0
+                return value
+            self.winner_misses += 1
+            if self.winner_misses >= self.demote_after and self.winner == winner:
+                logger.warning(f"Selector '{winner}' for {self.field} missed {self.winner_misses} times in a row, re-learning")
+                metrics.inc('selector_relearns', field=self.field)
+                self.winner = None
+                self.winner_misses = 0
+                self.relearns += 1
+
+        for selector in self.selectors:
+            if selector == winner:
+                continue
+            value = probe(selector)
+            self._record(selector, value is not None)
+            if value is not None:
+                if self.winner is None:
+                    self.winner = selector
+                    logger.info(f"Selector '{selector}' is now first for {self.field}")
+                return value
+        return None
+
+    def restore(self, winner):
+        """Start from a winner remembered by an earlier run, if it is still one of the selectors"""
+        if winner in self.attempts:
+            self.winner = winner
+            self.winner_misses = 0
+
+    def snapshot(self):
+        """Winner and hit rates, for /selectors"""
+        with self._lock:
+            selectors = {
+                selector: {
+                    'attempts': self.attempts[selector],
+                    'hits': self.hits[selector],
+                    'hit_rate': round(self.hits[selector] / self.attempts[selector], 3) if self.attempts[selector] else None,
+                }
+                for selector in self.selectors
+            }
+        return {'winner': self.winner, 'winner_misses': self.winner_misses, 'relearns': self.relearns, 'selectors': selectors}
+
+_strategies = {}
+_strategies_lock = threading.Lock()
+
+def get_strategy(field, selectors):
+    """Shared strategy for a field, created on first use"""
+    with _strategies_lock:
+        strategy = _strategies.get(field)
+        if strategy is None:
+            strategy = _strategies[field] = SelectorStrategy(field, selectors)
+        return strategy
+
+def strategies():
+    """Every field's strategy"""
+    with _strategies_lock:
+        return list(_strategies.values())
+
+def selector_stats():
+    """Snapshot of every field's strategy"""
+    with _strategies_lock:
+        strategies = list(_strategies.values())
+    return {strategy.field: strategy.snapshot() for strategy in strategies}
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Notification sinks for the OLX Sniper Bot
+Every sink (Discord, Telegram, generic JSON webhooks, a local JSONL file or Unix socket feed) has
+its own queue, worker threads, retry policy and rate limiter, so a slow or failing sink never holds
+back the poll loop or the other sinks. A listing is rendered once into a RenderedListing; each
+output format (Discord embed, message text, JSON line) is built from precompiled templates the
+first time a sink asks for it and shared by every sink that uses it.
+"""
+
+import html
+import json
+import time
+import queue
+import socket
+import logging
+import threading
+from datetime import datetime
+from string import Formatter
+from timeparse import POLAND_TZ
+from metrics import metrics
+from transport import create_session, touch
+
+logger = logging.getLogger(__name__)
+
+class CompiledTemplate:
+    """str.format-style template split into literal and field parts once, at import"""
+
+    def __init__(self, text):
+        self.text = text
+        self.parts = [(literal, field, spec) for literal, field, spec, _ in Formatter().parse(text)]
+
+    def render(self, values, escape=None):
+        out = []
+        for literal, field, spec in self.parts:
+            out.append(literal)
+            if field is not None:
+                value = values.get(field, '')
+                value = format(value, spec) if spec else str(value)
+                out.append(escape(value) if escape else value)
+        return ''.join(out)
+
+# Plain-text message body shared by Telegram and the JSON sinks; optional lines start with their own newline
+MESSAGE_TEMPLATE = CompiledTemplate(
+    "{deal_mark}{title}\n💰 {price}\n📍 {location}\n📅 {publish_date}{deal_line}{repost_line}{rules_line}\n{url}"
+)
+
+class RenderedListing:
+    """A listing plus its per-format renderings, each built on first use"""
+
+    def __init__(self, listing):
+        self.listing = listing
+        self.rendered_at = datetime.now(POLAND_TZ).isoformat()
+        self._formats = {}
+        # Reentrant: a format may be built from another one (the JSON line embeds the text)
+        self._lock = threading.RLock()
+        deal = listing.get('deal')
+        repost_of = listing.get('repost_of')
+        self.values = {
+            'id': listing['id'],
+            'title': listing['title'],
+            'url': listing['url'],
+            'price': listing['price'],
+            'location': listing['location'],
+            'publish_date': listing.get('publish_date') or 'Dzisiaj',
+            'image': listing.get('image') or '',
+            'deal_mark': '🔥 ' if deal else '',
+            'deal_line': f"\n📉 Okazja: {deal['discount']:.0%} poniżej mediany {deal['median']} zł ({deal['group']})" if deal else '',
+            'repost_line': f"\n♻️ Prawdopodobnie ponowne ogłoszenie: {repost_of['url']}" if repost_of else '',
+            'rules_line': f"\n🎯 {', '.join(listing['rules'])}" if listing.get('rules') else '',
+        }
+
+    def get(self, name, build):
+        """Rendering called name, built with build(self) the first time it is asked for"""
+        value = self._formats.get(name)
+        if value is None:
+            with self._lock:
+                value = self._formats.get(name)
+                if value is None:
+                    value = self._formats[name] = build(self)
+        return value
+
+    def text(self, template=MESSAGE_TEMPLATE, escape=None):
+        return self.get(('text', id(template), escape), lambda rendered: template.render(rendered.values, escape))
+
+    def json_line(self):
+        """Listing as one UTF-8 JSON document, with the message text added"""
+        return self.get('json', lambda rendered: json.dumps(
+            dict(rendered.listing, text=rendered.text()), ensure_ascii=False, separators=(',', ':'), default=str
+        ).encode('utf-8'))
+
+def rendered(listing):
+    return listing if isinstance(listing, RenderedListing) else RenderedListing(listing)
+
+class RetryableError(Exception):
+    """A delivery failure worth retrying, optionally after a delay the receiver asked for"""
+
+    def __init__(self, message, delay=None, reason='error'):
+        super().__init__(message)
+        self.delay = delay
+        self.reason = reason
+
+class RateLimiter:
+    """Blocking token bucket shared by a sink's workers"""
+
+    def __init__(self, per_minute=None, burst=1):
+        self.rate = per_minute / 60 if per_minute else None
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if self.rate is None:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+class Sink:
+    """Queue of listings delivered by background workers, in batches of up to batch_size
+
+    Subclasses implement deliver(items), which raises RetryableError for failures worth retrying.
+    required sinks decide whether a listing counts as announced; feeds are best effort.
+    """
+
+    name = 'sink'
+    required = True
+
+    def __init__(self, workers=1, batch_size=1, linger=0.0, max_retries=3, backoff=1.0, per_minute=None, name=None):
+        self.name = name or self.name
+        self.batch_size = batch_size
+        self.linger = linger
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.limiter = RateLimiter(per_minute)
+        self.queue = queue.Queue()
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"{self.name}-sink-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, listing, callback=None):
+        """Queue a listing; callback(success) runs on the worker thread once it is sent or dropped"""
+        self.queue.put((rendered(listing), callback))
+
+    def depth(self):
+        """Number of listings waiting to be sent"""
+        return self.queue.qsize()
+
+    def close(self):
+        """Stop the workers after the queue drains"""
+        for _ in self._workers:
+            self.queue.put(None)
+        for worker in self._workers:
+            worker.join()
+
+    def _next_batch(self):
+        first = self.queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        # Give a burst of new listings a moment to arrive so they share one call
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self.queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _worker(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            items = [item for item, _ in batch]
+            with metrics.timer('stage_seconds', stage='notify', sink=self.name):
+                success = self.send(items)
+            metrics.inc('sink_deliveries', len(items), sink=self.name, result='sent' if success else 'failed')
+            for item, callback in batch:
+                if callback:
+                    try:
+                        callback(success)
+                    except Exception as e:
+                        logger.error(f"Error in notification callback for {item.listing['id']}: {e}")
+
+    def before_attempt(self):
+        """Hook run before every attempt, after the rate limiter"""
+
+    def deliver(self, items):
+        raise NotImplementedError
+
+    def send(self, items):
+        """Deliver a batch, retrying RetryableErrors with exponential backoff"""
+        items = [rendered(item) for item in items]
+        for attempt in range(1, self.max_retries + 1):
+            self.limiter.wait()
+            self.before_attempt()
+            try:
+                self.deliver(items)
+                return True
+            except RetryableError as e:
+                metrics.inc('webhook_retries', sink=self.name, reason=e.reason)
+                delay = e.delay if e.delay is not None else self.backoff * 2 ** (attempt - 1)
+                if attempt < self.max_retries:
+                    logger.warning(f"{self.name}: {e}, retrying in {delay:.2f}s ({attempt}/{self.max_retries})")
+                    time.sleep(delay)
+            except Exception as e:
+                logger.error(f"{self.name}: error sending notification (attempt {attempt}): {e}")
+                break
+        logger.error(f"{self.name}: failed to send notification for {len(items)} listings after {self.max_retries} attempts")
+        return False
+
+def check_http(response, sink):
+    """Raise RetryableError for 429/5xx, HTTPError for other failures"""
+    if response.status_code == 429:
+        delay = response.headers.get('Retry-After')
+        if delay is None:
+            try:
+                delay = (response.json().get('parameters') or {}).get('retry_after')
+            except ValueError:
+                delay = None
+        raise RetryableError(f"rate limited by {sink}", delay=float(delay or 1), reason='rate_limited')
+    if response.status_code >= 500:
+        raise RetryableError(f"{sink} server error {response.status_code}", reason='server_error')
+    response.raise_for_status()
+
+# Telegram's HTML mode: the listing fields are escaped, the template's own text is not
+TELEGRAM_TEMPLATE = CompiledTemplate(
+    "<b>{deal_mark}{title}</b>\n💰 {price}\n📍 {location}\n📅 {publish_date}{deal_line}{repost_line}{rules_line}\n"
+    "<a href=\"{url}\">KUP TERAZ</a>"
+)
+
+class TelegramSink(Sink):
+    """One Bot API message per listing"""
+
+    name = 'telegram'
+
+    def __init__(self, token, chat_id, timeout=10, session=None, per_minute=20, **kwargs):
+        super().__init__(per_minute=per_minute, **kwargs)
+        self.url = f"https://api.telegram.org/bot{token}/sendMessage"
+        self.chat_id = chat_id
+        self.timeout = timeout
+        self.session = session or create_session()
+
+    def deliver(self, items):
+        for item in items:
+            response = self.session.post(self.url, timeout=self.timeout, json={
+                'chat_id': self.chat_id,
+                'text': item.text(TELEGRAM_TEMPLATE, html.escape),
+                'parse_mode': 'HTML',
+            })
+            touch(self.session, self.url)
+            check_http(response, 'Telegram')
+        logger.info(f"✅ Sent {len(items)} listings to Telegram")
+
+class WebhookSink(Sink):
+    """Batches of listings POSTed as {"listings": [...]} to any HTTP endpoint"""
+
+    name = 'webhook'
+
+    def __init__(self, url, timeout=10, session=None, **kwargs):
+        kwargs.setdefault('batch_size', 10)
+        kwargs.setdefault('linger', 0.5)
+        super().__init__(**kwargs)
+        self.url = url
+        self.timeout = timeout
+        self.session = session or create_session()
+
+    def deliver(self, items):
+        # Each listing's JSON is rendered once and spliced into the batch body
+        body = b'{"listings":[' + b','.join(item.json_line() for item in items) + b']}'
+        response = self.session.post(self.url, data=body, timeout=self.timeout,
+                                     headers={'Content-Type': 'application/json; charset=utf-8'})
+        touch(self.session, self.url)
+        check_http(response, self.url)
+
+class JsonlSink(Sink):
+    """Appends one JSON line per listing to a local file, for our own tooling"""
+
+    name = 'jsonl'
+    required = False
+
+    def __init__(self, path, **kwargs):
+        kwargs.setdefault('batch_size', 50)
+        super().__init__(**kwargs)
+        self.path = path
+
+    def deliver(self, items):
+        with open(self.path, 'ab') as f:
+            f.write(b''.join(item.json_line() + b'\n' for item in items))
+
+class UnixSocketSink(Sink):
+    """Writes one JSON line per listing to a Unix stream socket, reconnecting after failures"""
+
+    name = 'socket'
+    required = False
+
+    def __init__(self, path, timeout=5, **kwargs):
+        kwargs.setdefault('batch_size', 50)
+        kwargs.setdefault('backoff', 2.0)
+        super().__init__(**kwargs)
+        self.path = path
+        self.timeout = timeout
+        self._socket = None
+
+    def deliver(self, items):
+        try:
+            if self._socket is None:
+                self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self._socket.settimeout(self.timeout)
+                self._socket.connect(self.path)
+            self._socket.sendall(b''.join(item.json_line() + b'\n' for item in items))
+        except OSError as e:
+            if self._socket is not None:
+                self._socket.close()
+                self._socket = None
+            raise RetryableError(f"feed socket {self.path} unavailable ({e})", reason='unavailable')
+
+def feed_sink(target, **kwargs):
+    """JSONL file sink for a path, Unix socket sink for unix:/path"""
+    if target.startswith('unix:'):
+        return UnixSocketSink(target[len('unix:'):], **kwargs)
+    return JsonlSink(target, **kwargs)
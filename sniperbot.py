@@ -6,25 +6,96 @@ Monitors OLX for new iPhone listings and sends Discord notifications
 
 import os
 import time
-import json
+import asyncio
+import hashlib
+import threading
 import logging
-import requests
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urljoin, urlparse, urlencode, parse_qsl
 import re
-from datetime import datetime, timedelta
-import pytz
+from datetime import datetime
+from parsers import get_backend, available_backends, css_matcher
+from extraction import extract_card_fields, is_promoted, CONTAINER_STRATEGY, IMAGE_STRATEGY
+from seen_store import SeenStore
+from streaming import StreamingPage, chunked
+from page_state import find_ads, ad_to_listing, is_promoted_ad
+from notifier import DiscordDispatcher
+from sinks import RenderedListing
+from scheduler import QuerySchedule, RequestBudget
+from metrics import metrics
+from transport import create_session, install_dns_cache, warm, iter_body
+from governor import Governor, CircuitOpen
+from pricing import PriceIndex
+from reposts import RepostIndex
+import state as warm_state
+from selector_cache import strategies as selector_strategies, selector_stats
+from timeparse import parse_publish_date, parse_timestamp, format_publish_date, is_fresh, age_seconds
 
 # Load environment variables
 load_dotenv('ini.env')
 
 # Configuration
 OLX_SEARCH_URL = os.getenv('OLX_SEARCH_URL', 'https://www.olx.pl/oferty/q-iphone/?search%5Border%5D=created_at:desc')
+# Extra searches, separated by newlines or ';'. Optional per-query interval: URL|SECONDS
+OLX_SEARCH_URLS = os.getenv('OLX_SEARCH_URLS', '')
 DISCORD_WEBHOOK_URL = os.getenv('DISCORD_WEBHOOK_URL')
 POLL_INTERVAL = int(os.getenv('POLL_INTERVAL', '45'))
 USER_AGENT = os.getenv('USER_AGENT', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120 Safari/537.36')
-SEEN_FILE = os.getenv('SEEN_FILE', './seen.json')
+SEEN_FILE = os.getenv('SEEN_FILE', './seen.json')  # Legacy JSON list, imported into SEEN_DB once
+SEEN_DB = os.getenv('SEEN_DB', './seen.db')
+SEEN_TTL_HOURS = float(os.getenv('SEEN_TTL_HOURS', '168'))
+HISTORY_DB = os.getenv('HISTORY_DB', './history.db')  # Every extracted listing and its price changes; empty disables
+# Adaptive scheduling: per-query intervals move between these bounds with the listing arrival rate
+MIN_POLL_INTERVAL = int(os.getenv('MIN_POLL_INTERVAL', '15'))
+MAX_POLL_INTERVAL = int(os.getenv('MAX_POLL_INTERVAL', '300'))
+BURST_DURATION = int(os.getenv('BURST_DURATION', '300'))  # Poll at MIN_POLL_INTERVAL this long after new listings
+REQUESTS_PER_MINUTE = float(os.getenv('REQUESTS_PER_MINUTE', '30'))  # Shared by all searches
+# Hard per-host cap on every OLX request (searches, catch-up pages, offer pages)
+OLX_REQUESTS_PER_MINUTE = float(os.getenv('OLX_REQUESTS_PER_MINUTE', '60'))
+BLOCK_COOLDOWN = int(os.getenv('BLOCK_COOLDOWN', '60'))  # First pause after a 403/429/captcha, doubled on each repeat
+BLOCK_MAX_COOLDOWN = int(os.getenv('BLOCK_MAX_COOLDOWN', '3600'))
+MAX_CONCURRENT_FETCHES = int(os.getenv('MAX_CONCURRENT_FETCHES', '8'))
+# Optional detail-page enrichment of new listings before they are announced
+ENRICH_DETAILS = os.getenv('ENRICH_DETAILS', 'false').lower() == 'true'
+ENRICH_CONCURRENCY = int(os.getenv('ENRICH_CONCURRENCY', '4'))
+ENRICH_CACHE_SIZE = int(os.getenv('ENRICH_CACHE_SIZE', '2000'))
+ENRICH_CACHE_TTL = int(os.getenv('ENRICH_CACHE_TTL', '3600'))
+NOTIFY_WORKERS = int(os.getenv('NOTIFY_WORKERS', '1'))
+# Extra notification sinks next to Discord; each has its own queue, workers, retries and rate limit
+TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
+TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID', '')
+TELEGRAM_PER_MINUTE = float(os.getenv('TELEGRAM_PER_MINUTE', '20'))
+NOTIFY_WEBHOOKS = os.getenv('NOTIFY_WEBHOOKS', '')  # Generic JSON webhooks, separated by ';'
+NOTIFY_FEED = os.getenv('NOTIFY_FEED', '')  # JSONL file path, or unix:/path/to.sock for a local feed
+PARSER_BACKEND = os.getenv('PARSER_BACKEND', 'lxml')  # lxml (fast) or bs4
+STREAM_PARSE = os.getenv('STREAM_PARSE', 'false').lower() == 'true'  # Extract cards while the page downloads (lxml only)
+USE_PAGE_STATE = os.getenv('USE_PAGE_STATE', 'true').lower() == 'true'  # Read the embedded JSON state before DOM heuristics
+PRICE_SNAPSHOT = os.getenv('PRICE_SNAPSHOT', './prices.json')
+STATE_SNAPSHOT = os.getenv('STATE_SNAPSHOT', './state.json')  # Schedules, selectors and cookies kept across restarts; empty disables
+DEAL_PERCENTILE = float(os.getenv('DEAL_PERCENTILE', '20'))  # Flag listings priced below this percentile of their model
+DEAL_MIN_SAMPLES = int(os.getenv('DEAL_MIN_SAMPLES', '15'))
+PRICE_HALF_LIFE_DAYS = float(os.getenv('PRICE_HALF_LIFE_DAYS', '14'))
+REPOST_ACTION = os.getenv('REPOST_ACTION', 'tag')  # tag, suppress or off
+REPOST_WINDOW_HOURS = float(os.getenv('REPOST_WINDOW_HOURS', '72'))
+REPOST_SIMILARITY = float(os.getenv('REPOST_SIMILARITY', '0.6'))
+DNS_CACHE_TTL = int(os.getenv('DNS_CACHE_TTL', '300'))  # 0 disables
+WARM_CONNECTIONS = os.getenv('WARM_CONNECTIONS', 'true').lower() == 'true'  # Re-open idle Discord/Telegram connections right before a poll
+WARM_LEAD = 2  # Seconds before the poll
+RULES_FILE = os.getenv('RULES_FILE', '')  # JSON watch rules; empty sends every new listing to DISCORD_WEBHOOK_URL
+# Shared SQLite file (on a volume every worker mounts) that splits searches between workers; empty runs one worker alone
+COORDINATION_DB = os.getenv('COORDINATION_DB', '')
+LEASE_TTL = int(os.getenv('LEASE_TTL', '60'))  # Searches of a worker silent this long move to the others
+WORKER_ID = os.getenv('WORKER_ID')  # Prefix of the worker ID, hostname by default; the pid is appended
+FRESH_WINDOW_MINUTES = 2  # Normal polls only announce listings published this recently
+# After a restart or an outage longer than CATCHUP_GAP seconds, read pages 2..N back to the last successful poll
+CATCHUP_GAP = int(os.getenv('CATCHUP_GAP', '180'))
+CATCHUP_MAX_PAGES = int(os.getenv('CATCHUP_MAX_PAGES', '5'))
+CATCHUP_CONCURRENCY = int(os.getenv('CATCHUP_CONCURRENCY', '3'))
+CATCHUP_MAX_MINUTES = int(os.getenv('CATCHUP_MAX_MINUTES', '180'))  # Older listings are not worth announcing anymore
+# Stop parsing a page after this many consecutive already-seen (non-promoted) listings
+KNOWN_RUN_LIMIT = int(os.getenv('KNOWN_RUN_LIMIT', '3'))
+HEARTBEAT_INTERVAL = 2  # Seconds between event loop ticks when run under the supervisor
 
 # Setup logging
 logging.basicConfig(
@@ -34,37 +105,121 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def page_url(url, page):
+    """Search URL for a given results page"""
+    parsed = urlparse(url)
+    params = [(key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True) if key != 'page']
+    if page > 1:
+        params.append(('page', str(page)))
+    return parsed._replace(query=urlencode(params, safe=':')).geturl()
+
+def dedupe_listings(listings):
+    """Listings with repeated IDs removed, first occurrence kept"""
+    unique_listings = []
+    seen_ids = set()
+    for listing in listings:
+        if listing['id'] not in seen_ids:
+            unique_listings.append(listing)
+            seen_ids.add(listing['id'])
+    return unique_listings
+
+class SearchQuery:
+    """A single OLX search watched by the bot"""
+    def __init__(self, url, interval=POLL_INTERVAL):
+        self.url = url
+        self.interval = interval
+        self.is_first_run = True
+        # Time of the last successful poll; a long gap triggers a catch-up scan
+        self.last_success = None
+        # Set on a resume without seen IDs: listings published before it were handled by the previous run
+        self.alert_after = None
+        self.schedule = QuerySchedule(interval, MIN_POLL_INTERVAL, MAX_POLL_INTERVAL, burst_duration=BURST_DURATION)
+
+    def __repr__(self):
+        return f"SearchQuery({self.url!r}, interval={self.interval})"
+
+def load_search_queries():
+    """Build the list of searches from OLX_SEARCH_URL and OLX_SEARCH_URLS"""
+    queries = []
+    entries = [OLX_SEARCH_URL] + re.split(r'[;\n]', OLX_SEARCH_URLS)
+    for entry in entries:
+        entry = entry.strip()
+        if not entry:
+            continue
+        url, _, interval = entry.partition('|')
+        url = url.strip()
+        if any(query.url == url for query in queries):
+            continue
+        try:
+            interval = int(interval) if interval.strip() else POLL_INTERVAL
+        except ValueError:
+            logger.error(f"Invalid poll interval for {url}: {interval}, using {POLL_INTERVAL}s")
+            interval = POLL_INTERVAL
+        queries.append(SearchQuery(url, max(1, interval)))
+    return queries
+
 class OLXSniperBot:
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': USER_AGENT,
+    def __init__(self, queries=None, heartbeat=None):
+        self.queries = queries or load_search_queries()
+        # Shared-memory heartbeat when supervised (see supervisor.py)
+        self.heartbeat = heartbeat
+        # One pool shared by every query, sized for the concurrent fetches
+        self.session = create_session(USER_AGENT, pool_maxsize=MAX_CONCURRENT_FETCHES, headers={
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'pl-PL,pl;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         })
-        self.seen_listings = self.load_seen_listings()
-        
-    def load_seen_listings(self):
-        """Load previously seen listing IDs"""
-        try:
-            if os.path.exists(SEEN_FILE):
-                with open(SEEN_FILE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-        except Exception as e:
-            logger.error(f"Error loading seen listings: {e}")
-        return []
-    
-    def save_seen_listings(self):
-        """Save seen listing IDs"""
-        try:
-            with open(SEEN_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.seen_listings, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            logger.error(f"Error saving seen listings: {e}")
+        # Every webhook dispatcher shares one discord.com pool
+        self.discord_session = create_session(pool_maxsize=max(NOTIFY_WORKERS, 4))
+        self.governor = Governor(OLX_REQUESTS_PER_MINUTE, base_cooldown=BLOCK_COOLDOWN, max_cooldown=BLOCK_MAX_COOLDOWN)
+        self.seen = SeenStore(SEEN_DB, ttl=SEEN_TTL_HOURS * 3600, legacy_file=SEEN_FILE)
+        self.parser = get_backend(PARSER_BACKEND)
+        self.history = None
+        if HISTORY_DB:
+            from history import ListingHistory
+            self.history = ListingHistory(HISTORY_DB)
+        self.notifier = None
+        # Dispatchers for rules that route to their own webhook
+        self.rule_notifiers = {}
+        # Telegram, generic webhook and feed sinks; every announced listing goes to all of them
+        self.sinks = []
+        # Optional features import their modules only when enabled, so startup stays short
+        self.rules = None
+        if RULES_FILE:
+            from rules import load_rules
+            self.rules = load_rules(RULES_FILE)
+        self.coordinator = None
+        if COORDINATION_DB:
+            from coordination import Coordinator
+            self.coordinator = Coordinator(COORDINATION_DB, worker_id=WORKER_ID, lease_ttl=LEASE_TTL)
+        # Coordinated workers each write their own snapshots and start from the newest one
+        worker_id = self.coordinator.worker_id if self.coordinator else None
+        self.price_snapshot = warm_state.worker_path(PRICE_SNAPSHOT, worker_id)
+        self.state_snapshot = warm_state.worker_path(STATE_SNAPSHOT, worker_id)
+        self.prices = PriceIndex(self.price_snapshot, percentile=DEAL_PERCENTILE, min_samples=DEAL_MIN_SAMPLES,
+                                 half_life_days=PRICE_HALF_LIFE_DAYS, load_from=warm_state.latest(PRICE_SNAPSHOT))
+        self.state_saved_at = time.monotonic()
+        self.reposts = RepostIndex(window=REPOST_WINDOW_HOURS * 3600, threshold=REPOST_SIMILARITY) if REPOST_ACTION != 'off' else None
+        self.enricher = None
+        if ENRICH_DETAILS:
+            from enrichment import DetailEnricher, TTLCache
+            self.enricher = DetailEnricher(
+                self.session, max_concurrent=ENRICH_CONCURRENCY, parser=self.parser, governor=self.governor,
+                cache=TTLCache(maxsize=ENRICH_CACHE_SIZE, ttl=ENRICH_CACHE_TTL)
+            )
+        # (search URL, listing ID) queued for Discord but not delivered yet
+        self.pending_notifications = set()
+        snapshot_path = warm_state.latest(STATE_SNAPSHOT)
+        snapshot = warm_state.load(snapshot_path)
+        if snapshot:
+            restored = warm_state.restore(snapshot, self.queries, selector_strategies(), self.session)
+            logger.info(f"Warm start: restored the schedule of {restored} searches, selectors and session cookies from {snapshot_path}")
     
+    def save_state(self):
+        """Write the price statistics and the warm-start snapshot"""
+        self.prices.save()
+        warm_state.save(self.state_snapshot, warm_state.capture(self.queries, selector_strategies(), self.session))
+        
     def extract_title_from_url(self, url):
         """Extract title from OLX URL"""
         try:
@@ -81,72 +236,207 @@ class OLXSniperBot:
             logger.error(f"Error extracting title from URL: {e}")
         return None
     
-    def fetch_listings(self):
-        """Fetch and parse OLX listings"""
+    def fetch_listings(self, url=OLX_SEARCH_URL, is_known=None, max_age_minutes=FRESH_WINDOW_MINUTES, stats=None):
+        """Fetch and parse OLX listings; stats, if given, gets 'ok' and 'reached_known' flags, the response 'outcome'
+        and 'admitted_at', when the governor let the request through"""
+        if stats is None:
+            stats = {}
         try:
-            logger.info(f"Fetching listings from: {OLX_SEARCH_URL}")
-            response = self.session.get(OLX_SEARCH_URL, timeout=30)
-            response.raise_for_status()
+            logger.info(f"Fetching listings from: {url}")
+            if STREAM_PARSE and self.parser.name == 'lxml':
+                return self.fetch_listings_streaming(url, is_known, max_age_minutes, stats)
+            # Streamed download and content decoding; connect/TTFB/download phases go to http_phase_seconds
+            with metrics.timer('stage_seconds', stage='fetch'):
+                response, content, outcome = self.governor.get(self.session, url, timeout=30, stats=stats)
+            stats['outcome'] = outcome
+            if outcome not in ('ok', 'layout_changed'):
+                logger.error(f"OLX answered {url} with HTTP {response.status_code} ({outcome}), no listings read")
+                return []
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            listings = []
-            
-            # Find listing containers - look for containers that have offer links
-            listing_containers = []
-            
-            # Alternative approach: Look for common OLX listing containers
-            # Try different selectors that might contain listings
-            listing_selectors = [
-                '[data-testid="listing"]',
-                '[data-testid="ad-card"]',
-                '.css-1sw7q4x',  # Common OLX listing class
-                '.css-1ap3yc9',  # Another common OLX class
-                '[class*="css-"][class*="listing"]',
-                '[class*="css-"][class*="card"]',
-                '[class*="css-"][class*="offer"]'
-            ]
+            encoding = response.encoding if 'charset' in response.headers.get('Content-Type', '') else None
+            listings = self.parse_listings(content, encoding=encoding, is_known=is_known,
+                                           max_age_minutes=max_age_minutes, stats=stats)
+            # A page that doesn't look like a search page must not move the catch-up cursor
+            stats['ok'] = outcome == 'ok'
+            return listings
             
-            for selector in listing_selectors:
-                found_containers = soup.select(selector)
-                if found_containers:
-                    logger.info(f"Found {len(found_containers)} containers with selector: {selector}")
-                    listing_containers.extend(found_containers)
-                    break
-            
-            # If no containers found with selectors, fall back to the original method
-            if not listing_containers:
-                logger.info("No containers found with selectors, trying original method...")
-                # First, find all offer links
-                offer_links = soup.find_all('a', href=True)
-                offer_links = [link for link in offer_links if '/oferta/' in link.get('href', '')]
-                
-                logger.info(f"Found {len(offer_links)} offer links")
-                
-                for link in offer_links:
-                    # Find the container that contains this link
-                    container = link
-                    # Go up the DOM tree to find a suitable container
-                    for _ in range(5):  # Limit search depth
-                        container = container.parent
-                        if not container:
-                            break
-                        
-                        # Check if this container looks like a listing container
-                        container_class = container.get('class', [])
-                        container_class_str = ' '.join(container_class).lower()
-                        
-                        if any(keyword in container_class_str for keyword in ['css-', 'listing', 'offer', 'card', 'item']):
-                            if container not in listing_containers:
-                                listing_containers.append(container)
-                            break
-                    else:
-                        # If no suitable container found, use the link itself
-                        if link not in listing_containers:
-                            listing_containers.append(link)
+        except CircuitOpen as e:
+            stats['outcome'] = 'circuit_open'
+            logger.warning(f"Not fetching {url}: {e}")
+            return []
+        except Exception as e:
+            stats.setdefault('outcome', 'error')
+            metrics.inc('parse_failures', reason='fetch')
+            logger.error(f"Error fetching listings: {e}")
+            return []
+    
+    def fetch_listings_streaming(self, url, is_known, max_age_minutes, stats):
+        """fetch_listings, parsing cards while the body downloads and closing it once they are done"""
+        with metrics.timer('stage_seconds', stage='fetch'):
+            response = self.governor.open(self.session, url, timeout=30, stats=stats)
+        received = []
+        
+        def chunks():
+            for chunk in iter_body(self.session, response, url):
+                received.append(chunk)
+                yield chunk
+        
+        try:
+            listings = []
+            if response.status_code < 400:
+                encoding = response.encoding if 'charset' in response.headers.get('Content-Type', '') else None
+                listings = self.parse_listings(chunks(), encoding=encoding, is_known=is_known,
+                                               max_age_minutes=max_age_minutes, stats=stats, stream=True)
+            else:
+                for _ in chunks():
+                    pass
+            outcome = self.governor.finish(url, response, b''.join(received), complete=stats.get('complete', True))
+        except Exception:
+            # Any failure (download, decoding, parsing) must settle the request, or a half-open probe never ends
+            self.governor.record(url, 'error')
+            raise
+        finally:
+            # An unread remainder drops the connection; the next request opens a new one
+            response.close()
+        stats['outcome'] = outcome
+        if outcome not in ('ok', 'layout_changed'):
+            logger.error(f"OLX answered {url} with HTTP {response.status_code} ({outcome}), no listings read")
+            return []
+        stats['ok'] = outcome == 'ok'
+        return listings
+    
+    def parse_listings(self, content, encoding=None, parser=None, today_only=True, is_known=None, use_state=USE_PAGE_STATE,
+                       max_age_minutes=FRESH_WINDOW_MINUTES, stats=None, stream=False):
+        """Parse listings out of a search results page
+
+        With is_known, cards are walked newest first and parsing stops after KNOWN_RUN_LIMIT
+        consecutive known listings; known cards only get their text fields read, for the listing history. With today_only, only listings
+        published within max_age_minutes are kept. With stream, content may be an iterable of byte
+        chunks that is parsed as it arrives (see parse_listings_stream).
+        """
+        if stream:
+            listings, content = self.parse_listings_stream(content, encoding=encoding, parser=parser, today_only=today_only,
+                                                           is_known=is_known, use_state=use_state,
+                                                           max_age_minutes=max_age_minutes, stats=stats)
+            if listings is not None:
+                return listings
+        with metrics.timer('stage_seconds', stage='parse'):
+            ads = find_ads(content) if use_state else None
+        if ads:
+            return self.parse_state_listings(ads, today_only=today_only, is_known=is_known,
+                                             max_age_minutes=max_age_minutes, stats=stats)
+        if use_state:
+            logger.info("No embedded page state found, falling back to DOM parsing")
+        
+        with metrics.timer('stage_seconds', stage='parse'):
+            root = (parser or self.parser).parse(content, encoding=encoding)
+        
+        # Find listing containers - look for containers that have offer links
+        listing_containers = []
+        
+        # Look for common OLX listing containers, the selector that matched last time first
+        found_containers = CONTAINER_STRATEGY.find(lambda selector: root.select(selector) or None)
+        if found_containers:
+            logger.info(f"Found {len(found_containers)} containers with selector: {CONTAINER_STRATEGY.winner}")
+            listing_containers.extend(found_containers)
+        
+        # If no containers found with selectors, fall back to the original method
+        if not listing_containers:
+            logger.info("No containers found with selectors, trying original method...")
+            # First, find all offer links
+            offer_links = root.find_all('a', href=True)
+            offer_links = [link for link in offer_links if '/oferta/' in link.get('href', '')]
             
-            logger.info(f"Found {len(listing_containers)} listing containers")
+            logger.info(f"Found {len(offer_links)} offer links")
             
-            for container in listing_containers:
+            for link in offer_links:
+                # Find the container that contains this link
+                container = link
+                # Go up the DOM tree to find a suitable container
+                for _ in range(5):  # Limit search depth
+                    container = container.parent
+                    if not container:
+                        break
+                    
+                    # Check if this container looks like a listing container
+                    container_class = container.get('class', [])
+                    container_class_str = ' '.join(container_class).lower()
+                    
+                    if any(keyword in container_class_str for keyword in ['css-', 'listing', 'offer', 'card', 'item']):
+                        if container not in listing_containers:
+                            listing_containers.append(container)
+                        break
+                else:
+                    # If no suitable container found, use the link itself
+                    if link not in listing_containers:
+                        listing_containers.append(link)
+        
+        logger.info(f"Found {len(listing_containers)} listing containers")
+        if not listing_containers:
+            metrics.inc('parse_failures', reason='no_containers')
+        
+        listings = list(self.iter_card_listings(listing_containers, today_only=today_only, is_known=is_known,
+                                                max_age_minutes=max_age_minutes, stats=stats, total=len(listing_containers)))
+        unique_listings = dedupe_listings(listings)
+        logger.info(f"Found {len(unique_listings)} unique TODAY'S listings out of {len(listings)} total offers")
+        return unique_listings
+    
+    def parse_listings_stream(self, chunks, encoding=None, parser=None, today_only=True, is_known=None, use_state=USE_PAGE_STATE,
+                              max_age_minutes=FRESH_WINDOW_MINUTES, stats=None):
+        """Extract listings card by card while the page is still arriving
+
+        Uses the container selector that won last time; reading stops as soon as the known run ends
+        the listings or the page state turns up before the first card. Returns (listings, None), or
+        (None, whole body) when the page has to be parsed in full instead.
+        """
+        if isinstance(chunks, (bytes, str)):
+            chunks = chunked(chunks)
+        selector = CONTAINER_STRATEGY.winner
+        if not selector or (parser or self.parser).name != 'lxml' or css_matcher(selector) is None:
+            return None, b''.join(chunks)
+        
+        started = time.perf_counter()
+        page = StreamingPage(chunks, selector, encoding=encoding, want_state=use_state)
+        listings = []
+        for listing in self.iter_card_listings(page.cards(), today_only=today_only, is_known=is_known,
+                                               max_age_minutes=max_age_minutes, stats=stats):
+            if not listings:
+                metrics.observe('stage_seconds', time.perf_counter() - started, stage='first_listing')
+            listings.append(listing)
+        metrics.observe('stage_seconds', time.perf_counter() - started, stage='stream_parse')
+        if stats is not None:
+            stats['complete'] = page.complete
+        
+        if page.state_text:
+            ads = find_ads(page.state_text)
+            if ads:
+                return self.parse_state_listings(ads, today_only=today_only, is_known=is_known,
+                                                 max_age_minutes=max_age_minutes, stats=stats), None
+        if not page.card_count:
+            # Layout changed under the learned selector: let the full parse re-learn it
+            logger.info(f"No cards matched {selector!r} while streaming, parsing the whole page")
+            if stats is not None:
+                stats['complete'] = True
+            return None, page.rest()
+        metrics.inc('selector_hits', field='container', selector=selector)
+        
+        unique_listings = dedupe_listings(listings)
+        logger.info(f"Streamed {page.card_count} cards: {len(unique_listings)} TODAY'S listings" + ("" if page.complete else ", rest of the page skipped"))
+        return unique_listings, None
+    
+    def iter_card_listings(self, containers, today_only=True, is_known=None, max_age_minutes=FRESH_WINDOW_MINUTES, stats=None, total=None):
+        """Listing dicts of search result cards, in card order
+
+        containers may be a list or a stream of cards; iteration stops after KNOWN_RUN_LIMIT
+        consecutive known listings. total, if known, is only used for logging.
+        """
+        extract_time = 0.0
+        filter_time = 0.0
+        known_run = 0
+        # Every extracted card, recent or not, for the listing history
+        extracted = stats.setdefault('extracted', []) if stats is not None and self.history else None
+        try:
+            for index, container in enumerate(containers):
                 # Find the main link in this container
                 link = container.find('a', href=True) if container.name != 'a' else container
                 if not link or '/oferta/' not in link.get('href', ''):
@@ -161,22 +451,45 @@ class OLXSniperBot:
                 if not listing_id:
                     continue
                 
+                # Cheap ID check first: known listings need no extraction
+                if is_known:
+                    if is_known(listing_id):
+                        if extracted is not None:
+                            # Still a sighting for the history; the text fields are enough to follow the price
+                            started = time.perf_counter()
+                            extracted.append(self.known_card_listing(container, listing_id, href))
+                            extract_time += time.perf_counter() - started
+                        # Promoted cards are pinned regardless of age, so they don't end the run
+                        if not is_promoted(container):
+                            known_run += 1
+                            if known_run >= KNOWN_RUN_LIMIT:
+                                remaining = f"the remaining {total - index - 1} cards" if total is not None else "the rest of the page"
+                                logger.info(f"Reached {known_run} already seen listings, skipping {remaining}")
+                                if stats is not None:
+                                    stats['reached_known'] = True
+                                break
+                        continue
+                    known_run = 0
+                
                 # Extract title from URL (more reliable than HTML parsing)
                 title = self.extract_title_from_url(href)
                 if not title:
                     title = "iPhone na OLX"
                 
                 # Debug: Log container HTML to see what we're working with
-                logger.info(f"Container HTML for {title}: {str(container)[:300]}...")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Container HTML for {title}: {container.html()[:300]}...")
                 
-                # Extract data from the container (better context)
-                price = self.extract_price(container)
-                location = self.extract_location(container)
+                # Extract data from the container (better context) in a single pass
+                started = time.perf_counter()
+                fields = extract_card_fields(container)
+                price = fields['price']
+                location = fields['location']
+                publish_date = fields['publish_date']
                 image = self.extract_image(container)
-                publish_date = self.extract_publish_date(container)
                 
                 # Debug: Log what we extracted
-                logger.info(f"Extracted data for {title}: price={price}, location={location}, date={publish_date}")
+                logger.debug(f"Extracted data for {title}: price={price}, location={location}, date={publish_date}")
                 
                 # Debug logging for image extraction
                 if not image:
@@ -187,12 +500,15 @@ class OLXSniperBot:
                         logger.debug(f"Found image with alternative method: {image}")
                     else:
                         # Log container HTML for debugging
-                        logger.debug(f"Container HTML: {str(container)[:200]}...")
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug(f"Container HTML: {container.html()[:200]}...")
                 
                 # Only include offers from today
-                if not self.is_today_offer(publish_date):
-                    logger.debug(f"Skipping offer from {publish_date}: {title}")
-                    continue
+                filtered = time.perf_counter()
+                extract_time += filtered - started
+                published, has_time = parse_publish_date(publish_date) or (None, False)
+                is_recent = not today_only or self.is_today_offer(published, max_age_minutes, has_time=has_time)
+                filter_time += time.perf_counter() - filtered
                 
                 listing = {
                     'id': listing_id,
@@ -201,26 +517,96 @@ class OLXSniperBot:
                     'price': price or 'Cena do uzgodnienia',
                     'location': location or 'Brak',
                     'image': image or 'https://via.placeholder.com/300x200/007AFF/FFFFFF?text=iPhone',
-                    'publish_date': publish_date
+                    'publish_date': publish_date,
+                    'published_at': published.isoformat() if published and has_time else None
                 }
+                if extracted is not None:
+                    extracted.append(listing)
+                if not is_recent:
+                    logger.debug(f"Skipping offer from {publish_date}: {title}")
+                    continue
+                if published:
+                    listing['publish_date'] = format_publish_date(published, has_time=has_time)
                 
-                listings.append(listing)
                 logger.info(f"Found TODAY'S listing: {title} - {price} - {location} - {publish_date}")
+                yield listing
+        finally:
+            metrics.observe('stage_seconds', extract_time, stage='extract')
+            metrics.observe('stage_seconds', filter_time, stage='filter')
+    
+    def known_card_listing(self, container, listing_id, href):
+        """Title, price, location and publish time of an already seen card, without the image lookups"""
+        fields = extract_card_fields(container)
+        published, has_time = parse_publish_date(fields['publish_date']) or (None, False)
+        return {
+            'id': listing_id,
+            'title': self.extract_title_from_url(href) or "iPhone na OLX",
+            'url': href,
+            'price': fields['price'] or 'Cena do uzgodnienia',
+            'location': fields['location'] or 'Brak',
+            'publish_date': fields['publish_date'],
+            'published_at': published.isoformat() if published and has_time else None
+        }
+    
+    def parse_state_listings(self, ads, today_only=True, is_known=None, max_age_minutes=FRESH_WINDOW_MINUTES, stats=None):
+        """Build listings from the page's embedded state ads"""
+        listings = []
+        seen_ids = set()
+        extract_time = 0.0
+        filter_time = 0.0
+        known_run = 0
+        extracted = stats.setdefault('extracted', []) if stats is not None and self.history else None
+        
+        for index, ad in enumerate(ads):
+            url = ad.get('url') if isinstance(ad, dict) else None
+            if not url or '/oferta/' not in url:
+                continue
+            listing_id = self.extract_listing_id(url)
+            if not listing_id or listing_id in seen_ids:
+                continue
+            seen_ids.add(listing_id)
             
-            # Remove duplicates
-            unique_listings = []
-            seen_ids = set()
-            for listing in listings:
-                if listing['id'] not in seen_ids:
-                    unique_listings.append(listing)
-                    seen_ids.add(listing['id'])
+            if is_known:
+                if is_known(listing_id):
+                    if extracted is not None:
+                        # Building the listing from the state is cheap; the history still gets the sighting
+                        extracted.append(ad_to_listing(ad, listing_id))
+                    if not is_promoted_ad(ad):
+                        known_run += 1
+                        if known_run >= KNOWN_RUN_LIMIT:
+                            logger.info(f"Reached {known_run} already seen listings, skipping the remaining {len(ads) - index - 1} ads")
+                            if stats is not None:
+                                stats['reached_known'] = True
+                            break
+                    continue
+                known_run = 0
             
-            logger.info(f"Found {len(unique_listings)} unique TODAY'S listings out of {len(listings)} total offers")
-            return unique_listings
+            started = time.perf_counter()
+            listing = ad_to_listing(ad, listing_id)
+            if extracted is not None:
+                extracted.append(listing)
+            filtered = time.perf_counter()
+            extract_time += filtered - started
+            is_recent = not today_only or self.is_today_offer(parse_timestamp(listing['published_at']), max_age_minutes)
+            filter_time += time.perf_counter() - filtered
+            if not is_recent:
+                logger.debug(f"Skipping offer from {listing['publish_date']}: {listing['title']}")
+                continue
             
-        except Exception as e:
-            logger.error(f"Error fetching listings: {e}")
-            return []
+            listings.append(listing)
+            logger.info(f"Found TODAY'S listing: {listing['title']} - {listing['price']} - {listing['location']} - {listing['publish_date']}")
+        
+        metrics.observe('stage_seconds', extract_time, stage='extract')
+        metrics.observe('stage_seconds', filter_time, stage='filter')
+        logger.info(f"Found {len(listings)} TODAY'S listings in page state ({len(ads)} ads)")
+        return listings
+    
+    def compare_parser_backends(self, content, encoding=None):
+        """Parse a page's DOM with every available backend so their listings can be checked against each other"""
+        return {
+            name: self.parse_listings(content, encoding=encoding, parser=get_backend(name), today_only=False, use_state=False)
+            for name in available_backends()
+        }
     
     def extract_listing_id(self, url):
         """Extract listing ID from URL"""
@@ -229,166 +615,25 @@ class OLXSniperBot:
             match = re.search(r'-ID([A-Za-z0-9]+)\.html', url)
             if match:
                 return match.group(1)
-            # Fallback: use URL hash
-            return str(hash(url))[-8:]
+            # Fallback: stable URL hash (hash() is salted per process, so IDs would change on restart)
+            return hashlib.sha1(url.split('?')[0].encode('utf-8')).hexdigest()[:12]
         except Exception:
             return None
     
     def extract_price(self, element):
         """Extract price from listing element"""
-        try:
-            # Look for price in specific elements first
-            price_selectors = [
-                'span[data-testid="ad-price"]',
-                'p[data-testid="ad-price"]',
-                '.css-1bafgv4',
-                '.css-1u2vqda',
-                '.price',
-                '.offer-price',
-                '[class*="price"]',
-                '[class*="cost"]'
-            ]
-            
-            for selector in price_selectors:
-                price_elem = element.select_one(selector)
-                if price_elem:
-                    price_text = price_elem.get_text().strip()
-                    price_match = re.search(r'(\d+(?:\s*\d+)*(?:,\d+)?\s*(?:zł|PLN|€|\$))', price_text)
-                    if price_match:
-                        logger.debug(f"Found price with selector '{selector}': {price_match.group(1)}")
-                        return price_match.group(1)
-            
-            # Look for price patterns in all text
-            text = element.get_text()
-            price_match = re.search(r'(\d+(?:\s*\d+)*(?:,\d+)?\s*(?:zł|PLN|€|\$))', text)
-            if price_match:
-                logger.debug(f"Found price in text: {price_match.group(1)}")
-                return price_match.group(1)
-            
-            # Look in parent elements
-            parent = element.parent
-            if parent:
-                parent_text = parent.get_text()
-                price_match = re.search(r'(\d+(?:\s*\d+)*(?:,\d+)?\s*(?:zł|PLN|€|\$))', parent_text)
-                if price_match:
-                    logger.debug(f"Found price in parent: {price_match.group(1)}")
-                    return price_match.group(1)
-                    
-        except Exception as e:
-            logger.debug(f"Error extracting price: {e}")
-        return None
+        return extract_card_fields(element)['price']
     
     def extract_location(self, element):
         """Extract location from listing element"""
-        try:
-            # Get all text from the element first
-            all_text = element.get_text()
-            logger.info(f"All text from element for location: {all_text[:300]}...")
-            
-            # Look for location-date pattern in all text first (most reliable)
-            # Pattern like "Murowana Goślina - Dzisiaj o 11:49"
-            location_patterns = [
-                r'([A-Za-ząćęłńóśźżĄĆĘŁŃÓŚŹŻ\s\-]+)\s*-\s*(Dzisiaj o \d{1,2}:\d{2})',
-                r'([A-Za-ząćęłńóśźżĄĆĘŁŃÓŚŹŻ\s\-]+)\s*-\s*(Wczoraj o \d{1,2}:\d{2})',
-                r'([A-Za-ząćęłńóśźżĄĆĘŁŃÓŚŹŻ\s\-]+)\s*-\s*(Dzisiaj)',
-                r'([A-Za-ząćęłńóśźżĄĆĘŁŃÓŚŹŻ\s\-]+)\s*-\s*(Wczoraj)',
-                r'([A-Za-ząćęłńóśźżĄĆĘŁŃÓŚŹŻ\s\-]+)\s*-\s*(\d{1,2}\.\d{1,2}\.\d{4})'
-            ]
-            
-            for pattern in location_patterns:
-                location_match = re.search(pattern, all_text)
-                if location_match:
-                    location = location_match.group(1).strip()
-                    logger.info(f"Found location with pattern '{pattern}': {location}")
-                    return location
-            
-            # If no pattern match, try specific selectors
-            location_selectors = [
-                'p[data-testid="location-date"]',
-                'span[data-testid="location-date"]',
-                'p[data-testid="location"]',
-                'span[data-testid="location"]',
-                '.css-veheph',
-                '.css-17o22yg',
-                '.css-1a4brun',
-                '[class*="location"]',
-                '[class*="city"]',
-                'small',
-                'span[class*="css-"]',
-                'p[class*="css-"]',
-                '[class*="css-"][class*="location"]',
-                '[class*="css-"][class*="city"]'
-            ]
-            
-            for selector in location_selectors:
-                location_elem = element.select_one(selector)
-                if location_elem:
-                    location_text = location_elem.get_text().strip()
-                    logger.info(f"Checking location text with selector '{selector}': {location_text}")
-                    
-                    # Try the same patterns on this specific element
-                    for pattern in location_patterns:
-                        location_match = re.search(pattern, location_text)
-                        if location_match:
-                            location = location_match.group(1).strip()
-                            logger.info(f"Found location with selector '{selector}' and pattern '{pattern}': {location}")
-                            return location
-                    
-                    # Also try to extract just the location part if it looks like a city
-                    if len(location_text) > 3 and len(location_text) < 50 and not any(char.isdigit() for char in location_text):
-                        logger.info(f"Found potential location with selector '{selector}': {location_text}")
-                        return location_text
-            
-            # Look for common Polish cities in all text
-            cities = ['Warszawa', 'Kraków', 'Gdańsk', 'Wrocław', 'Poznań', 'Łódź', 'Szczecin', 
-                     'Bydgoszcz', 'Lublin', 'Katowice', 'Białystok', 'Gdynia', 'Częstochowa', 
-                     'Radom', 'Sosnowiec', 'Toruń', 'Kielce', 'Gliwice', 'Zabrze', 'Bytom', 
-                     'Olsztyn', 'Bielsko-Biała', 'Rzeszów', 'Ruda Śląska', 'Rybnik', 'Tychy', 
-                     'Dąbrowa Górnicza', 'Płock', 'Elbląg', 'Opole', 'Gorzów Wielkopolski', 
-                     'Włocławek', 'Zielona Góra', 'Tarnów', 'Chorzów', 'Kalisz', 'Koszalin', 
-                     'Legnica', 'Grudziądz', 'Słupsk', 'Jaworzno', 'Jastrzębie-Zdrój', 
-                     'Jelenia Góra', 'Nowy Sącz', 'Konin', 'Piotrków Trybunalski', 'Lubin', 
-                     'Inowrocław', 'Ostrów Wielkopolski', 'Stargard', 'Mysłowice', 'Piła', 
-                     'Ostrowiec Świętokrzyski', 'Siedlce', 'Mielec', 'Oława', 'Gniezno', 
-                     'Głogów', 'Swarzędz', 'Tarnobrzeg', 'Żory', 'Pruszków', 'Racibórz', 
-                     'Świętochłowice', 'Zawiercie', 'Starachowice', 'Skierniewice', 'Kutno', 
-                     'Otwock', 'Żywiec', 'Wejherowo', 'Zgierz', 'Będzin', 'Pabianice', 
-                     'Rumia', 'Świdnica', 'Żyrardów', 'Kraśnik', 'Mikołów', 'Łomża', 
-                     'Żagań', 'Świnoujście', 'Kołobrzeg', 'Ostrołęka', 'Stalowa Wola', 
-                     'Myszków', 'Łuków', 'Grodzisk Mazowiecki', 'Skarżysko-Kamienna', 
-                     'Jarocin', 'Krotoszyn', 'Zduńska Wola', 'Śrem', 'Kłodzko', 'Nowa Sól', 
-                     'Środa Wielkopolska', 'Gostyń', 'Rawicz', 'Kępno', 'Ostrzeszów', 'Brzesko',
-                     'Murowana Goślina', 'Olszowice']
-            
-            for city in cities:
-                if city.lower() in all_text.lower():
-                    logger.info(f"Found city in all text: {city}")
-                    return city
-                    
-            logger.info("No location found in any method")
-        except Exception as e:
-            logger.info(f"Error extracting location: {e}")
-        return None
+        return extract_card_fields(element)['location']
     
     def extract_image(self, element):
         """Extract image URL from listing element"""
         try:
             # Look for images in specific elements first - prioritize data attributes
-            image_selectors = [
-                'img[data-src]',
-                'img[data-lazy-src]', 
-                'img[data-original]',
-                'img[src]',
-                '.css-1bmvjcs img',
-                '[class*="image"] img',
-                '[class*="photo"] img',
-                '[class*="thumbnail"] img',
-                'img'
-            ]
-            
-            for selector in image_selectors:
-                img_elements = element.select(selector)
-                for img_elem in img_elements:
+            def image_probe(selector):
+                for img_elem in element.select(selector):
                     # Try multiple attributes in order of preference
                     src = (img_elem.get('data-src') or 
                            img_elem.get('data-lazy-src') or 
@@ -415,6 +660,11 @@ class OLXSniperBot:
                         if src.startswith('http'):
                             logger.debug(f"Found image with selector '{selector}': {src}")
                             return src
+                return None
+            
+            src = IMAGE_STRATEGY.find(image_probe)
+            if src:
+                return src
             
             # If no image found in the element, try parent elements
             parent = element.parent
@@ -473,305 +723,464 @@ class OLXSniperBot:
                         logger.debug(f"Alternative method found image: {src}")
                         return src
             
-            # Try to extract from the offer URL itself (sometimes images are in the URL structure)
-            if '/oferta/' in url:
-                # This is a fallback - sometimes OLX has predictable image URLs
-                # But we'll skip this for now as it's not reliable
-                pass
+            # Photos from the offer page itself are filled in by the detail enricher (ENRICH_DETAILS)
                 
         except Exception as e:
             logger.debug(f"Error in alternative image extraction: {e}")
         return None
     
     def extract_publish_date(self, element):
-        """Extract publish date from listing element and add 2 hours to time"""
-        try:
-            # Get all text from the element first
-            all_text = element.get_text()
-            logger.info(f"All text from element: {all_text[:300]}...")
-            
-            # Look for date patterns in all text first (most reliable)
-            date_patterns = [
-                r'(Dzisiaj o \d{1,2}:\d{2})',  # "Dzisiaj o 11:49"
-                r'(Wczoraj o \d{1,2}:\d{2})',  # "Wczoraj o 15:20"
-                r'(Dzisiaj)',                   # Just "Dzisiaj"
-                r'(Wczoraj)',                   # Just "Wczoraj"
-                r'(\d{1,2}\.\d{1,2}\.\d{4})',  # "17.10.2024"
-                r'(\d{1,2} \w+ \d{4})',        # "17 października 2024"
-            ]
-            
-            for pattern in date_patterns:
-                date_match = re.search(pattern, all_text)
-                if date_match:
-                    date_found = date_match.group(1)
-                    
-                    # If it's a time pattern like "Dzisiaj o 10:06", add 2 hours
-                    if 'o \d{1,2}:\d{2}' in pattern:
-                        time_match = re.search(r'(\d{1,2}):(\d{2})', date_found)
-                        if time_match:
-                            hour = int(time_match.group(1))
-                            minute = time_match.group(2)
-                            # Add 2 hours
-                            new_hour = hour + 2
-                            if new_hour >= 24:
-                                new_hour = new_hour - 24
-                            corrected_time = f"{new_hour:02d}:{minute}"
-                            date_found = date_found.replace(time_match.group(0), corrected_time)
-                            logger.info(f"Added 2 hours to time: {date_match.group(1)} -> {date_found}")
-                    
-                    logger.info(f"Found date with pattern '{pattern}': {date_found}")
-                    return date_found
-            
-            # If no date found in text, try specific selectors
-            date_selectors = [
-                'p[data-testid="location-date"]',
-                'span[data-testid="location-date"]',
-                'p[data-testid="date"]',
-                'span[data-testid="date"]',
-                '.css-veheph',
-                '.css-17o22yg',
-                '.css-1a4brun',
-                '[class*="date"]',
-                '[class*="time"]',
-                'small',
-                'span[class*="css-"]',
-                'p[class*="css-"]',
-                '[class*="css-"][class*="date"]',
-                '[class*="css-"][class*="time"]'
-            ]
-            
-            for selector in date_selectors:
-                date_elem = element.select_one(selector)
-                if date_elem:
-                    date_text = date_elem.get_text().strip()
-                    logger.info(f"Checking date text with selector '{selector}': {date_text}")
-                    
-                    # Look for date patterns in this specific element
-                    for pattern in date_patterns:
-                        date_match = re.search(pattern, date_text)
-                        if date_match:
-                            date_found = date_match.group(1)
-                            
-                            # If it's a time pattern like "Dzisiaj o 10:06", add 2 hours
-                            if 'o \d{1,2}:\d{2}' in pattern:
-                                time_match = re.search(r'(\d{1,2}):(\d{2})', date_found)
-                                if time_match:
-                                    hour = int(time_match.group(1))
-                                    minute = time_match.group(2)
-                                    # Add 2 hours
-                                    new_hour = hour + 2
-                                    if new_hour >= 24:
-                                        new_hour = new_hour - 24
-                                    corrected_time = f"{new_hour:02d}:{minute}"
-                                    date_found = date_found.replace(time_match.group(0), corrected_time)
-                                    logger.info(f"Added 2 hours to time: {date_match.group(1)} -> {date_found}")
-                            
-                            logger.info(f"Found date with selector '{selector}' and pattern '{pattern}': {date_found}")
-                            return date_found
-            
-            # If still no date found, return None (don't assume it's recent)
-            logger.info("No date found - will exclude this offer")
-            return None
-                
-        except Exception as e:
-            logger.info(f"Error extracting publish date: {e}")
-            return None
+        """Extract the publish date text of a listing element, as OLX shows it"""
+        return extract_card_fields(element)['publish_date']
     
-    def is_today_offer(self, date_str):
-        """Check if the offer is from today and within the last 2 minutes compared to Discord notification time"""
-        if not date_str:
+    def is_today_offer(self, published, max_age_minutes=FRESH_WINDOW_MINUTES, has_time=True):
+        """Check if the offer was published within the last max_age_minutes
+
+        published is an aware datetime, or an OLX card date string which is parsed first.
+        """
+        if isinstance(published, str):
+            published, has_time = parse_publish_date(published) or (None, False)
+        if published is None:
             # If no date found, exclude it (be strict)
             logger.info("No date found - EXCLUDING offer")
             return False
         
-        try:
-            # ONLY include offers with "Dzisiaj" (Today)
-            if 'Dzisiaj' in date_str:
-                # Check if it has a time like "Dzisiaj o 12:24"
-                time_match = re.search(r'Dzisiaj o (\d{1,2}):(\d{2})', date_str)
-                if time_match:
-                    offer_hour = int(time_match.group(1))
-                    offer_minute = int(time_match.group(2))
-                    
-                    # Get current Polish time (Discord notification time)
-                    poland_tz = pytz.timezone('Europe/Warsaw')
-                    discord_time = datetime.now(poland_tz)
-                    discord_hour = discord_time.hour
-                    discord_minute = discord_time.minute
-                    
-                    # Calculate time difference in minutes
-                    discord_total_minutes = discord_hour * 60 + discord_minute
-                    offer_total_minutes = offer_hour * 60 + offer_minute
-                    
-                    # Calculate difference: Discord time - Offer time
-                    time_diff_minutes = discord_total_minutes - offer_total_minutes
-                    
-                    # Handle day rollover (if offer is from yesterday but still "Dzisiaj")
-                    if time_diff_minutes < 0:
-                        time_diff_minutes += 24 * 60  # Add 24 hours
-                    
-                    logger.info(f"Offer time: {offer_hour:02d}:{offer_minute:02d}, Discord time: {discord_hour:02d}:{discord_minute:02d}, Difference: {time_diff_minutes} minutes")
-                    
-                    # Only include offers where Discord time is max 2 minutes after offer time
-                    if time_diff_minutes <= 2 and time_diff_minutes >= 0:
-                        logger.info(f"Found recent offer: {date_str} (Discord is {time_diff_minutes} minutes after offer) - INCLUDING")
-                        return True
-                    else:
-                        logger.info(f"Found old offer: {date_str} (Discord is {time_diff_minutes} minutes after offer) - EXCLUDING")
-                        return False
-                else:
-                    # If it's just "Dzisiaj" without time, include it
-                    logger.info(f"Found 'Dzisiaj' without time: {date_str} - INCLUDING")
-                    return True
-            
-            # Exclude everything else (Wczoraj, specific dates, etc.)
-            logger.info(f"Date is not 'Dzisiaj': {date_str} - EXCLUDING")
-            return False
-                
-        except Exception as e:
-            logger.info(f"Error checking date: {e} - EXCLUDING")
-            return False
+        if not has_time:
+            # A bare "Dzisiaj" has no clock time to compare, so today is as precise as it gets
+            fresh = is_fresh(published, has_time=False)
+            logger.info(f"Found date without time: {published:%d.%m.%Y} - {'INCLUDING' if fresh else 'EXCLUDING'}")
+            return fresh
+        
+        age_minutes = age_seconds(published) / 60
+        if is_fresh(published, max_age_minutes=max_age_minutes):
+            logger.info(f"Found recent offer from {published:%d.%m %H:%M} ({age_minutes:.1f} minutes old) - INCLUDING")
+            return True
+        logger.info(f"Found old offer from {published:%d.%m %H:%M} ({age_minutes:.1f} minutes old) - EXCLUDING")
+        return False
+
+    def create_sinks(self):
+        """Sinks configured next to Discord"""
+        sinks = []
+        if TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID:
+            from sinks import TelegramSink
+            sinks.append(TelegramSink(TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, per_minute=TELEGRAM_PER_MINUTE))
+        if NOTIFY_WEBHOOKS:
+            from sinks import WebhookSink
+            sinks.extend(WebhookSink(url.strip(), name=f"webhook-{index}")
+                         for index, url in enumerate(NOTIFY_WEBHOOKS.split(';'), 1) if url.strip())
+        if NOTIFY_FEED:
+            from sinks import feed_sink
+            sinks.append(feed_sink(NOTIFY_FEED))
+        return sinks
     
-    def send_discord_notification(self, listing):
-        """Send Discord webhook notification"""
-        try:
-            # Prepare Discord embed data
-            # Get Polish timezone (UTC+2)
-            poland_tz = pytz.timezone('Europe/Warsaw')
-            poland_time = datetime.now(poland_tz)
-            
-            embed_data = {
-                "title": listing['title'],
-                "url": listing['url'],
-                "color": 3066993,  # Green color
-                "timestamp": poland_time.isoformat(),
-                "description": f"📌 {listing['title']}\n💰 Cena: {listing['price']}\n📍 Lokalizacja: {listing['location']}\n📅 Data: {listing.get('publish_date', 'Dzisiaj')}"
-            }
-            
-            # Add thumbnail if image available
-            if listing['image']:
-                embed_data["thumbnail"] = {"url": listing['image']}
-            else:
-                embed_data["thumbnail"] = {"url": "https://www.olx.pl/favicon.ico"}
-            
-            # Prepare webhook payload
-            payload = {
-                "content": "",
-                "username": "OLX Sniper Bot",
-                "embeds": [embed_data],
-                "components": [{
-                    "type": 1,
-                    "components": [{
-                        "type": 2,
-                        "style": 5,
-                        "label": "KUP TERAZ",
-                        "url": listing['url'],
-                        "emoji": {"name": "🔗"}
-                    }]
-                }]
-            }
-            
-            # Send webhook with retry logic
-            max_retries = 3
-            retry_delay = 5
-            
-            for attempt in range(1, max_retries + 1):
-                try:
-                    response = requests.post(
-                        DISCORD_WEBHOOK_URL,
-                        json=payload,
-                        headers={'Content-Type': 'application/json'},
-                        timeout=30
-                    )
-                    response.raise_for_status()
-                    logger.info(f"✅ Sent notification for: {listing['title']}")
-                    return True
-                    
-                except requests.exceptions.HTTPError as e:
-                    if e.response.status_code == 429:  # Rate limited
-                        logger.warning(f"Rate limited, waiting {retry_delay}s before retry {attempt}/{max_retries}")
-                        time.sleep(retry_delay)
-                        retry_delay *= 2  # Exponential backoff
-                        continue
-                    else:
-                        logger.error(f"HTTP error sending webhook (attempt {attempt}): {e}")
-                        break
-                except Exception as e:
-                    logger.error(f"Error sending webhook (attempt {attempt}): {e}")
-                    break
-            
-            logger.error(f"Failed to send notification for {listing['id']} after {max_retries} attempts")
-            return False
-            
-        except Exception as e:
-            logger.error(f"Error preparing Discord notification: {e}")
+    def sink_depths(self):
+        """Queued listings per sink, for /health"""
+        notifiers = [self.notifier, *self.rule_notifiers.values(), *self.sinks] if self.notifier else self.sinks
+        depths = {}
+        for notifier in notifiers:
+            name = notifier.name if notifier.name not in depths else f"{notifier.name}-{len(depths)}"
+            depths[name] = notifier.depth()
+        return depths
+    
+    def status(self):
+        """Health fields, metrics and selector stats, published to the supervisor"""
+        return {
+            'olx': self.governor.state(),
+            'worker_id': self.coordinator.worker_id if self.coordinator else None,
+            'leased_searches': sorted(self.coordinator.owned) if self.coordinator else None,
+            'notify_queues': self.sink_depths(),
+            'selectors': selector_stats(),
+            'metrics': metrics.render(),
+        }
+    
+    def notifier_for(self, webhook):
+        """Dispatcher for a rule's webhook; rules without one use DISCORD_WEBHOOK_URL"""
+        if not webhook or webhook == DISCORD_WEBHOOK_URL:
+            return self.notifier
+        notifier = self.rule_notifiers.get(webhook)
+        if notifier is None:
+            notifier = self.rule_notifiers[webhook] = DiscordDispatcher(webhook, workers=NOTIFY_WORKERS, session=self.discord_session)
+        return notifier
+    
+    async def send_discord_notification(self, listing, query_url=OLX_SEARCH_URL):
+        """Queue a listing on every matching sink; it is marked seen once a required sink delivers it"""
+        key = (query_url, listing['id'])
+        if key in self.pending_notifications:
             return False
+        published = parse_timestamp(listing.get('published_at'))
+        if published:
+            metrics.observe('alert_latency_seconds', max(age_seconds(published), 0), stage='detect')
+        repost_of = self.reposts.check(listing) if self.reposts else None
+        if repost_of:
+            metrics.inc('reposts', action=REPOST_ACTION)
+            logger.info(f"♻️ {listing['title']} ({listing['id']}) looks like a repost of {repost_of['id']} ({repost_of['similarity']:.0%} similar)")
+            if REPOST_ACTION == 'suppress' and repost_of['same_photo']:
+                # Only the same photo is proof enough to drop a listing; the rest are tagged
+                self.seen.add(query_url, listing['id'])
+                return False
+            listing = dict(listing, repost_of=repost_of)
+        
+        # Judge the price against earlier listings before it joins the statistics
+        deal = self.prices.assess(listing)
+        if not repost_of:
+            self.prices.observe(listing)
+        if deal:
+            metrics.inc('deals_flagged')
+            logger.info(f"🔥 Deal: {listing['title']} for {listing['price']}, {deal['discount']:.0%} below the {deal['group']} median")
+            listing = dict(listing, deal=deal)
+        targets = [self.notifier] if self.notifier else []
+        if self.rules:
+            matched = self.rules.match(listing)
+            if not matched:
+                logger.info(f"No watch rule matches {listing['title']} ({listing['id']})")
+                self.seen.add(query_url, listing['id'])
+                return False
+            listing = dict(listing, rules=[rule.name for rule in matched])
+            notifiers = filter(None, map(self.notifier_for, (rule.webhook for rule in matched)))
+            targets = list({id(notifier): notifier for notifier in notifiers}.values())
+        targets += self.sinks
+        # Feeds are best effort; they decide delivery only when nothing else is configured
+        required = [notifier for notifier in targets if notifier.required] or targets
+        self.pending_notifications.add(key)
+        if self.coordinator:
+            # Off the event loop: the claim may wait for another worker's rebalance to release the database
+            loop = asyncio.get_running_loop()
+            if not await loop.run_in_executor(None, self.coordinator.claim, query_url, listing['id']):
+                # Another worker announced it while the search was changing hands
+                self.pending_notifications.discard(key)
+                self.seen.add(query_url, listing['id'])
+                return False
+        results = []
+        results_lock = threading.Lock()
+        
+        def delivered(notifier, success):
+            with results_lock:
+                results.append((notifier, success))
+                if len(results) < len(targets):
+                    return
+            self.pending_notifications.discard(key)
+            # Retried on the next poll only if no required sink got it, so the others are not sent it twice
+            if any(success for notifier, success in results if notifier in required):
+                self.seen.add(query_url, listing['id'])
+                if self.coordinator:
+                    self.coordinator.confirm(query_url, listing['id'])
+                if published:
+                    metrics.observe('alert_latency_seconds', max(age_seconds(published), 0), stage='notify')
+            else:
+                logger.error(f"Failed to notify about {listing['id']}")
+                if self.coordinator:
+                    self.coordinator.unclaim(query_url, listing['id'])
+        
+        def dispatch(ready):
+            # Rendered once; every sink reuses the same embed, text and JSON
+            item = RenderedListing(ready)
+            for notifier in targets:
+                notifier.submit(item, lambda success, notifier=notifier: delivered(notifier, success))
+        
+        if self.enricher:
+            # The offer page is fetched off the poll loop; the listing is queued once it is enriched
+            self.enricher.submit(listing, dispatch)
+        else:
+            dispatch(listing)
+        return True
     
     def run(self):
         """Main bot loop"""
-        if not DISCORD_WEBHOOK_URL:
-            logger.error("DISCORD_WEBHOOK_URL not set in environment variables")
+        self.sinks = self.create_sinks()
+        if not DISCORD_WEBHOOK_URL and not any(sink.required for sink in self.sinks):
+            logger.error("DISCORD_WEBHOOK_URL not set in environment variables (and no Telegram chat or NOTIFY_WEBHOOKS)")
+            return
+        
+        if self.heartbeat and len(self.queries) > self.heartbeat.slots:
+            logger.error(f"{len(self.queries)} searches configured, the supervisor watches at most {self.heartbeat.slots}")
             return
         
-        logger.info(f"Starting OLX sniper bot. Polling {OLX_SEARCH_URL} every {POLL_INTERVAL}s")
+        install_dns_cache(DNS_CACHE_TTL)
+        if DISCORD_WEBHOOK_URL:
+            self.notifier = DiscordDispatcher(DISCORD_WEBHOOK_URL, workers=NOTIFY_WORKERS, session=self.discord_session)
+        try:
+            asyncio.run(self.run_async())
+        finally:
+            # Let queued alerts go out first: their callbacks mark listings seen or release their claims
+            if self.enricher:
+                self.enricher.close()
+            for notifier in [self.notifier, *self.rule_notifiers.values(), *self.sinks]:
+                if notifier:
+                    notifier.close()
+            self.save_state()
+            self.seen.close()
+            if self.history:
+                self.history.close()
+            if self.coordinator:
+                # Hand our searches over right away instead of after LEASE_TTL
+                self.coordinator.close()
+    
+    async def run_async(self):
+        """Poll every search query concurrently"""
+        loop = asyncio.get_running_loop()
+        # Blocking HTTP calls run here; the pool bounds concurrent requests across queries
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=MAX_CONCURRENT_FETCHES))
+        
+        logger.info(f"Starting OLX sniper bot. Watching {len(self.queries)} searches within {REQUESTS_PER_MINUTE:g} requests/min")
+        self.budget = RequestBudget(REQUESTS_PER_MINUTE)
+        
+        # Spread the first polls over the shortest interval instead of firing all at once
+        spread = min(query.interval for query in self.queries) / len(self.queries)
+        tasks = [
+            self.poll_query(query, start_delay=index * spread, slot=index)
+            for index, query in enumerate(self.queries)
+        ]
+        if self.heartbeat:
+            tasks.append(asyncio.create_task(self.beat()))
+        if self.coordinator:
+            await self.rebalance()
+            tasks.append(self.coordinate())
+        await asyncio.gather(*tasks)
+    
+    async def beat(self):
+        """Tick the heartbeat even while every search sleeps, so an idle loop is not taken for a stuck one"""
+        while True:
+            self.heartbeat.tick(sum(self.sink_depths().values()))
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+    
+    async def rebalance(self):
+        """Renew our search leases and pick up the seen listings of searches we just took over"""
+        loop = asyncio.get_running_loop()
+        gained, _ = await loop.run_in_executor(None, self.coordinator.rebalance, [query.url for query in self.queries])
+        for query in self.queries:
+            if query.url in gained:
+                count = await loop.run_in_executor(None, self.seen.reload, query.url)
+                # Another worker already built the baseline, so listings added during the handover still get announced
+                if count:
+                    query.is_first_run = False
+    
+    async def coordinate(self):
+        """Heartbeat loop that keeps searches spread over the live workers"""
+        loop = asyncio.get_running_loop()
+        rounds = 0
+        while True:
+            await asyncio.sleep(self.coordinator.lease_ttl / 3)
+            try:
+                await self.rebalance()
+                rounds += 1
+                if rounds % 100 == 0:
+                    await loop.run_in_executor(None, self.coordinator.expire_claims)
+            except Exception as e:
+                logger.error(f"Error renewing search leases: {e}")
+    
+    async def poll_query(self, query, start_delay=0, slot=0):
+        """Poll loop for a single search query"""
+        logger.info(f"Polling {query.url} starting every {query.interval}s")
+        await asyncio.sleep(start_delay)
+        loop = asyncio.get_running_loop()
         
-        # First run: mark all current listings as seen (don't notify)
-        is_first_run = True
+        def is_known(listing_id):
+            if (query.url, listing_id) in self.pending_notifications:
+                return True
+            if self.seen.contains(query.url, listing_id):
+                # Still listed, so keep it from expiring
+                self.seen.add(query.url, listing_id)
+                return True
+            return False
         
         while True:
+            if self.coordinator and not self.coordinator.owns(query.url):
+                # Another worker polls this search; check again after the next lease renewal
+                await asyncio.sleep(self.coordinator.lease_ttl / 3)
+                continue
+            
+            if query.last_success is None:
+                query.last_success = self.seen.cursor(query.url)
+                if query.last_success:
+                    # Resume from the last poll before the restart instead of a new baseline
+                    query.is_first_run = False
+                    if not self.seen.count(query.url):
+                        # Seen IDs expired or were lost: only listings published after the cursor are new
+                        query.alert_after = query.last_success
+            
+            blocked = self.governor.blocked_for(query.url)
+            if blocked:
+                # OLX is blocking or throttling us; wait the cool-down out instead of extending it
+                logger.info(f"Holding {query.url} for {blocked:.0f}s while OLX cools down")
+                await asyncio.sleep(blocked)
+                continue
+            
+            new_count = 0
+            cycle_started = None
+            # Fetch and parse time of a regular poll, the part the latency SLO covers
+            work_seconds = None
             try:
-                logger.info(f"Polling {OLX_SEARCH_URL}")
-                listings = self.fetch_listings()
+                await self.budget.acquire(query.schedule.priority())
+                started_at = time.time()
+                cycle_started = time.monotonic()
+                if self.heartbeat:
+                    self.heartbeat.cycle_started(slot)
+                if not query.is_first_run and query.last_success and started_at - query.last_success > CATCHUP_GAP:
+                    stats = {}
+                    listings, ok = await self.catch_up(query, is_known, query.last_success, stats)
+                    extracted = stats['extracted']
+                else:
+                    logger.info(f"Polling {query.url}")
+                    stats = {}
+                    listings = await loop.run_in_executor(None, self.fetch_listings, query.url, is_known, FRESH_WINDOW_MINUTES, stats)
+                    if 'admitted_at' in stats:
+                        # Waits for a governor token or an OLX cool-down are throttling, not slowness
+                        work_seconds = time.monotonic() - stats['admitted_at']
+                    ok = stats.get('ok', False)
+                    extracted = stats.get('extracted', listings)
+                if self.history and extracted:
+                    self.history.record(query.url, extracted)
+                if ok:
+                    query.last_success = started_at
+                    self.seen.set_cursor(query.url, started_at)
                 
                 if not listings:
-                    logger.info("No listings found or error occurred")
+                    if ok:
+                        logger.info(f"No fresh listings on {query.url}")
+                    else:
+                        logger.info(f"Poll of {query.url} failed, see above")
                 else:
-                    new_count = 0
                     current_listing_ids = [listing['id'] for listing in listings]
                     
                     # On first run, mark all current listings as seen
-                    if is_first_run:
+                    if query.is_first_run:
                         logger.info(f"First run - marking {len(current_listing_ids)} current listings as seen")
-                        self.seen_listings.extend(current_listing_ids)
-                        self.seen_listings = list(set(self.seen_listings))  # Remove duplicates
-                        self.save_seen_listings()
-                        is_first_run = False
+                        # Listings seen before a restart are already in the price snapshot
+                        for listing in listings:
+                            if self.reposts:
+                                self.reposts.add(listing)
+                            if not self.seen.contains(query.url, listing['id']):
+                                self.prices.observe(listing)
+                        self.seen.add_many(query.url, current_listing_ids)
+                        self.seen.flush()
+                        query.is_first_run = False
                         logger.info("First run complete. Future runs will only show new listings.")
-                        continue
-                    
-                    # Check for new listings
-                    for listing in listings:
-                        if listing['id'] not in self.seen_listings:
-                            new_count += 1
-                            logger.info(f"NEW listing: {listing['title']} ({listing['id']})")
-                            
-                            success = self.send_discord_notification(listing)
-                            if success:
-                                self.seen_listings.append(listing['id'])
-                                self.save_seen_listings()
-                                time.sleep(5)  # Pause between notifications
-                            else:
-                                logger.error(f"Failed to notify Discord for {listing['id']}")
-                    
-                    # Clean up old seen IDs (keep only recent ones)
-                    if len(self.seen_listings) > 1000:
-                        self.seen_listings = self.seen_listings[-500:]  # Keep only last 500
-                        self.save_seen_listings()
-                        logger.info(f"Cleaned up old seen listings. Kept {len(self.seen_listings)} recent ones.")
-                    
-                    if new_count == 0:
-                        logger.info(f"No new listings found. Total listings: {len(listings)}")
                     else:
-                        logger.info(f"Found {new_count} new listings out of {len(listings)} total.")
+                        # Check for new listings; notifications are sent in the background
+                        seen_time = 0.0
+                        for listing in listings:
+                            started = time.perf_counter()
+                            known = self.seen.contains(query.url, listing['id'])
+                            seen_time += time.perf_counter() - started
+                            if known:
+                                continue
+                            if query.alert_after and self.published_before(listing, query.alert_after):
+                                self.seen.add(query.url, listing['id'])
+                                continue
+                            if await self.send_discord_notification(listing, query.url):
+                                new_count += 1
+                                logger.info(f"NEW listing: {listing['title']} ({listing['id']})")
+                        # Only the lookups; reposts, pricing, rules and claims are not part of this stage
+                        metrics.observe('stage_seconds', seen_time, stage='seen_check')
+                        
+                        self.seen.flush()
+                        
+                        if new_count == 0:
+                            logger.info(f"No new listings found. Total listings: {len(listings)}")
+                        else:
+                            logger.info(f"Found {new_count} new listings out of {len(listings)} total.")
+                if ok:
+                    query.alert_after = None
+                if self.history:
+                    # One transaction per cycle, off the event loop
+                    await loop.run_in_executor(None, self.history.flush)
                 
             except Exception as e:
-                logger.error(f"Unexpected error: {e}")
+                logger.error(f"Unexpected error polling {query.url}: {e}")
             
-            # Sleep with jitter to avoid perfect periodicity
-            import random
-            jitter = random.randint(0, max(1, POLL_INTERVAL // 5))
-            sleep_time = max(1, POLL_INTERVAL + jitter - POLL_INTERVAL // 10)
-            time.sleep(sleep_time)
+            if cycle_started is not None:
+                cycle_seconds = time.monotonic() - cycle_started
+                metrics.observe('stage_seconds', cycle_seconds, stage='cycle')
+                if self.heartbeat:
+                    if work_seconds is None:
+                        # Catch-up pages, cycles held by the governor and failed cycles say nothing about poll latency
+                        self.heartbeat.cycle_finished(slot, cycle_seconds, counted=False)
+                    else:
+                        self.heartbeat.cycle_finished(slot, work_seconds)
+            
+            if time.monotonic() - self.state_saved_at >= 60:
+                self.state_saved_at = time.monotonic()
+                await loop.run_in_executor(None, self.save_state)
+            
+            # Poll hot searches more often, quiet ones less, and at the shortest interval after a hit
+            query.schedule.record(new_count)
+            sleep_time = query.schedule.next_interval()
+            logger.debug(f"Next poll of {query.url} in {sleep_time:.0f}s")
+            if WARM_CONNECTIONS and sleep_time > WARM_LEAD:
+                # Have the TCP/TLS handshakes done before the poll and any alert it triggers
+                await asyncio.sleep(sleep_time - WARM_LEAD)
+                await loop.run_in_executor(None, self.warm_connections)
+                sleep_time = WARM_LEAD
+            await asyncio.sleep(sleep_time)
+
+    def published_before(self, listing, timestamp):
+        """Whether a listing's publish time is known and earlier than a Unix timestamp"""
+        published = parse_timestamp(listing.get('published_at'))
+        return published is not None and published.timestamp() < timestamp
+    
+    def warm_connections(self):
+        """Re-open idle keep-alive connections to Discord and Telegram
+
+        OLX is not warmed: every request to it goes through the request budget and the governor,
+        and an extra HEAD before each poll would double the traffic it sees.
+        """
+        if DISCORD_WEBHOOK_URL:
+            warm(self.discord_session, DISCORD_WEBHOOK_URL)
+        for sink in self.sinks:
+            if sink.name == 'telegram':
+                warm(sink.session, sink.url)
+    
+    async def catch_up(self, query, is_known, since, stats=None):
+        """Read result pages back to already seen listings after an outage
+
+        Page 1 is read first; if it has no seen listings, pages 2..CATCHUP_MAX_PAGES follow
+        CATCHUP_CONCURRENCY at a time, each within the request budget. Returns (listings in page order, ok);
+        stats, if given, gets every listing extracted from the pages read as 'extracted'.
+        """
+        if stats is None:
+            stats = {}
+        loop = asyncio.get_running_loop()
+        gap_minutes = (time.time() - since) / 60
+        max_age = min(gap_minutes + FRESH_WINDOW_MINUTES, CATCHUP_MAX_MINUTES)
+        logger.info(f"Catching up on {query.url}: {gap_minutes:.0f} min since the last successful poll")
+        
+        first_stats = {}
+        first_page = await loop.run_in_executor(None, self.fetch_listings, query.url, is_known, max_age, first_stats)
+        stats['extracted'] = list(first_stats.get('extracted', first_page))
+        if not first_stats.get('ok'):
+            return [], False
+        pages = [first_page]
+        reached = first_stats.get('reached_known') or not first_page
+        next_page = 2
+        while not reached and next_page <= CATCHUP_MAX_PAGES:
+            batch = list(range(next_page, min(next_page + CATCHUP_CONCURRENCY, CATCHUP_MAX_PAGES + 1)))
+            for _ in batch:
+                await self.budget.acquire(query.schedule.priority())
+            batch_stats = [{} for _ in batch]
+            results = await asyncio.gather(*(
+                loop.run_in_executor(None, self.fetch_listings, page_url(query.url, page), is_known, max_age, page_stats)
+                for page, page_stats in zip(batch, batch_stats)
+            ))
+            # Pages past the first one that reaches seen (or too old) listings are dropped
+            for listings, page_stats in zip(results, batch_stats):
+                stats['extracted'] += page_stats.get('extracted', listings)
+            for listings, page_stats in zip(results, batch_stats):
+                pages.append(listings)
+                if not page_stats.get('ok') or page_stats.get('reached_known') or not listings:
+                    reached = True
+                    break
+            next_page = batch[-1] + 1
+        
+        merged = []
+        merged_ids = set()
+        for listings in pages:
+            for listing in listings:
+                if listing['id'] not in merged_ids:
+                    merged_ids.add(listing['id'])
+                    merged.append(listing)
+        metrics.inc('catchup_pages', len(pages))
+        logger.info(f"Catch-up of {query.url} read {len(pages)} pages and found {len(merged)} listings from the last {max_age:.0f} min")
+        return merged, True
 
 def health_check():
     """Simple health check for Railway"""
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Warm-start snapshot for the OLX Sniper Bot
+Each search's arrival rate and burst state, the winning extraction selectors and the OLX session
+cookies are saved to a small JSON file, so a restarted bot polls on its learned schedule with its
+usual selectors and session instead of starting cold. Seen IDs and the per-search poll cursors are
+kept in the seen database, which is written together with them.
+"""
+
+import os
+import re
+import glob
+import json
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+def cookie_state(session):
+    """Unexpired cookies of a requests session, as plain dicts"""
+    now = time.time()
+    return [
+        {'name': cookie.name, 'value': cookie.value, 'domain': cookie.domain, 'path': cookie.path, 'expires': cookie.expires}
+        for cookie in session.cookies
+        if cookie.expires is None or cookie.expires > now
+    ]
+
+def capture(queries, strategies, session):
+    """Snapshot dict of the bot's warm state"""
+    return {
+        'version': SNAPSHOT_VERSION,
+        'saved_at': time.time(),
+        'queries': {query.url: {'schedule': query.schedule.snapshot()} for query in queries},
+        'selectors': {strategy.field: strategy.winner for strategy in strategies if strategy.winner},
+        'cookies': cookie_state(session),
+    }
+
+def restore(data, queries, strategies, session):
+    """Apply a snapshot; returns the number of searches whose schedule was restored"""
+    elapsed = max(0.0, time.time() - data.get('saved_at', time.time()))
+    restored = 0
+    saved_queries = data.get('queries') or {}
+    for query in queries:
+        saved = saved_queries.get(query.url)
+        if saved and saved.get('schedule'):
+            query.schedule.restore(saved['schedule'], elapsed)
+            restored += 1
+    winners = data.get('selectors') or {}
+    for strategy in strategies:
+        if winners.get(strategy.field):
+            strategy.restore(winners[strategy.field])
+    now = time.time()
+    for cookie in data.get('cookies') or []:
+        if cookie.get('expires') is None or cookie['expires'] > now:
+            session.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain'), path=cookie.get('path') or '/',
+                                expires=cookie.get('expires'))
+    return restored
+
+def worker_path(path, worker_id):
+    """path with a worker's ID before the extension, so workers sharing a directory keep their own files"""
+    if not path or not worker_id:
+        return path
+    root, ext = os.path.splitext(path)
+    safe_id = re.sub(r'[^\w.-]', '_', worker_id)
+    return f"{root}.{safe_id}{ext}"
+
+def latest(path, max_age=7 * 24 * 3600):
+    """Most recently written of path and its per-worker variants, or path if none exists
+
+    Variants written more than max_age before the newest one belong to long gone workers and are deleted.
+    """
+    if not path:
+        return path
+    root, ext = os.path.splitext(path)
+    variants = [name for name in glob.glob(f"{glob.escape(root)}.*{ext}") if not name.endswith('.tmp')]
+    found = []
+    for name in variants + [path]:
+        try:
+            found.append((os.path.getmtime(name), name))
+        except OSError:
+            pass
+    if not found:
+        return path
+    newest = max(found)[0]
+    for mtime, name in found:
+        if name != path and mtime < newest - max_age:
+            try:
+                os.remove(name)
+            except OSError:
+                pass
+    return max(found)[1]
+
+def load(path):
+    """Snapshot dict from path, or None if there is no usable one"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception as e:
+        logger.error(f"Error loading state snapshot from {path}: {e}")
+        return None
+    if not isinstance(data, dict) or data.get('version') != SNAPSHOT_VERSION:
+        logger.warning(f"Ignoring state snapshot {path} from another version")
+        return None
+    return data
+
+def save(path, data):
+    """Write a snapshot atomically"""
+    if not path:
+        return
+    try:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.error(f"Error saving state snapshot: {e}")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Incremental search page parsing for the OLX Sniper Bot
+Response chunks are fed to libxml2's pull parser. Each listing card (matched by the container
+selector that won last time) is handed out as soon as its closing tag is parsed and emptied once it
+is extracted, together with everything before it; the header, footer and script blobs are emptied
+the moment they close, so the page never exists as a whole tree. The page state script is kept as text, in case it arrives
+before the first card.
+"""
+
+from parsers import css_matcher, LxmlNode, NON_TEXT_TAGS
+
+STATE_MARKER = '__PRERENDERED_STATE__'
+# Dropped as soon as they close; a card is matched on its closing tag, after its descendants
+DROP_TAGS = frozenset(('script', 'style', 'template', 'noscript', 'header', 'footer', 'svg'))
+
+class StreamingPage:
+    """Listing cards of a search page, parsed while its chunks arrive
+
+    Iterate cards() for LxmlNodes in page order. If the page state script comes before the first
+    card, iteration stops early and state_text holds it. consumed keeps every chunk read so far,
+    so the caller can fall back to a full parse.
+    """
+
+    def __init__(self, chunks, selector, encoding=None, want_state=True):
+        from lxml import etree
+        self._etree = etree
+        self.matches = css_matcher(selector)
+        if self.matches is None:
+            raise ValueError(f"Selector {selector!r} can't be matched while streaming")
+        self.chunks = iter(chunks)
+        self.want_state = want_state
+        self.parser = etree.HTMLPullParser(events=('end',), encoding=encoding or 'utf-8', remove_comments=True)
+        self.consumed = []
+        self.complete = False
+        self.card_count = 0
+        self.state_text = None
+
+    def _events(self):
+        for chunk in self.chunks:
+            self.consumed.append(chunk)
+            self.parser.feed(chunk)
+            yield from self.parser.read_events()
+        self.parser.close()
+        self.complete = True
+        yield from self.parser.read_events()
+
+    def cards(self):
+        etree = self._etree
+        matches = self.matches
+        for _, el in self._events():
+            tag = el.tag
+            if tag in DROP_TAGS:
+                if tag == 'script' and self.want_state and not self.card_count and el.text and STATE_MARKER in el.text:
+                    self.state_text = el.text
+                    return
+                el.clear(keep_tail=True)
+            elif matches(tag, el.attrib):
+                self.card_count += 1
+                # Match the tree parsers, whose get_text() skips script/style/template strings
+                etree.strip_elements(el, *NON_TEXT_TAGS, with_tail=False)
+                yield LxmlNode(el)
+                el.clear(keep_tail=True)
+                # Earlier siblings (previous cards, wrappers) are no longer needed either
+                parent = el.getparent()
+                while parent is not None and el.getprevious() is not None:
+                    del parent[0]
+
+    def rest(self):
+        """Whole body: the chunks read so far plus the ones not read yet"""
+        return b''.join(self.consumed) + b''.join(self.chunks)
+
+def chunked(content, size=64 * 1024):
+    """Split an in-memory body the way a streamed download arrives"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return (content[start:start + size] for start in range(0, len(content), size))
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Poll-loop watchdog for the OLX Sniper Bot
+The web process runs the bot as a child process. The child publishes a heartbeat in shared memory:
+an event loop tick, the start, end and duration of every search's poll cycle, and the notification
+queue depth. It also publishes a JSON status document (health fields, metrics, selectors) for the
+web endpoints. The supervisor restarts the child when the loop stops ticking, a cycle hangs, or
+cycles keep missing the latency SLO, so a stalled bot never sits behind a healthy-looking /health.
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import logging
+import threading
+import multiprocessing
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Header fields of the heartbeat array; per-search slots follow
+PID, BOOTED, TICK, CYCLES, QUEUE_DEPTH, LAST_CYCLE_AT, LAST_CYCLE_SECONDS = range(7)
+HEADER_SIZE = 7
+# Per-slot fields: cycle start and end (monotonic), last duration, consecutive cycles over the SLO
+STARTED, FINISHED, DURATION, SLOW = range(4)
+SLOT_SIZE = 4
+# One slot per search; the bot refuses to start with more searches than this
+MAX_SLOTS = 256
+STATUS_BYTES = 1024 * 1024
+
+class Heartbeat:
+    """Heartbeat and status document shared between the bot process and its supervisor
+
+    Every value has a single writer: the event loop writes the header, each search its own slot.
+    Monotonic times are comparable across processes (CLOCK_MONOTONIC is system-wide).
+    """
+
+    def __init__(self, slo, slots=MAX_SLOTS, context=multiprocessing):
+        self.slo = slo
+        self.slots = slots
+        self.values = context.RawArray('d', HEADER_SIZE + slots * SLOT_SIZE)
+        # Seqlock (sequence, length) over the JSON status bytes
+        self.status_header = context.RawArray('q', 2)
+        self.status_data = context.RawArray('c', STATUS_BYTES)
+
+    def _slot(self, slot):
+        # Never wrapped: two searches sharing a slot would hide each other's hung cycles
+        if not 0 <= slot < self.slots:
+            raise IndexError(f"heartbeat slot {slot} out of range, only {self.slots} slots")
+        return HEADER_SIZE + slot * SLOT_SIZE
+
+    def booted(self):
+        self.values[PID] = os.getpid()
+        self.values[BOOTED] = time.monotonic()
+
+    def tick(self, queue_depth=0):
+        """The event loop is alive"""
+        self.values[TICK] = time.monotonic()
+        self.values[QUEUE_DEPTH] = queue_depth
+
+    def cycle_started(self, slot):
+        self.values[self._slot(slot) + STARTED] = time.monotonic()
+
+    def cycle_finished(self, slot, duration, counted=True):
+        """A cycle ended; duration counts toward the SLO only if counted (catch-up cycles are longer by design)"""
+        base = self._slot(slot)
+        self.values[base + FINISHED] = time.monotonic()
+        self.values[base + DURATION] = duration
+        if counted:
+            self.values[base + SLOW] = self.values[base + SLOW] + 1 if duration > self.slo else 0
+        self.values[CYCLES] += 1
+        self.values[LAST_CYCLE_AT] = time.time()
+        self.values[LAST_CYCLE_SECONDS] = duration
+
+    def stall_reason(self, stall_after, slow_cycles, now=None):
+        """Why the bot looks stalled, or None"""
+        now = now or time.monotonic()
+        values = self.values
+        if not values[TICK]:
+            # Still starting: imports, the seen database, the warm-start snapshot
+            if values[BOOTED] and now - values[BOOTED] > 2 * stall_after:
+                return f"event loop not started after {now - values[BOOTED]:.0f}s"
+            return None
+        if now - values[TICK] > stall_after:
+            return f"event loop unresponsive for {now - values[TICK]:.0f}s"
+        for slot in range(self.slots):
+            base = HEADER_SIZE + slot * SLOT_SIZE
+            started, finished, slow = values[base + STARTED], values[base + FINISHED], values[base + SLOW]
+            if started > finished and now - started > stall_after:
+                return f"poll cycle running for {now - started:.0f}s"
+            if slow >= slow_cycles:
+                return f"{slow:.0f} consecutive poll cycles over the {self.slo:g}s SLO"
+        return None
+
+    def snapshot(self, now=None):
+        """Heartbeat values for /health"""
+        now = now or time.monotonic()
+        values = self.values
+        running = [
+            now - values[base + STARTED]
+            for base in range(HEADER_SIZE, HEADER_SIZE + self.slots * SLOT_SIZE, SLOT_SIZE)
+            if values[base + STARTED] > values[base + FINISHED]
+        ]
+        return {
+            'pid': int(values[PID]) or None,
+            'loop_lag_seconds': round(now - values[TICK], 1) if values[TICK] else None,
+            'last_cycle': time.strftime('%Y-%m-%dT%H:%M:%S+00:00', time.gmtime(values[LAST_CYCLE_AT])) if values[LAST_CYCLE_AT] else None,
+            'last_cycle_seconds': round(values[LAST_CYCLE_SECONDS], 3),
+            'longest_running_cycle_seconds': round(max(running), 1) if running else 0,
+            'cycles': int(values[CYCLES]),
+            'queue_depth': int(values[QUEUE_DEPTH]),
+        }
+
+    def publish(self, status):
+        """Write the status document for the supervisor's web endpoints"""
+        data = json.dumps(status, separators=(',', ':'), default=str).encode('utf-8')
+        if len(data) > STATUS_BYTES:
+            logger.warning(f"Status document is {len(data)} bytes, publishing it without metrics")
+            data = json.dumps(dict(status, metrics=''), separators=(',', ':'), default=str).encode('utf-8')[:STATUS_BYTES]
+        header = self.status_header
+        header[0] += 1  # Odd while writing
+        memoryview(self.status_data).cast('B')[:len(data)] = data
+        header[1] = len(data)
+        header[0] += 1
+
+    def status(self):
+        """Last published status document, or {}"""
+        header = self.status_header
+        for _ in range(5):
+            sequence = header[0]
+            if sequence % 2 == 0:
+                data = bytes(memoryview(self.status_data).cast('B')[:header[1]])
+                if header[0] == sequence:
+                    return json.loads(data) if data else {}
+            time.sleep(0.001)
+        return {}
+
+def publish_status(heartbeat, bot, interval=5):
+    """Publish the bot's status document every interval seconds (child side, daemon thread)"""
+    while True:
+        try:
+            heartbeat.publish(bot.status())
+        except Exception as e:
+            logger.error(f"Error publishing bot status: {e}")
+        time.sleep(interval)
+
+def run_child(heartbeat):
+    """Entry point of the bot process"""
+    heartbeat.booted()
+    # Unwind on terminate so the seen database and warm-start snapshot are saved when possible
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    # Imported here, in the child, so the web process stays light
+    from sniperbot import OLXSniperBot
+    bot = OLXSniperBot(heartbeat=heartbeat)
+    threading.Thread(target=publish_status, args=(heartbeat, bot), name='status-publisher', daemon=True).start()
+    bot.run()
+
+class Supervisor:
+    """Runs the bot in a child process and restarts it when it dies or stalls"""
+
+    def __init__(self, slo=30, stall_after=120, slow_cycles=3, check_interval=5, max_backoff=300):
+        # spawn: a fork of a threaded web worker could inherit locks held by other threads
+        self.context = multiprocessing.get_context('spawn')
+        self.slo = slo
+        self.stall_after = stall_after
+        self.slow_cycles = slow_cycles
+        self.check_interval = check_interval
+        self.max_backoff = max_backoff
+        self.process = None
+        self.heartbeat = None
+        self.restarts = 0
+        self.last_restart = None
+        self.stalled = None
+
+    def start(self):
+        self.heartbeat = Heartbeat(self.slo, context=self.context)
+        self.process = self.context.Process(target=run_child, args=(self.heartbeat,), name='olx-sniper-bot', daemon=True)
+        self.process.start()
+        logger.info(f"Started bot process {self.process.pid}")
+
+    def stop(self, grace=10):
+        """SIGTERM, then SIGKILL if the bot is stuck too deep to exit"""
+        self.process.terminate()
+        self.process.join(grace)
+        if self.process.is_alive():
+            logger.warning(f"Bot process {self.process.pid} ignored SIGTERM, killing it")
+            self.process.kill()
+            self.process.join()
+
+    def run(self):
+        """Supervise forever; returns only if the bot exits cleanly (e.g. missing configuration)"""
+        failures = 0
+        while True:
+            self.start()
+            started = time.monotonic()
+            reason = None
+            kind = 'stalled'
+            while self.process.is_alive():
+                time.sleep(self.check_interval)
+                reason = self.heartbeat.stall_reason(self.stall_after, self.slow_cycles)
+                if reason:
+                    self.stalled = reason
+                    logger.error(f"🚨 Bot process {self.process.pid} stalled ({reason}), restarting it")
+                    self.stop()
+                    break
+            if reason is None:
+                if self.process.exitcode == 0:
+                    logger.info("Bot process exited, not restarting it")
+                    return
+                reason = f"exited with code {self.process.exitcode}"
+                kind = 'exited'
+                logger.error(f"🚨 Bot process {self.process.pid} {reason}, restarting it")
+            self.restarts += 1
+            self.last_restart = {'reason': reason, 'at': time.strftime('%Y-%m-%dT%H:%M:%S+00:00')}
+            metrics.inc('bot_restarts', reason=kind)
+            # Back off from crash loops; a child that ran for a while starts over from a short wait
+            failures = 1 if time.monotonic() - started > 10 * self.max_backoff else failures + 1
+            time.sleep(min(self.max_backoff, 5 * 2 ** (failures - 1)))
+            self.stalled = None
+
+    def health(self):
+        """Supervisor and heartbeat state for /health"""
+        running = self.process is not None and self.process.is_alive()
+        heartbeat = self.heartbeat.snapshot() if self.heartbeat else {}
+        stalled = self.stalled or (self.heartbeat.stall_reason(self.stall_after, self.slow_cycles) if running else None)
+        return dict(heartbeat, running=running, stalled=stalled, restarts=self.restarts, last_restart=self.last_restart,
+                    slo_seconds=self.slo)
+
+    def status(self):
+        """The bot's last published status document"""
+        return self.heartbeat.status() if self.heartbeat else {}
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s')
+    Supervisor().run()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Publish times of OLX listings
+Turns every date form OLX shows on a card ("Dzisiaj o 12:24", "Wczoraj o 15:20", "Dzisiaj",
+"17.10.2024", "17 października 2024") into a timezone-aware datetime in Polish time. Card clock
+times are rendered in OLX_DISPLAY_TZ (UTC on olx.pl), so the offset is looked up per date instead
+of adding a fixed two hours that is wrong half the year.
+"""
+
+import os
+import re
+from datetime import datetime, timedelta
+import pytz
+
+# Timezone objects are built once; pytz.timezone() parses zoneinfo files on a cold cache
+POLAND_TZ = pytz.timezone('Europe/Warsaw')
+UTC = pytz.utc
+DISPLAY_TZ = pytz.timezone(os.getenv('OLX_DISPLAY_TZ', 'UTC'))
+
+# Genitive ("17 października") and nominative month names, lowercase
+MONTHS = {
+    'stycznia': 1, 'styczeń': 1, 'lutego': 2, 'luty': 2, 'marca': 3, 'marzec': 3,
+    'kwietnia': 4, 'kwiecień': 4, 'maja': 5, 'maj': 5, 'czerwca': 6, 'czerwiec': 6,
+    'lipca': 7, 'lipiec': 7, 'sierpnia': 8, 'sierpień': 8, 'września': 9, 'wrzesień': 9,
+    'października': 10, 'październik': 10, 'listopada': 11, 'listopad': 11, 'grudnia': 12, 'grudzień': 12,
+}
+
+DATE_RE = re.compile(
+    r'(?P<day_word>Dzisiaj|Wczoraj)(?: o (?P<hour>\d{1,2}):(?P<minute>\d{2}))?'
+    r'|(?P<d>\d{1,2})\.(?P<m>\d{1,2})\.(?P<y>\d{4})'
+    r'|(?P<nd>\d{1,2}) (?P<month>\w+) (?P<ny>\d{4})',
+    re.I)
+
+def parse_publish_date(text, now=None, tz=DISPLAY_TZ):
+    """Parse an OLX card date shown in tz into (aware datetime in Polish time, has_time)
+
+    Date-only forms give midnight of that day with has_time False. Returns None if text holds no date.
+    """
+    if not text:
+        return None
+    match = DATE_RE.search(text)
+    if not match:
+        return None
+    now = (now or datetime.now(UTC)).astimezone(tz)
+    try:
+        if match.group('day_word'):
+            day = now.date()
+            if match.group('day_word').lower() == 'wczoraj':
+                day -= timedelta(days=1)
+            if match.group('hour') is None:
+                return POLAND_TZ.localize(datetime(day.year, day.month, day.day)), False
+            published = tz.localize(datetime(day.year, day.month, day.day, int(match.group('hour')), int(match.group('minute'))))
+            if published - now > timedelta(hours=12):
+                # Page rendered just before midnight, read just after it
+                published -= timedelta(days=1)
+            return published.astimezone(POLAND_TZ), True
+        if match.group('d'):
+            day, month, year = int(match.group('d')), int(match.group('m')), int(match.group('y'))
+        else:
+            month = MONTHS.get(match.group('month').lower())
+            if month is None:
+                return None
+            day, year = int(match.group('nd')), int(match.group('ny'))
+        # Bare dates are calendar days in Poland, not instants in the display timezone
+        return POLAND_TZ.localize(datetime(year, month, day)), False
+    except ValueError:
+        return None
+
+def parse_timestamp(value):
+    """Parse an ISO timestamp (as in the page state) into an aware datetime in Polish time"""
+    if not value:
+        return None
+    try:
+        published = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if published.tzinfo is None:
+        published = UTC.localize(published)
+    return published.astimezone(POLAND_TZ)
+
+def format_publish_date(published, now=None, has_time=True):
+    """Render a timestamp the way OLX cards show it: "Dzisiaj o 11:49", "Wczoraj o 15:20" or "17.10.2024" """
+    now = (now or datetime.now(UTC)).astimezone(POLAND_TZ)
+    published = published.astimezone(POLAND_TZ)
+    if published.date() == now.date():
+        return f"Dzisiaj o {published:%H:%M}" if has_time else "Dzisiaj"
+    if published.date() == (now - timedelta(days=1)).date():
+        return f"Wczoraj o {published:%H:%M}" if has_time else "Wczoraj"
+    return f"{published:%d.%m.%Y}"
+
+def age_seconds(published, now=None):
+    """Seconds since an aware publish time"""
+    return ((now or datetime.now(UTC)) - published).total_seconds()
+
+def is_fresh(published, has_time=True, max_age_minutes=2, now=None):
+    """Whether a listing was published within max_age_minutes, compared at whole-minute resolution
+
+    Cards only show HH:MM, so both times are floored to the minute. A date without a clock time
+    counts as fresh only if it is today in Poland; a publish time one minute in the future is
+    accepted, since OLX's clock and ours are not in lockstep.
+    """
+    if published is None:
+        return False
+    now = now or datetime.now(UTC)
+    if not has_time:
+        return published.astimezone(POLAND_TZ).date() == now.astimezone(POLAND_TZ).date()
+    minutes = (now.replace(second=0, microsecond=0) - published.replace(second=0, microsecond=0)).total_seconds() // 60
+    return -1 <= minutes <= max_age_minutes
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+HTTP transport for the OLX Sniper Bot
+Pooled keep-alive sessions with a short-lived DNS cache, connection warming before polls,
+an Accept-Encoding header limited to what urllib3 can actually decode, streamed body reads
+and per-phase (connect / TTFB / download) timings
+"""
+
+import time
+import socket
+import logging
+import threading
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.request import ACCEPT_ENCODING
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# gzip and deflate always, br / zstd only when brotli / zstandard are installed
+SUPPORTED_ENCODINGS = ACCEPT_ENCODING.replace(',', ', ')
+READ_CHUNK_SIZE = 64 * 1024
+
+_dns_lock = threading.Lock()
+_dns_cache = {}
+_original_getaddrinfo = socket.getaddrinfo
+
+def _cached_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0, *, ttl):
+    key = (host, port, family, type, proto, flags)
+    now = time.monotonic()
+    with _dns_lock:
+        entry = _dns_cache.get(key)
+    if entry and entry[0] > now:
+        metrics.inc('dns_cache', result='hit')
+        return entry[1]
+    metrics.inc('dns_cache', result='miss')
+    result = _original_getaddrinfo(host, port, family, type, proto, flags)
+    with _dns_lock:
+        _dns_cache[key] = (now + ttl, result)
+    return result
+
+def install_dns_cache(ttl=300):
+    """Cache getaddrinfo results for ttl seconds, process-wide"""
+    if ttl <= 0:
+        return
+    socket.getaddrinfo = lambda *args, **kwargs: _cached_getaddrinfo(*args, ttl=ttl, **kwargs)
+    logger.info(f"DNS results cached for {ttl}s")
+
+class _TimedConnectMixin:
+    """Records how long new TCP+TLS connections take, so pool reuse shows up in /metrics"""
+
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        metrics.observe('http_phase_seconds', time.perf_counter() - started, phase='connect', host=self.host)
+        metrics.inc('http_connections', host=self.host)
+
+class TimedHTTPConnection(_TimedConnectMixin, HTTPConnection):
+    pass
+
+class TimedHTTPSConnection(_TimedConnectMixin, HTTPSConnection):
+    pass
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+class TimedAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools time connection setup"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+def create_session(user_agent=None, pool_maxsize=10, headers=None):
+    """requests session with timed keep-alive pools and an honest Accept-Encoding"""
+    session = requests.Session()
+    adapter = TimedAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Accept-Encoding': SUPPORTED_ENCODINGS, 'Connection': 'keep-alive'})
+    if user_agent:
+        session.headers['User-Agent'] = user_agent
+    session.headers.update(headers or {})
+    session.last_used = {}
+    return session
+
+def origin(url):
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+def touch(session, url):
+    """Note that the connection to url's host was just used"""
+    if hasattr(session, 'last_used'):
+        session.last_used[origin(url)] = time.monotonic()
+
+def open_stream(session, url, timeout=30, **kwargs):
+    """Send a GET and return the response once its headers arrive, body unread; records TTFB"""
+    started = time.perf_counter()
+    response = session.get(url, timeout=timeout, stream=True, **kwargs)
+    metrics.observe('http_phase_seconds', time.perf_counter() - started, phase='ttfb', host=urlparse(url).hostname)
+    return response
+
+def iter_body(session, response, url, chunk_size=READ_CHUNK_SIZE):
+    """Decoded body chunks of an open_stream response; the download time is recorded once it is read to the end"""
+    started = time.perf_counter()
+    for chunk in response.iter_content(chunk_size):
+        yield chunk
+    metrics.observe('http_phase_seconds', time.perf_counter() - started, phase='download', host=urlparse(url).hostname)
+    touch(session, url)
+
+def get(session, url, timeout=30, check=True, **kwargs):
+    """Streamed GET; returns (response, body bytes) and records TTFB and download timings
+
+    With check, error statuses raise before the body is read; without it the body is always returned.
+    """
+    response = open_stream(session, url, timeout=timeout, **kwargs)
+    try:
+        if check:
+            response.raise_for_status()
+        body = b''.join(iter_body(session, response, url))
+    finally:
+        response.close()
+    return response, body
+
+def warm(session, url, idle_after=20, timeout=5):
+    """Re-open the keep-alive connection to url's host if it sat idle long enough to have been closed
+
+    Sends a HEAD for the site root; returns True if a request was made.
+    """
+    root = origin(url)
+    last_used = session.last_used.get(root)
+    if last_used is not None and time.monotonic() - last_used < idle_after:
+        return False
+    try:
+        started = time.perf_counter()
+        session.head(root + '/', timeout=timeout, allow_redirects=False)
+        session.last_used[root] = time.monotonic()
+        metrics.observe('http_phase_seconds', time.perf_counter() - started, phase='warm', host=urlparse(root).hostname)
+        return True
+    except requests.RequestException as e:
+        logger.debug(f"Could not warm connection to {root}: {e}")
+        return False